@@ -1,3 +1,4 @@
+import argparse
 import sys
 import os
 
@@ -7,4 +8,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.vector_store.build_index import build_index
 
 if __name__ == "__main__":
-    build_index()
+    parser = argparse.ArgumentParser(description="Build the FAISS index from the vehicles table.")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore the checkpoint of an interrupted build")
+
+    args = parser.parse_args()
+    build_index(resume=not args.no_resume)
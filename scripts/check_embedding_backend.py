@@ -0,0 +1,82 @@
+import argparse
+import sys
+import os
+import time
+
+# Add project root to python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import faiss
+import numpy as np
+from src.core.config.settings import settings
+from src.core.db.database import SessionLocal
+from src.core.db.models.partner_vehicle import PartnerVehicle
+from src.core.db.models.vehicle import Vehicle
+from src.core.matching.encoder_backend import load_encoder
+from src.core.normalization.normalizer import normalizer
+
+def top1(model, catalog_texts: list, queries: list):
+    """
+    Embeds catalog and queries with one backend and returns the top-1
+    catalog row per query plus the mean per-query encode latency (ms).
+    """
+    catalog = np.array(model.encode(catalog_texts, show_progress_bar=False)).astype('float32')
+    index = faiss.IndexFlatIP(catalog.shape[1])
+    index.add(catalog)
+
+    # One query at a time, like the API sees them
+    start = time.perf_counter()
+    embeddings = [model.encode([q], show_progress_bar=False)[0] for q in queries]
+    latency_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+
+    _, indices = index.search(np.array(embeddings).astype('float32'), 1)
+    return indices[:, 0], latency_ms
+
+def check_backend(backend: str, min_agreement: float) -> bool:
+    db = SessionLocal()
+    try:
+        vehicles = db.query(Vehicle).all()
+        partners = db.query(PartnerVehicle).all()
+    finally:
+        db.close()
+
+    catalog = [(v.id, normalizer.normalize(v.name)) for v in vehicles]
+    catalog = [(vid, name) for vid, name in catalog if name]
+    queries = [q for q in (normalizer.normalize(p.description) for p in partners) if q]
+    if not queries:
+        # No partner data loaded: use the catalog names themselves
+        queries = [name for _, name in catalog]
+
+    if not catalog:
+        print("Catalog is empty, nothing to check.")
+        return False
+
+    catalog_texts = [name for _, name in catalog]
+    print(f"Checking {backend} against torch: {len(catalog)} catalog vehicles, {len(queries)} queries")
+
+    reference, reference_ms = top1(load_encoder(settings.MODEL_NAME, "torch"), catalog_texts, queries)
+    candidate_model = load_encoder(
+        settings.MODEL_NAME, backend,
+        onnx_dir=settings.EMBEDDING_ONNX_DIR,
+        quantization=settings.EMBEDDING_QUANTIZATION
+    )
+    candidate, candidate_ms = top1(candidate_model, catalog_texts, queries)
+
+    agreement = float(np.mean(reference == candidate))
+    print(f"torch:   {reference_ms:.2f} ms/query")
+    print(f"{backend}: {candidate_ms:.2f} ms/query ({reference_ms / candidate_ms if candidate_ms else 0:.1f}x)")
+    print(f"Top-1 agreement: {agreement * 100:.2f}%")
+
+    for q, (r, c) in enumerate(zip(reference, candidate)):
+        if r != c:
+            print(f"- '{queries[q]}': torch={catalog[r][0]} {backend}={catalog[c][0]}")
+
+    return agreement >= min_agreement
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that an embedding backend picks the same top-1 catalog matches as torch.")
+    parser.add_argument("--backend", default=settings.EMBEDDING_BACKEND if settings.EMBEDDING_BACKEND != "torch" else "onnx-int8")
+    parser.add_argument("--min-agreement", type=float, default=0.99)
+
+    args = parser.parse_args()
+    sys.exit(0 if check_backend(args.backend, args.min_agreement) else 1)
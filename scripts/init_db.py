@@ -7,6 +7,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.core.db.database import engine, Base
 from src.core.db.models.vehicle import Vehicle
 from src.core.db.models.partner_vehicle import PartnerVehicle
+from src.core.db.models.match_job import MatchJob
 
 def init_db():
     print("Creating database tables...")
@@ -0,0 +1,35 @@
+import argparse
+import sys
+import os
+
+# Add project root to python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.core.db.bulk_loader import load_vehicles, load_partner_vehicles, DEFAULT_CHUNK_SIZE
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load catalog or partner vehicles from CSV or Parquet files.")
+    subparsers = parser.add_subparsers(dest="target", required=True)
+
+    vehicles = subparsers.add_parser("vehicles", help="Upsert catalog vehicles on their id")
+    vehicles.add_argument("path", help="CSV or .parquet file")
+    vehicles.add_argument("--id-column", default="id_crabi")
+    vehicles.add_argument("--name-column", default="versionc")
+    vehicles.add_argument("--update-index", action="store_true",
+                          help="Add new and renamed vehicles to the vector index incrementally")
+
+    partners = subparsers.add_parser("partners", help="Insert partner vehicles, skipping known descriptions")
+    partners.add_argument("path", help="CSV or .parquet file")
+    partners.add_argument("--description-column", default="descripcion")
+    partners.add_argument("--partner-id", default=None, help="Partner the descriptions belong to (scopes their aliases)")
+
+    for subparser in (vehicles, partners):
+        subparser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per transaction")
+
+    args = parser.parse_args()
+    if args.target == "vehicles":
+        count = load_vehicles(args.path, args.id_column, args.name_column, args.chunk_size, args.update_index)
+        print(f"Successfully loaded {count} vehicles.")
+    else:
+        count = load_partner_vehicles(args.path, args.description_column, args.chunk_size, args.partner_id)
+        print(f"Successfully loaded {count} partner vehicles.")
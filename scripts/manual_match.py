@@ -22,9 +22,11 @@ def manual_match(partner_id: int, match_id: str):
         
         vehicle.match_id = match_id
         vehicle.processed = True
+        vehicle.confirmed = True
         
         db.commit()
         print(f"Successfully updated vehicle {partner_id} with match_id: {match_id}")
+        print("Call POST /admin/refresh-aliases to use it as an alias in the running API.")
 
     except Exception as e:
         print(f"Error: {e}")
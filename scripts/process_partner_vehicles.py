@@ -1,5 +1,9 @@
+import argparse
 import sys
 import os
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 # Add project root to python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -8,47 +12,246 @@ from src.core.db.database import SessionLocal
 from src.core.db.models.partner_vehicle import PartnerVehicle
 from src.core.db.models.vehicle import Vehicle
 from src.core.matching.matching_engine import matching_engine
+from src.core.matching.similarity_service import similarity_service
+from src.core.matching.embedding_service import embedding_service
+from src.core.normalization.normalizer import normalizer
+from src.core.config.settings import settings
+from src.schemas.match_response import MatchResponse
 
-def process_vehicles():
-    db = SessionLocal()
-    try:
-        # Fetch unprocessed vehicles
-        vehicles = db.query(PartnerVehicle).filter(PartnerVehicle.processed == False).all()
-        print(f"Found {len(vehicles)} unprocessed vehicles.")
+class RunRegistry:
+    """
+    Vehicles registered during this run, with their vectors. Unmatched rows
+    are re-checked against these only: the first pass already compared
+    them with the rest of the catalog (LLM tiebreak included), so that
+    decision stands unless a new vehicle is a clear match.
+    """
+    # Candidates re-scored with token overlap, as in the hybrid search
+    RERANK_K = 20
+
+    def __init__(self):
+        self.ids = []
+        self.names = []
+        self._vectors = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, vehicle_id: str, normalized_name: str, vector: np.ndarray):
+        if self._vectors is None:
+            self._vectors = np.empty((64, len(vector)), dtype='float32')
+        elif len(self.ids) == len(self._vectors):
+            self._vectors = np.resize(self._vectors, (2 * len(self._vectors), self._vectors.shape[1]))
+        self._vectors[len(self.ids)] = vector
+        self.ids.append(vehicle_id)
+        self.names.append(normalized_name)
+
+    def best_match(self, normalized_text: str, vector: np.ndarray):
+        """
+        (vehicle_id, score) of the registered vehicle scoring at least
+        SIM_THRESHOLD with the same 60/40 hybrid score as the index, or None.
+        """
+        if not self.ids:
+            return None
+        scores = self._vectors[:len(self.ids)] @ vector
+        top = np.argsort(-scores)[:self.RERANK_K]
+        hybrid = [(0.6 * float(scores[i]) + 0.4 * similarity_service.calculate_token_overlap(normalized_text, self.names[i]), i)
+                  for i in top]
+        score, best = max(hybrid)
+        return (self.ids[best], score) if score >= settings.SIM_THRESHOLD else None
+
+def fetch_chunk(db, after: int, chunk_size: int) -> list:
+    """
+    Next chunk of unprocessed (id, description, partner_id) rows after the given id.
+    Keyset pagination: rows committed as processed drop out of the filter,
+    so an interrupted run resumes at the first uncommitted chunk.
+    """
+    query = db.query(PartnerVehicle.id, PartnerVehicle.description, PartnerVehicle.partner_id) \
+        .filter(PartnerVehicle.processed == False)
+    if after is not None:
+        query = query.filter(PartnerVehicle.id > after)
+    return query.order_by(PartnerVehicle.id).limit(chunk_size).all()
+
+def start_matching(executor, rows: list, workers: int) -> list:
+    """
+    Splits the chunk into one batch per worker; each batch is a single
+    encode + search (plus LLM calls) in its own thread.
+    Returns (batch rows, future) pairs.
+    """
+    size = max(1, -(-len(rows) // workers))
+    batches = [rows[i:i + size] for i in range(0, len(rows), size)]
+    return [(batch, executor.submit(matching_engine.process_batch,
+                                    [description for _, description, _ in batch],
+                                    [partner for _, _, partner in batch]))
+            for batch in batches]
 
-        for v in vehicles:
-            print(f"Processing ID {v.id}: {v.description}")
+def collect_results(pending: list) -> list:
+    """
+    Match results of one chunk in row order. A batch whose process_batch
+    call failed is matched again row by row; rows that still fail get
+    None and are left unprocessed.
+    """
+    results = []
+    for batch, future in pending:
+        try:
+            results.extend(future.result())
+            continue
+        except Exception as e:
+            print(f"  -> Batch of IDs {batch[0][0]}-{batch[-1][0]} failed ({e}), matching its rows one by one")
+        for partner_id, description, partner in batch:
             try:
-                result = matching_engine.process(v.description)
-                
-                if result.match:
-                    v.match_id = result.vehicle_id
-                    print(f"  -> Matched: {result.vehicle_id} (Confidence: {result.confidence:.2f})")
-                else:
-                    # No match found in official catalog.
-                    # Create a new entry in the Unified Catalog (vehicles table)
-                    new_id = f"SOC-{v.id:03d}" # e.g. SOC-001
-                    print(f"  -> No match found. Registering as new vehicle: {new_id}")
-                    
-                    new_vehicle = Vehicle(id=new_id, name=v.description)
-                    db.add(new_vehicle)
-                    # We need to flush to ensure it doesn't conflict if we process same ID (unlikely here)
-                    db.flush() 
-                    
-                    v.match_id = new_id
-                
-                v.processed = True
+                results.append(matching_engine.process(description, partner))
             except Exception as e:
-                print(f"  -> Error processing vehicle: {e}")
-        
-        db.commit()
-        print("Batch processing complete. Unified Catalog updated.")
+                print(f"  -> Error matching vehicle {partner_id}: {e}")
+                results.append(None)
+    return results
+
+def soc_id(partner_id: int) -> str:
+    # Catalog id of a vehicle registered from a partner row, e.g. SOC-001
+    return f"SOC-{partner_id:03d}"
+
+def write_chunk(db, rows: list, results: list, registry: RunRegistry, verbose: bool) -> dict:
+    """
+    Applies the match results of one chunk and commits them in bulk.
+    Unmatched rows are registered as new catalog vehicles in row order.
+    Rows that failed (result None) are left unprocessed and listed in
+    counts["failed"].
+    """
+    updates = []
+    new_vehicles = []
+    counts = {"matched": 0, "registered": 0, "errors": 0, "failed": []}
+
+    # Unmatched rows are encoded together (mostly embedding cache hits)
+    # for the re-check against vehicles registered by earlier rows
+    unmatched = [i for i, result in enumerate(results) if result is not None and not result.match]
+    texts = normalizer.normalize_batch([rows[i][1] for i in unmatched])
+    vectors = np.array(embedding_service.generate_embeddings(texts), dtype='float32') if texts else []
+    recheck = dict(zip(unmatched, zip(texts, vectors))) if len(vectors) == len(texts) else {}
+
+    # Catalog vehicles already holding this chunk's SOC ids (e.g. registered
+    # before the partner table was reloaded), checked here so one collision
+    # does not fail the bulk insert of the whole chunk
+    taken = dict(db.query(Vehicle.id, Vehicle.name)
+                 .filter(Vehicle.id.in_([soc_id(r[0]) for r, result in zip(rows, results)
+                                         if result is not None and not result.match])).all())
+
+    for i, ((partner_id, description, partner), result) in enumerate(zip(rows, results)):
+        if verbose:
+            print(f"Processing ID {partner_id}: {description}")
+        if result is None:
+            counts["errors"] += 1
+            counts["failed"].append(partner_id)
+            continue
+        try:
+            text, vector = recheck.get(i, ("", None))
+            if not result.match and text:
+                match = registry.best_match(text, vector)
+                if match:
+                    result = MatchResponse(match=True, vehicle_id=match[0], confidence=match[1],
+                                           details="Matched a vehicle registered in this run")
+
+            if result.match:
+                match_id = result.vehicle_id
+                counts["matched"] += 1
+                if verbose:
+                    print(f"  -> Matched: {result.vehicle_id} (Confidence: {result.confidence:.2f})")
+            else:
+                # No match found in official catalog.
+                # Create a new entry in the Unified Catalog (vehicles table)
+                match_id = soc_id(partner_id)
+                if match_id in taken:
+                    if taken[match_id] != description:
+                        raise ValueError(f"{match_id} already exists as '{taken[match_id]}'")
+                    # Same vehicle, registered by an earlier run
+                    counts["matched"] += 1
+                    if verbose:
+                        print(f"  -> Already registered as {match_id}")
+                    updates.append({"id": partner_id, "match_id": match_id, "processed": True})
+                    continue
+                if verbose:
+                    print(f"  -> No match found. Registering as new vehicle: {match_id}")
+                new_vehicles.append({"id": match_id, "name": description})
+
+                # Make it matchable for the rest of this run
+                if text:
+                    registry.add(match_id, text, vector)
+                counts["registered"] += 1
+
+            updates.append({"id": partner_id, "match_id": match_id, "processed": True})
+        except Exception as e:
+            # Left unprocessed, so the next run retries it
+            print(f"  -> Error processing vehicle {partner_id}: {e}")
+            counts["errors"] += 1
+            counts["failed"].append(partner_id)
+
+    if new_vehicles:
+        db.bulk_insert_mappings(Vehicle, new_vehicles)
+        # Searchable by the chunks matched from now on
+        similarity_service.add_vehicles([(v["id"], v["name"]) for v in new_vehicles], persist=False)
+    db.bulk_update_mappings(PartnerVehicle, updates)
+    db.commit()
+
+    if new_vehicles:
+        # Persisted after the commit, so the index never holds vehicles
+        # that are not in the catalog
+        similarity_service.save_delta()
+    return counts
+
+def process_vehicles(chunk_size: int = 1000, workers: int = 4, verbose: bool = False):
+    db = SessionLocal()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="partner-match")
+    try:
+        total = db.query(PartnerVehicle).filter(PartnerVehicle.processed == False).count()
+        print(f"Found {total} unprocessed vehicles.")
+
+        start = time.perf_counter()
+        done = 0
+        registered = 0
+        errors = 0
+        failed = []
+        registry = RunRegistry()
+
+        rows = fetch_chunk(db, None, chunk_size)
+        pending = start_matching(executor, rows, workers)
+        while rows:
+            chunk_start = time.perf_counter()
+            results = collect_results(pending)
+
+            # Match the next chunk while this one is written
+            next_rows = fetch_chunk(db, rows[-1][0], chunk_size)
+            pending = start_matching(executor, next_rows, workers)
+
+            counts = write_chunk(db, rows, results, registry, verbose)
+            done += len(rows)
+            registered += counts["registered"]
+            errors += counts["errors"]
+            failed.extend(counts["failed"])
+
+            elapsed = time.perf_counter() - start
+            print(f"Committed {done}/{total} rows up to ID {rows[-1][0]}: "
+                  f"{counts['matched']} matched, {counts['registered']} registered, {counts['errors']} errors "
+                  f"({len(rows) / (time.perf_counter() - chunk_start):.1f} rows/s, {done / elapsed:.1f} rows/s overall)")
+            rows = next_rows
+
+        print(f"Batch processing complete. Unified Catalog updated. "
+              f"{done} rows, {registered} new vehicles, {errors} errors "
+              f"in {time.perf_counter() - start:.1f}s.")
+        if failed:
+            # Still unprocessed, so a rerun retries them
+            print(f"Failed IDs: {', '.join(str(partner_id) for partner_id in failed)}")
 
     except Exception as e:
+        # Chunks committed so far are kept; a rerun resumes after them
         print(f"Critical Error: {e}")
         db.rollback()
     finally:
+        executor.shutdown(wait=True)
         db.close()
 
 if __name__ == "__main__":
-    process_vehicles()
+    parser = argparse.ArgumentParser(description="Match unprocessed partner vehicles against the catalog.")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Rows matched and committed together")
+    parser.add_argument("--workers", type=int, default=4, help="Matching threads per chunk")
+    parser.add_argument("--verbose", action="store_true", help="Print every row")
+
+    args = parser.parse_args()
+    process_vehicles(args.chunk_size, args.workers, args.verbose)
@@ -0,0 +1,20 @@
+from src.core.matching.similarity_service import similarity_service
+from src.core.matching.alias_index import alias_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AdminController:
+    def reload_index(self) -> dict:
+        logger.info("Index reload requested")
+        reloaded = similarity_service.reload()
+        return {
+            "reloaded": reloaded,
+            **similarity_service.stats()
+        }
+
+    def refresh_aliases(self) -> dict:
+        logger.info("Alias refresh requested")
+        return alias_index.refresh()
+
+admin_controller = AdminController()
@@ -0,0 +1,35 @@
+from typing import List
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from src.core.config.settings import settings
+from src.core.jobs.job_service import job_service
+from src.schemas.match_request import MatchRequest
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class JobsController:
+    def create_job(self, requests: List[MatchRequest]) -> dict:
+        logger.info(f"Received match job with {len(requests)} items")
+        return job_service.submit(req.vehicle_name for req in requests)
+
+    async def upload_job(self, request: Request) -> dict:
+        # The body is spooled to disk as it arrives, never held in memory
+        os.makedirs(settings.JOBS_DIR, exist_ok=True)
+        path = os.path.join(settings.JOBS_DIR, f"upload-{uuid.uuid4().hex}")
+        with open(path, 'wb') as f:
+            async for chunk in request.stream():
+                f.write(chunk)
+
+        logger.info(f"Received match job upload of {os.path.getsize(path)} bytes")
+        return await run_in_threadpool(job_service.submit_upload, path, request.headers.get("content-type", ""))
+
+    def get_job(self, job_id: str) -> dict:
+        return job_service.get_status(job_id)
+
+    def results_path(self, job_id: str) -> str:
+        return job_service.results_path(job_id)
+
+jobs_controller = JobsController()
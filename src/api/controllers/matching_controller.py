@@ -1,20 +1,26 @@
-from typing import List
+from typing import AsyncIterator, List
+from pydantic import ValidationError
+from src.core.config.settings import settings
 from src.schemas.match_request import MatchRequest
 from src.schemas.match_response import MatchResponse
 from src.core.matching.matching_engine import matching_engine
 import logging
 
 from src.core.monitoring.metrics import metrics_service
+import asyncio
+import json
 import time
 
 logger = logging.getLogger(__name__)
 
+MAX_STREAM_LINE_BYTES = 1 << 20
+
 class MatchingController:
     def match_vehicle(self, request: MatchRequest) -> MatchResponse:
         start_time = time.time()
         logger.info(f"Received match request for: {request.vehicle_name}")
         
-        response = matching_engine.process(request.vehicle_name)
+        response = matching_engine.process(request.vehicle_name, request.partner_id)
         
         latency_ms = (time.time() - start_time) * 1000
         metrics_service.record_request(
@@ -27,24 +33,130 @@ class MatchingController:
 
     def match_batch(self, requests: List[MatchRequest]) -> List[MatchResponse]:
         logger.info(f"Received batch match request for {len(requests)} items")
-        results = []
-        for req in requests:
-            # We could record metrics individually here or aggregate
-            # For simplicity, let's record individually by calling match_vehicle logic internally
-            # But to avoid overhead, we'll just process and record
-            start_time = time.time()
-            response = matching_engine.process(req.vehicle_name)
-            latency_ms = (time.time() - start_time) * 1000
-            
+        if not requests:
+            return []
+
+        start_time = time.time()
+        results = matching_engine.process_batch([req.vehicle_name for req in requests], [req.partner_id for req in requests])
+
+        # The batch is processed as a whole, so the latency is amortized per item
+        latency_ms = (time.time() - start_time) * 1000 / len(requests)
+        for response in results:
+            metrics_service.record_request(
+                latency_ms=latency_ms,
+                match_found=response.match,
+                llm_used=response.llm_used
+            )
+
+        return results
+
+    async def match_vehicle_async(self, request: MatchRequest) -> MatchResponse:
+        start_time = time.time()
+        logger.info(f"Received match request for: {request.vehicle_name}")
+        
+        response = await matching_engine.process_async(request.vehicle_name, request.partner_id)
+        
+        latency_ms = (time.time() - start_time) * 1000
+        metrics_service.record_request(
+            latency_ms=latency_ms,
+            match_found=response.match,
+            llm_used=response.llm_used
+        )
+        
+        return response
+
+    async def match_batch_async(self, requests: List[MatchRequest]) -> List[MatchResponse]:
+        logger.info(f"Received batch match request for {len(requests)} items")
+        if not requests:
+            return []
+
+        start_time = time.time()
+        results = await matching_engine.process_batch_async([req.vehicle_name for req in requests],
+                                                           [req.partner_id for req in requests])
+
+        # The batch is processed as a whole, so the latency is amortized per item
+        latency_ms = (time.time() - start_time) * 1000 / len(requests)
+        for response in results:
             metrics_service.record_request(
                 latency_ms=latency_ms,
                 match_found=response.match,
                 llm_used=response.llm_used
             )
-            results.append(response)
-            
+
         return results
 
+    async def match_stream(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        """
+        Matches NDJSON MatchRequest lines as they arrive and yields NDJSON
+        MatchResponse lines, one per input line and in order. Complete lines
+        are collected across network chunks and matched once
+        STREAM_BATCH_SIZE of them are waiting, or STREAM_BATCH_WINDOW_MS
+        after the oldest one arrived, so a slow client still gets results
+        promptly. At most one chunk is read ahead of the results being
+        sent, so memory stays constant whatever the input size.
+        """
+        chunks = chunks.__aiter__()
+        window = settings.STREAM_BATCH_WINDOW_MS / 1000
+        buffer = b""
+        pending = []
+        deadline = None
+        next_chunk = asyncio.ensure_future(chunks.__anext__())
+        try:
+            while True:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+                if not done:
+                    # The window passed before the batch filled up
+                    yield await self._match_lines(pending)
+                    pending, deadline = [], None
+                    continue
+
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                next_chunk = asyncio.ensure_future(chunks.__anext__())
+
+                buffer += chunk
+                lines = buffer.split(b"\n")
+                buffer = lines.pop()
+                if len(buffer) > MAX_STREAM_LINE_BYTES:
+                    raise ValueError(f"Input line longer than {MAX_STREAM_LINE_BYTES} bytes")
+
+                lines = [line for line in lines if line.strip()]
+                if lines and not pending:
+                    deadline = time.monotonic() + window
+                pending.extend(lines)
+                while len(pending) >= settings.STREAM_BATCH_SIZE:
+                    yield await self._match_lines(pending[:settings.STREAM_BATCH_SIZE])
+                    pending = pending[settings.STREAM_BATCH_SIZE:]
+                    deadline = time.monotonic() + window if pending else None
+        finally:
+            next_chunk.cancel()
+
+        if buffer.strip():
+            pending.append(buffer)
+        if pending:
+            yield await self._match_lines(pending)
+
+    async def _match_lines(self, lines: List[bytes]) -> str:
+        requests = []
+        responses = {}
+        for position, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                requests.append((position, MatchRequest(**json.loads(line))))
+            except (ValueError, TypeError, ValidationError) as e:
+                # Invalid lines still get a response, so output lines up with input
+                responses[position] = MatchResponse(match=False, details=f"Invalid request: {e}")
+
+        results = await self.match_batch_async([request for _, request in requests])
+        for (position, _), response in zip(requests, results):
+            responses[position] = response
+
+        return "".join(responses[position].model_dump_json() + "\n" for position in sorted(responses))
+
     def get_metrics(self):
         return metrics_service.get_stats()
 
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
+from src.api.controllers.admin_controller import admin_controller
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"]
+)
+
+@router.post("/reload-index")
+async def reload_index():
+    try:
+        # Loading runs in the background; searches keep using the current index
+        return await run_in_threadpool(admin_controller.reload_index)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/refresh-aliases")
+async def refresh_aliases():
+    try:
+        # Picks up new confirmed partner matches; lookups use the old tables meanwhile
+        return await run_in_threadpool(admin_controller.refresh_aliases)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from typing import List
+from src.schemas.match_request import MatchRequest
+from src.schemas.match_job import MatchJobStatus
+from src.api.controllers.jobs_controller import jobs_controller
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"]
+)
+
+@router.post("/", response_model=MatchJobStatus, status_code=202)
+async def create_job(requests: List[MatchRequest]):
+    try:
+        return await run_in_threadpool(jobs_controller.create_job, requests)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/upload", response_model=MatchJobStatus, status_code=202)
+async def upload_job(request: Request):
+    """
+    Creates a job from the raw request body: NDJSON (application/x-ndjson),
+    CSV (text/csv) or one vehicle name per line (text/plain).
+    """
+    try:
+        return await jobs_controller.upload_job(request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{job_id}", response_model=MatchJobStatus)
+async def get_job(job_id: str):
+    job = await run_in_threadpool(jobs_controller.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.get("/{job_id}/results")
+async def get_job_results(job_id: str):
+    """
+    Streams the results as NDJSON, one MatchResponse per input line, in order.
+    """
+    job = await run_in_threadpool(jobs_controller.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job['status']}")
+    return FileResponse(jobs_controller.results_path(job_id), media_type="application/x-ndjson")
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from typing import List
 from src.schemas.match_request import MatchRequest
 from src.schemas.match_response import MatchResponse
@@ -12,17 +13,39 @@ router = APIRouter(
 @router.post("/", response_model=MatchResponse)
 async def match_vehicle(request: MatchRequest):
     try:
-        return matching_controller.match_vehicle(request)
+        return await matching_controller.match_vehicle_async(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/batch", response_model=List[MatchResponse])
 async def match_batch(requests: List[MatchRequest]):
     try:
-        return matching_controller.match_batch(requests)
+        return await matching_controller.match_batch_async(requests)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class RequestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body is produced while the request body is
+    still being read. Starlette's disconnect listener would consume the
+    request's body messages, so it is not started; a client disconnect
+    surfaces through request.stream() instead.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+@router.post("/batch/stream")
+async def match_batch_stream(request: Request):
+    """
+    Streaming batch match: send MatchRequest objects as NDJSON (chunked
+    uploads work), receive one MatchResponse per line as NDJSON while the
+    rest of the input is still being read.
+    """
+    return RequestStreamingResponse(
+        matching_controller.match_stream(request.stream()),
+        media_type="application/x-ndjson"
+    )
+
 @router.get("/metrics")
 async def get_metrics():
     return matching_controller.get_metrics()
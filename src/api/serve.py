@@ -0,0 +1,120 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.monitoring.memory import memory_report
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def preload():
+    """
+    Loads the app, the embedding model, the vector index with its row
+    lookup and the alias tables in the parent process. Forked workers then
+    share these pages copy-on-write instead of each building their own copy.
+    """
+    from src.api.server import app
+    from src.core.config.settings import settings
+    from src.core.db.database import engine
+    from src.core.matching.alias_index import alias_index
+    from src.core.matching.embedding_service import embedding_service
+    from src.core.matching.similarity_service import similarity_service
+
+    # Services load lazily, so force the load before forking. No encode is
+    # run here: inference thread pools do not survive fork
+    similarity_service.warm_up()
+    embedding_service.model
+    if settings.ALIAS_FAST_PATH:
+        alias_index.refresh()
+        # Connections opened for the alias query must not be shared by the workers
+        engine.dispose()
+    logger.info(f"Preloaded model {embedding_service.model.__class__.__name__} "
+                f"and index generation {similarity_service.generation}")
+    return app
+
+def run_worker(app, sock: socket.socket, worker_id: int):
+    import uvicorn
+
+    report = memory_report()
+    logger.info(f"Worker {worker_id} started: {report}")
+
+    config = uvicorn.Config(app, log_level="info")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+
+def serve(host: str, port: int, workers: int):
+    app = preload()
+    logger.info(f"Parent memory after preload: {memory_report()}")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Keep the garbage collector from touching (and so copying) preloaded objects
+    gc.freeze()
+
+    children = {}
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                run_worker(app, sock, worker_id)
+            finally:
+                os._exit(0)
+        children[pid] = worker_id
+
+    for worker_id in range(workers):
+        spawn(worker_id)
+    logger.info(f"Serving on http://{host}:{port} with {workers} workers")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        worker_id = children.pop(pid, None)
+        if worker_id is not None and not stopping:
+            logger.warning(f"Worker {worker_id} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(1)
+            spawn(worker_id)
+
+    sock.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API with pre-forked workers sharing model and index memory.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
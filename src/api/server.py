@@ -1,17 +1,62 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from src.core.config.settings import settings
-from src.api.routers import matching_router
+from src.api.routers import matching_router, admin_router, jobs_router
+from src.core.matching.execution_service import execution_service
+from src.core.matching.embedding_service import embedding_service
+from src.core.matching.similarity_service import similarity_service
+from src.core.matching.alias_index import alias_index
+from src.core.jobs.job_service import job_service
+from src.core.monitoring.metrics import metrics_service
+from src.core.monitoring.memory import memory_report
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def warm_up():
+    """
+    Loads the index, the embedding model and the alias tables ahead of
+    the first request.
+    """
+    try:
+        similarity_service.warm_up()
+        embedding_service.warm_up()
+        if settings.ALIAS_FAST_PATH:
+            alias_index.refresh()
+        logger.info("Warm-up finished, service is ready")
+    except Exception as e:
+        logger.error(f"Warm-up failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: the server accepts connections (and
+    # answers /health) right away, /ready reports when loading is done
+    warmup_task = None
+    if settings.WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(run_in_threadpool(warm_up))
+    # Pick up rebuilt indexes without a restart
+    similarity_service.start_watcher(settings.INDEX_WATCH_INTERVAL)
+    # Background batch jobs, including those left over from a previous run
+    job_service.start()
+    yield
+    job_service.stop()
+    if warmup_task is not None and not warmup_task.done():
+        await warmup_task
+    similarity_service.stop_watcher()
+    # Release the inference thread pool on shutdown
+    execution_service.shutdown()
+
 app = FastAPI(
     title="Vehicle Matching API",
     description="API for homologating vehicle names using semantic search and LLMs.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -23,13 +68,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-process memory, to check sharing between pre-forked workers
+metrics_service.register_source("memory", memory_report)
+
 # Include routers
 app.include_router(matching_router.router)
+app.include_router(admin_router.router)
+app.include_router(jobs_router.router)
 
 @app.get("/health")
 async def health_check():
+    # Liveness only: does not wait for the model or the index
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    status = {
+        "model_loaded": embedding_service.is_loaded,
+        "index_loaded": similarity_service.is_loaded
+    }
+    if all(status.values()):
+        return {"status": "ready", **status}
+    if similarity_service.load_error:
+        # The index failed to load (missing or invalid files): report why
+        # instead of looking like a load still in progress
+        return JSONResponse(status_code=503, content={"status": "error", **status,
+                                                      "index_error": similarity_service.load_error})
+    return JSONResponse(status_code=503, content={"status": "loading", **status})
+
 @app.get("/")
 async def root():
     from fastapi.responses import RedirectResponse
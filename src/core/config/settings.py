@@ -4,10 +4,61 @@ from pydantic_settings import BaseSettings
 class Settings(BaseSettings):
     DB_URL: str = os.getenv("DB_URL", "sqlite:///./sql_app.db")
     MODEL_NAME: str = os.getenv("MODEL_NAME", "all-MiniLM-L6-v2")
+    EMBEDDING_BACKEND: str = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx | onnx-int8
+    EMBEDDING_ONNX_DIR: str = os.getenv("EMBEDDING_ONNX_DIR", "")  # where the int8 export is kept
+    EMBEDDING_QUANTIZATION: str = os.getenv("EMBEDDING_QUANTIZATION", "avx2")  # arm64 | avx2 | avx512 | avx512_vnni
     LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     SIM_THRESHOLD: float = float(os.getenv("SIM_THRESHOLD", "0.8"))
     VECTOR_INDEX_PATH: str = os.getenv("VECTOR_INDEX_PATH", "src/vector_store/index.faiss")
+    INDEX_TYPE: str = os.getenv("INDEX_TYPE", "flat")  # flat | hnsw | ivf_flat | ivf_pq
+    INDEX_NLIST: int = int(os.getenv("INDEX_NLIST", "1024"))
+    INDEX_NPROBE: int = int(os.getenv("INDEX_NPROBE", "16"))
+    INDEX_PQ_M: int = int(os.getenv("INDEX_PQ_M", "16"))
+    INDEX_PQ_NBITS: int = int(os.getenv("INDEX_PQ_NBITS", "8"))
+    INDEX_HNSW_M: int = int(os.getenv("INDEX_HNSW_M", "32"))
+    INDEX_EF_CONSTRUCTION: int = int(os.getenv("INDEX_EF_CONSTRUCTION", "200"))
+    INDEX_EF_SEARCH: int = int(os.getenv("INDEX_EF_SEARCH", "64"))
+    INDEX_BUILD_CHUNK_SIZE: int = int(os.getenv("INDEX_BUILD_CHUNK_SIZE", "10000"))  # vehicles per build chunk
+    INDEX_CHECKPOINT_EVERY: int = int(os.getenv("INDEX_CHECKPOINT_EVERY", "10"))  # chunks between checkpoints
+    INDEX_REPORT_QUERIES: int = int(os.getenv("INDEX_REPORT_QUERIES", "1000"))
+    INDEX_MMAP: bool = os.getenv("INDEX_MMAP", "false").lower() == "true"  # read-only mapping, copied into memory on the first incremental update
+    INDEX_WATCH_INTERVAL: float = float(os.getenv("INDEX_WATCH_INTERVAL", "0"))  # seconds, 0 disables
+    LEXICAL_SEARCH: bool = os.getenv("LEXICAL_SEARCH", "true").lower() == "true"  # BM25 first stage fused with vector search
+    LEXICAL_MAX_DF: float = float(os.getenv("LEXICAL_MAX_DF", "0.2"))  # skip query terms in more than this share of the catalog
+    LEXICAL_RRF_K: int = int(os.getenv("LEXICAL_RRF_K", "60"))
+    MAKE_BLOCKING: bool = os.getenv("MAKE_BLOCKING", "true").lower() == "true"  # search only the rows of the query's make
+    BLOCK_EXACT_MAX: int = int(os.getenv("BLOCK_EXACT_MAX", "5000"))  # make blocks up to this many rows are searched exactly
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", "4"))
+    INFERENCE_MAX_CONCURRENCY: int = int(os.getenv("INFERENCE_MAX_CONCURRENCY", "4"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "30"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "3"))  # retries on timeouts, 429s and 5xx
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    LLM_BASE_URL: str = os.getenv("LLM_BASE_URL", "")  # OpenAI-compatible endpoint, e.g. a local stub
+    LLM_BATCH_SIZE: int = int(os.getenv("LLM_BATCH_SIZE", "16"))  # ambiguous rows per LLM request in batch runs, 1 disables
+    LLM_CACHE_SIZE: int = int(os.getenv("LLM_CACHE_SIZE", "10000"))
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", "")  # SQLite file for answers that survive restarts
+    MICRO_BATCH_ENABLED: bool = os.getenv("MICRO_BATCH_ENABLED", "true").lower() == "true"
+    MICRO_BATCH_WINDOW_MS: float = float(os.getenv("MICRO_BATCH_WINDOW_MS", "5"))
+    MICRO_BATCH_MAX_SIZE: int = int(os.getenv("MICRO_BATCH_MAX_SIZE", "32"))
+    EMBEDDING_BATCH_TOKENS: int = int(os.getenv("EMBEDDING_BATCH_TOKENS", "8192"))  # padded tokens per encode batch
+    EMBEDDING_MAX_BATCH_SIZE: int = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "256"))
+    EMBEDDING_CHUNK_SIZE: int = int(os.getenv("EMBEDDING_CHUNK_SIZE", "4096"))  # texts per streamed chunk
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "50000"))
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "")
+    ALIAS_FAST_PATH: bool = os.getenv("ALIAS_FAST_PATH", "true").lower() == "true"  # exact catalog/confirmed matches skip the pipeline
+    RESULT_CACHE_SIZE: int = int(os.getenv("RESULT_CACHE_SIZE", "100000"))
+    STREAM_BATCH_SIZE: int = int(os.getenv("STREAM_BATCH_SIZE", "64"))  # items per batch in /match/batch/stream
+    STREAM_BATCH_WINDOW_MS: float = float(os.getenv("STREAM_BATCH_WINDOW_MS", "50"))  # max wait for a stream batch to fill
+    JOBS_DIR: str = os.getenv("JOBS_DIR", "data/jobs")
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "1"))  # 0 disables job processing in this process
+    JOBS_BATCH_SIZE: int = int(os.getenv("JOBS_BATCH_SIZE", "256"))
+    JOBS_MAX_ROWS_PER_SECOND: float = float(os.getenv("JOBS_MAX_ROWS_PER_SECOND", "0"))  # 0 = unlimited
+    JOBS_NICE: int = int(os.getenv("JOBS_NICE", "10"))  # CPU priority of job threads relative to requests
+    JOBS_POLL_INTERVAL: float = float(os.getenv("JOBS_POLL_INTERVAL", "1"))
+    JOBS_LEASE_SECONDS: float = float(os.getenv("JOBS_LEASE_SECONDS", "60"))
 
     class Config:
         env_file = ".env"
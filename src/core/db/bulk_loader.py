@@ -0,0 +1,156 @@
+import csv
+import time
+from sqlalchemy import column, insert, inspect, select, table as sql_table
+from sqlalchemy.dialects import postgresql, sqlite
+from src.core.db.database import engine
+from src.core.db.models.vehicle import Vehicle
+from src.core.db.models.partner_vehicle import PartnerVehicle
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# Fast-path settings for bulk writes. WAL with synchronous=NORMAL is still
+# crash safe for committed transactions; only the last ones may be lost on
+# power failure
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144"
+)
+
+def read_chunks(path: str, columns: list, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Streams a CSV or Parquet file and yields lists of dicts with the
+    requested columns, chunk_size rows at a time.
+    Parquet files need pyarrow (`pip install pyarrow`).
+    """
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet files requires pyarrow: pip install pyarrow")
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pylist()
+        return
+
+    with open(path, mode='r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        missing = [c for c in columns if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{path} is missing columns {missing}")
+
+        chunk = []
+        for row in reader:
+            chunk.append({c: row[c] for c in columns})
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def upsert_statement(table, key: str, columns: list):
+    """
+    INSERT ... ON CONFLICT (key) DO UPDATE for the engine's dialect.
+    """
+    if engine.dialect.name == "sqlite":
+        stmt = sqlite.insert(table)
+    elif engine.dialect.name == "postgresql":
+        stmt = postgresql.insert(table)
+    else:
+        raise ValueError(f"Upserts are not supported for {engine.dialect.name}")
+    return stmt.on_conflict_do_update(index_elements=[key], set_={c: stmt.excluded[c] for c in columns})
+
+def _connect():
+    conn = engine.connect()
+    if engine.dialect.name == "sqlite":
+        for pragma in SQLITE_PRAGMAS:
+            conn.exec_driver_sql(pragma)
+        conn.commit()
+    return conn
+
+def _report(label: str, done: int, start: float):
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {done} rows ({done / elapsed if elapsed > 0 else 0:.0f} rows/s)")
+
+def load_vehicles(path: str, id_column: str = "id_crabi", name_column: str = "versionc",
+                  chunk_size: int = DEFAULT_CHUNK_SIZE, update_index: bool = False) -> int:
+    """
+    Upserts catalog vehicles from a CSV/Parquet file on Vehicle.id, one
+    executemany and one transaction per chunk.
+    With update_index, new and renamed vehicles are also added to the
+    vector index as an incremental delta (unchanged ones are not re-embedded).
+    Returns the number of rows loaded.
+    """
+    if update_index:
+        from src.core.matching.similarity_service import similarity_service
+
+    table = Vehicle.__table__
+    stmt = upsert_statement(table, "id", ["name"])
+    done = 0
+    indexed = 0
+    start = time.perf_counter()
+
+    with _connect() as conn:
+        for chunk in read_chunks(path, [id_column, name_column], chunk_size):
+            rows = [{"id": str(r[id_column]), "name": r[name_column]}
+                    for r in chunk if r[id_column] and r[name_column]]
+            if not rows:
+                continue
+
+            with conn.begin():
+                conn.execute(stmt, rows)
+            done += len(rows)
+
+            if update_index:
+                indexed += similarity_service.add_vehicles([(r["id"], r["name"]) for r in rows], persist=False)
+            _report("Vehicles loaded", done, start)
+
+    if update_index and indexed:
+        similarity_service.save_delta()
+        print(f"Added {indexed} new or changed vehicles to the index.")
+    return done
+
+def load_partner_vehicles(path: str, description_column: str = "descripcion",
+                          chunk_size: int = DEFAULT_CHUNK_SIZE, partner_id: str = None) -> int:
+    """
+    Inserts partner vehicles from a CSV/Parquet file, skipping descriptions
+    that are already loaded for the same partner. Returns the number of
+    rows inserted.
+    Only writes the columns the table has, so it also seeds the schema
+    before migration 003 (no partner_id) as long as partner_id is None.
+    """
+    done = 0
+    start = time.perf_counter()
+
+    scoped = "partner_id" in {c["name"] for c in inspect(engine).get_columns(PartnerVehicle.__tablename__)}
+    if partner_id is not None and not scoped:
+        raise ValueError("partner_vehicles has no partner_id column, run migration 003 first")
+
+    # A plain table clause, so model defaults for columns the table may not
+    # have yet (confirmed) are not sent
+    columns = ["description", "processed"] + (["partner_id"] if scoped else [])
+    table = sql_table(PartnerVehicle.__tablename__, *(column(c) for c in columns))
+    same_partner = []
+    if scoped:
+        same_partner.append(table.c.partner_id.is_(None) if partner_id is None else table.c.partner_id == partner_id)
+
+    with _connect() as conn:
+        for chunk in read_chunks(path, [description_column], chunk_size):
+            # Dedupe within the chunk, then against the table
+            descriptions = list(dict.fromkeys(r[description_column] for r in chunk if r[description_column]))
+            if not descriptions:
+                continue
+
+            with conn.begin():
+                existing = set(conn.execute(
+                    select(table.c.description).where(table.c.description.in_(descriptions), *same_partner)
+                ).scalars())
+                rows = [{"description": d, "processed": False, **({"partner_id": partner_id} if scoped else {})}
+                        for d in descriptions if d not in existing]
+                if rows:
+                    conn.execute(insert(table), rows)
+            done += len(rows)
+            _report("Partner vehicles loaded", done, start)
+
+    return done
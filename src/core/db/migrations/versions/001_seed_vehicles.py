@@ -5,7 +5,6 @@ Revises:
 Create Date: 2024-01-01 00:00:00.000000
 
 """
-import csv
 import os
 import sys
 from sqlalchemy import text
@@ -14,7 +13,7 @@ from sqlalchemy import text
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../../')))
 
 from src.core.db.database import SessionLocal
-from src.core.db.models.vehicle import Vehicle
+from src.core.db.bulk_loader import load_vehicles
 
 # revision identifiers, used by Alembic.
 revision = '001'
@@ -23,7 +22,6 @@ branch_labels = None
 depends_on = None
 
 def upgrade():
-    db = SessionLocal()
     try:
         # Path to the CSV file (relative to this script)
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -34,29 +32,13 @@ def upgrade():
             return
 
         print(f"Seeding data from {csv_path}...")
-        
-        with open(csv_path, mode='r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            vehicles = []
-            for row in reader:
-                # Map CSV columns to model fields
-                # CSV: versionc, id_crabi
-                vehicle = Vehicle(
-                    id=row['id_crabi'],
-                    name=row['versionc']
-                )
-                vehicles.append(vehicle)
-            
-            # Bulk insert
-            db.add_all(vehicles)
-            db.commit()
-            print(f"Successfully seeded {len(vehicles)} vehicles.")
+
+        # CSV: versionc, id_crabi; upserted in bulk on the vehicle id
+        count = load_vehicles(csv_path, id_column='id_crabi', name_column='versionc')
+        print(f"Successfully seeded {count} vehicles.")
             
     except Exception as e:
         print(f"Error seeding data: {e}")
-        db.rollback()
-    finally:
-        db.close()
 
 def downgrade():
     db = SessionLocal()
@@ -0,0 +1,50 @@
+"""partner aliases
+
+Revision ID: 003
+Revises: 001
+Create Date: 2024-01-01 00:00:00.000000
+
+"""
+import os
+import sys
+from sqlalchemy import inspect, text
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../../')))
+
+from src.core.db.database import engine
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+# partner_id scopes a description to one partner; confirmed marks match_ids
+# checked by a person, which the API uses as exact aliases
+COLUMNS = {
+    "partner_id": "VARCHAR",
+    "confirmed": "BOOLEAN DEFAULT FALSE"
+}
+
+# Errors are not caught: a half-applied schema change must stop the deploy
+def upgrade():
+    existing = {column["name"] for column in inspect(engine).get_columns("partner_vehicles")}
+    with engine.begin() as conn:
+        for name, definition in COLUMNS.items():
+            if name not in existing:
+                print(f"Adding partner_vehicles.{name}...")
+                conn.execute(text(f"ALTER TABLE partner_vehicles ADD COLUMN {name} {definition}"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_partner_vehicles_partner_id ON partner_vehicles (partner_id)"))
+    print("Partner alias columns are in place.")
+
+def downgrade():
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_partner_vehicles_partner_id"))
+        for name in COLUMNS:
+            conn.execute(text(f"ALTER TABLE partner_vehicles DROP COLUMN {name}"))
+    print("Partner alias columns removed.")
+
+if __name__ == "__main__":
+    # Allow running directly for testing
+    upgrade()
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Float
+from src.core.db.database import Base
+
+class MatchJob(Base):
+    __tablename__ = "match_jobs"
+
+    id = Column(String, primary_key=True, index=True)
+    status = Column(String, index=True, default="queued")  # queued | running | done | failed
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(Float)
+    updated_at = Column(Float)
+    # Last heartbeat of the worker running the job; a running job whose
+    # heartbeat is older than the lease is picked up again
+    heartbeat_at = Column(Float, nullable=True)
+    # Token of the claim holding the lease; writes by any other claim are ignored
+    owner = Column(String, nullable=True)
@@ -5,6 +5,8 @@ class PartnerVehicle(Base):
     __tablename__ = "partner_vehicles"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    partner_id = Column(String, nullable=True, index=True)  # None: shared by all partners
     description = Column(String, index=True)
     processed = Column(Boolean, default=False)
     match_id = Column(String, nullable=True)
+    confirmed = Column(Boolean, default=False)  # match_id checked by a person, used as an alias
@@ -0,0 +1,333 @@
+import csv
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+from sqlalchemy import and_, inspect, or_, text, update
+from src.core.config.settings import settings
+from src.core.db.database import Base, SessionLocal, engine
+from src.core.db.models.match_job import MatchJob
+from src.core.matching.execution_service import execution_service
+from src.core.matching.matching_engine import matching_engine
+
+logger = logging.getLogger(__name__)
+
+class LeaseLost(Exception):
+    """
+    The job was claimed by another worker after this worker's lease expired.
+    """
+
+class JobService:
+    """
+    Background batch matching. Jobs are rows in match_jobs; their input and
+    results are NDJSON files in JOBS_DIR, one line per vehicle, so a job of
+    any size never has to be held in memory. Workers claim jobs through the
+    table, which lets jobs survive restarts and be shared by several
+    processes. A claim holds a lease renewed by a heartbeat thread; every
+    write of the worker is conditioned on still holding it.
+    """
+    def __init__(self):
+        self._threads = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._table_ready = False
+
+    def input_path(self, job_id: str) -> str:
+        return os.path.join(settings.JOBS_DIR, f"{job_id}.input.ndjson")
+
+    def results_path(self, job_id: str) -> str:
+        return os.path.join(settings.JOBS_DIR, f"{job_id}.results.ndjson")
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            Base.metadata.create_all(bind=engine, tables=[MatchJob.__table__])
+            # Tables created before leases had owners
+            if "owner" not in {column["name"] for column in inspect(engine).get_columns(MatchJob.__tablename__)}:
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {MatchJob.__tablename__} ADD COLUMN owner VARCHAR"))
+            self._table_ready = True
+
+    def submit(self, vehicle_names) -> dict:
+        """
+        Creates a queued job from an iterable of vehicle names.
+        """
+        self._ensure_table()
+        job_id = uuid.uuid4().hex
+        os.makedirs(settings.JOBS_DIR, exist_ok=True)
+
+        total = 0
+        input_path = self.input_path(job_id)
+        with open(input_path + '.tmp', 'w', encoding='utf-8') as f:
+            for name in vehicle_names:
+                f.write(json.dumps(name) + "\n")
+                total += 1
+        os.replace(input_path + '.tmp', input_path)
+
+        now = time.time()
+        db = SessionLocal()
+        try:
+            job = MatchJob(id=job_id, status="queued", total=total, processed=0, created_at=now, updated_at=now)
+            db.add(job)
+            db.commit()
+            status = self._status(job)
+        finally:
+            db.close()
+
+        logger.info(f"Job {job_id} queued with {total} vehicles")
+        self._wake.set()
+        return status
+
+    def submit_upload(self, path: str, content_type: str = "") -> dict:
+        """
+        Creates a job from an uploaded file and deletes the file.
+        """
+        try:
+            return self.submit(read_upload(path, content_type))
+        finally:
+            os.remove(path)
+
+    def get_status(self, job_id: str) -> dict:
+        self._ensure_table()
+        db = SessionLocal()
+        try:
+            job = db.get(MatchJob, job_id)
+            return self._status(job) if job is not None else None
+        finally:
+            db.close()
+
+    def _status(self, job: MatchJob) -> dict:
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "total": job.total,
+            "processed": job.processed,
+            "progress_percent": round((job.processed / job.total * 100) if job.total else 100.0, 2),
+            "error": job.error,
+            "created_at": job.created_at,
+            "updated_at": job.updated_at
+        }
+
+    def start(self, workers: int = None):
+        """
+        Starts the worker threads. Queued jobs, and running jobs whose
+        worker stopped heartbeating, are picked up from the table.
+        """
+        workers = settings.JOBS_WORKERS if workers is None else workers
+        if self._threads or workers <= 0:
+            return
+
+        self._ensure_table()
+        self._stop.clear()
+        for i in range(workers):
+            thread = threading.Thread(target=self._worker, name=f"match-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {workers} match job workers")
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=30)
+        self._threads = []
+
+    def _worker(self):
+        self._lower_priority()
+        while not self._stop.is_set():
+            try:
+                claim = self._claim()
+            except Exception as e:
+                logger.error(f"Could not claim match job: {e}")
+                claim = None
+
+            if claim is None:
+                self._wake.wait(settings.JOBS_POLL_INTERVAL)
+                self._wake.clear()
+                continue
+            self._run(*claim)
+
+    def _lower_priority(self):
+        # Linux schedules threads individually, so only this thread is reniced
+        if settings.JOBS_NICE > 0 and hasattr(os, "setpriority"):
+            try:
+                thread_id = threading.get_native_id()
+                os.setpriority(os.PRIO_PROCESS, thread_id, os.getpriority(os.PRIO_PROCESS, thread_id) + settings.JOBS_NICE)
+            except OSError as e:
+                logger.warning(f"Could not lower job worker priority: {e}")
+
+    def _claim(self) -> tuple:
+        """
+        Atomically marks the oldest claimable job as running under a new
+        owner token and returns (job_id, owner), or None.
+        """
+        now = time.time()
+        claimable = or_(
+            MatchJob.status == "queued",
+            and_(MatchJob.status == "running", MatchJob.heartbeat_at < now - settings.JOBS_LEASE_SECONDS)
+        )
+        db = SessionLocal()
+        try:
+            candidates = db.query(MatchJob.id).filter(claimable).order_by(MatchJob.created_at).limit(5).all()
+            for (job_id,) in candidates:
+                owner = uuid.uuid4().hex
+                claimed = db.execute(
+                    update(MatchJob).where(MatchJob.id == job_id, claimable)
+                    .values(status="running", owner=owner, heartbeat_at=now, updated_at=now)
+                ).rowcount
+                db.commit()
+                if claimed:
+                    return job_id, owner
+            return None
+        finally:
+            db.close()
+
+    def _update(self, job_id: str, owner: str, release: bool = False, **values):
+        """
+        Writes values and renews the lease (or gives it up with release),
+        only if owner still holds it. Raises LeaseLost otherwise.
+        """
+        now = time.time()
+        if values:
+            values["updated_at"] = now
+        if release:
+            values["owner"] = None
+        db = SessionLocal()
+        try:
+            updated = db.execute(
+                update(MatchJob).where(MatchJob.id == job_id, MatchJob.owner == owner)
+                .values(heartbeat_at=now, **values)
+            ).rowcount
+            db.commit()
+        finally:
+            db.close()
+        if not updated:
+            raise LeaseLost(f"Job {job_id} is no longer held by this worker")
+
+    def _heartbeat(self, job_id: str, owner: str, finished: threading.Event):
+        # Renews the lease independently of how long a batch takes
+        while not finished.wait(settings.JOBS_LEASE_SECONDS / 3):
+            try:
+                self._update(job_id, owner)
+            except LeaseLost:
+                return
+            except Exception as e:
+                logger.error(f"Could not renew the lease of job {job_id}: {e}")
+
+    def _run(self, job_id: str, owner: str):
+        logger.info(f"Running job {job_id}")
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, owner, finished),
+                                     name=f"match-job-heartbeat-{job_id[:8]}", daemon=True)
+        heartbeat.start()
+        try:
+            # Results already written by a previous run are kept
+            done = recover_results(self.results_path(job_id))
+            self._update(job_id, owner, processed=done)
+
+            with open(self.input_path(job_id), 'r', encoding='utf-8') as inputs, \
+                 open(self.results_path(job_id), 'a', encoding='utf-8') as results:
+                batch = []
+                for line_number, line in enumerate(inputs):
+                    if line_number < done:
+                        continue
+                    batch.append(json.loads(line))
+                    if len(batch) >= settings.JOBS_BATCH_SIZE:
+                        done = self._process_batch(job_id, owner, batch, results, done)
+                        batch = []
+                        if self._stop.is_set():
+                            # Shutting down: hand the job back for the next start
+                            self._update(job_id, owner, status="queued", release=True)
+                            return
+                if batch:
+                    done = self._process_batch(job_id, owner, batch, results, done)
+
+            self._update(job_id, owner, status="done", processed=done, release=True)
+            logger.info(f"Job {job_id} finished: {done} vehicles")
+        except LeaseLost as e:
+            # Another worker took the job over; it owns the results file now
+            logger.warning(f"{e}, stopping")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            try:
+                self._update(job_id, owner, status="failed", error=str(e), release=True)
+            except LeaseLost:
+                pass
+        finally:
+            finished.set()
+
+    def _process_batch(self, job_id: str, owner: str, batch: list, results, done: int) -> int:
+        self._yield_to_requests()
+        start = time.perf_counter()
+
+        responses = matching_engine.process_batch(batch)
+        # The batch may have outlived the lease: only the holder appends
+        self._update(job_id, owner)
+        results.write("".join(response.model_dump_json() + "\n" for response in responses))
+        results.flush()
+        done += len(batch)
+        self._update(job_id, owner, processed=done)
+
+        # Rate limit so jobs leave capacity for interactive traffic
+        if settings.JOBS_MAX_ROWS_PER_SECOND > 0:
+            remaining = len(batch) / settings.JOBS_MAX_ROWS_PER_SECOND - (time.perf_counter() - start)
+            if remaining > 0:
+                self._stop.wait(remaining)
+        return done
+
+    def _yield_to_requests(self):
+        # Interactive requests in this process go first, for at most one
+        # poll interval per batch so jobs still make progress under load
+        deadline = time.monotonic() + settings.JOBS_POLL_INTERVAL
+        while execution_service.inference_in_flight > 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+def recover_results(path: str) -> int:
+    """
+    Number of complete result lines in path. A partially written last line
+    (the process died mid-write) is truncated away.
+    """
+    if not os.path.exists(path):
+        return 0
+
+    count = 0
+    complete = 0
+    position = 0
+    with open(path, 'rb+') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            count += chunk.count(b"\n")
+            last = chunk.rfind(b"\n")
+            if last != -1:
+                complete = position + last + 1
+            position += len(chunk)
+        f.truncate(complete)
+    return count
+
+def read_upload(path: str, content_type: str = ""):
+    """
+    Yields vehicle names from an uploaded file:
+      NDJSON  one MatchRequest object (or JSON string) per line
+      CSV     a vehicle_name or descripcion column, else the first column
+      text    one vehicle name per line
+    """
+    content_type = content_type.split(";")[0].strip().lower()
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl") or path.endswith((".ndjson", ".jsonl")):
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    yield item["vehicle_name"] if isinstance(item, dict) else str(item)
+        elif content_type == "text/csv" or path.endswith(".csv"):
+            reader = csv.reader(f)
+            header = next(reader, [])
+            column = next((header.index(c) for c in ("vehicle_name", "descripcion") if c in header), 0)
+            for row in reader:
+                if len(row) > column and row[column]:
+                    yield row[column]
+        else:
+            for line in f:
+                if line.strip():
+                    yield line.strip()
+
+job_service = JobService()
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from typing import Optional
+from src.core.db.database import SessionLocal
+from src.core.db.models.partner_vehicle import PartnerVehicle
+from src.core.matching.similarity_service import similarity_service
+from src.core.monitoring.metrics import metrics_service
+from src.core.normalization.normalizer import normalizer
+
+logger = logging.getLogger(__name__)
+
+class AliasIndex:
+    """
+    Exact lookup of normalized text -> vehicle_id, checked before any
+    encode, search or LLM work. Built from the catalog names and from the
+    confirmed PartnerVehicle matches (e.g. set with scripts/manual_match.py).
+    Confirmed rows with a partner_id only apply to that partner and take
+    precedence over the shared aliases.
+
+    Lookups only read tables that are already built, so they never run a
+    query or scan the catalog inside a request. The tables are built by
+    warm-up (or preload), rebuilt by refresh() and whenever the similarity
+    service swaps in a new index generation; a lookup before the first
+    build is a miss that starts the build in the background.
+    """
+    def __init__(self):
+        # (shared aliases, {partner_id: aliases}, index generation)
+        self._tables = None
+        self._lock = threading.Lock()
+        self._building = False
+        self.built_at = None
+        # Runs in the thread that reloaded the index, not in a request
+        similarity_service.on_swap(lambda state: self.refresh())
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        metrics_service.register_source("aliases", self.stats)
+
+    def lookup(self, normalized_text: str, partner_id: str = None) -> Optional[str]:
+        """
+        The vehicle_id aliased to normalized_text for this partner, or None.
+        """
+        tables = self._tables
+        if tables is None:
+            self._build_in_background()
+            self.misses += 1
+            return None
+        shared, partners, _ = tables
+
+        vehicle_id = None
+        if partner_id is not None and partner_id in partners:
+            vehicle_id = partners[partner_id].get(normalized_text)
+        if vehicle_id is None:
+            vehicle_id = shared.get(normalized_text)
+
+        if vehicle_id is None:
+            self.misses += 1
+            return None
+        if not similarity_service.has_vehicle(vehicle_id):
+            # Removed from the catalog since the last refresh
+            self.stale += 1
+            return None
+        self.hits += 1
+        return vehicle_id
+
+    def refresh(self) -> dict:
+        """
+        Rebuilds the alias tables from the loaded catalog and the database.
+        """
+        self._build(self._tables, force=True)
+        return self.stats()
+
+    def _build_in_background(self):
+        if self._building:
+            return
+        self._building = True
+
+        def build():
+            try:
+                self._build(None)
+            except Exception as e:
+                logger.error(f"Alias index build failed: {e}")
+            finally:
+                self._building = False
+
+        threading.Thread(target=build, name="alias-build", daemon=True).start()
+
+    def _build(self, seen, force: bool = False) -> tuple:
+        with self._lock:
+            # Another thread may have rebuilt the tables while this one waited
+            if not force and self._tables is not seen:
+                return self._tables
+
+            start = time.perf_counter()
+            # Loaded first, so the generation is the one the tables are built from
+            similarity_service.load()
+            generation = similarity_service.generation
+            shared = self._catalog_aliases()
+            partners = {}
+            confirmed = self._confirmed_matches()
+            normalized = normalizer.normalize_batch([description for _, description, _ in confirmed])
+            for (partner_id, _, match_id), normalized_text in zip(confirmed, normalized):
+                if normalized_text:
+                    aliases = shared if partner_id is None else partners.setdefault(partner_id, {})
+                    aliases[normalized_text] = match_id
+
+            self._tables = (shared, partners, generation)
+            self.built_at = time.time()
+            logger.info(f"Alias index built: {len(shared)} shared aliases, {len(partners)} partners "
+                        f"in {time.perf_counter() - start:.2f}s")
+            return self._tables
+
+    def _catalog_aliases(self) -> dict:
+        aliases = {}
+        ambiguous = set()
+        for entry in similarity_service.vehicle_ids:
+            if not isinstance(entry, tuple) or not entry[1]:
+                continue
+            vehicle_id, name = entry
+            if aliases.setdefault(name, vehicle_id) != vehicle_id:
+                ambiguous.add(name)
+
+        # Names shared by several vehicles are left to the full pipeline
+        for name in ambiguous:
+            del aliases[name]
+        return aliases
+
+    def _confirmed_matches(self) -> list:
+        db = SessionLocal()
+        try:
+            # Later confirmations of the same description win
+            return db.query(PartnerVehicle.partner_id, PartnerVehicle.description, PartnerVehicle.match_id) \
+                .filter(PartnerVehicle.confirmed == True, PartnerVehicle.match_id != None) \
+                .order_by(PartnerVehicle.id).all()
+        except Exception as e:
+            logger.error(f"Could not load confirmed partner matches: {e}")
+            return []
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        tables = self._tables
+        lookups = self.hits + self.misses + self.stale
+        return {
+            "shared_aliases": len(tables[0]) if tables else 0,
+            "partners": len(tables[1]) if tables else 0,
+            "partner_aliases": sum(len(aliases) for aliases in tables[1].values()) if tables else 0,
+            "generation": tables[2] if tables else None,
+            "built_at": self.built_at,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate_percent": round((self.hits / lookups * 100) if lookups > 0 else 0.0, 2)
+        }
+
+alias_index = AliasIndex()
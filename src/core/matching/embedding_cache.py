@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of embeddings keyed on (model name, normalized text).
+    Tier 1 is an in-process LRU bounded by max_entries.
+    Tier 2 is an optional SQLite file that survives restarts.
+    """
+    def __init__(self, model_name: str, max_entries: int = 50000, db_path: str = ""):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        try:
+            if os.path.dirname(db_path):
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.commit()
+            logger.info(f"Embedding cache disk tier at {db_path}")
+        except Exception as e:
+            logger.error(f"Failed to open embedding cache at {db_path}: {e}")
+            self._db = None
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: list) -> list:
+        """
+        Returns a list with the cached vector for each text, or None on a miss.
+        """
+        keys = [self._key(text) for text in texts]
+        results = [None] * len(texts)
+        missing = []
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    results[i] = vector
+                    self.hits += 1
+                else:
+                    missing.append(i)
+
+            if missing and self._db is not None:
+                found = self._read_disk([keys[i] for i in missing])
+                still_missing = []
+                for i in missing:
+                    vector = found.get(keys[i])
+                    if vector is not None:
+                        results[i] = vector
+                        self._store(keys[i], vector)
+                        self.disk_hits += 1
+                    else:
+                        still_missing.append(i)
+                missing = still_missing
+
+            self.misses += len(missing)
+
+        return results
+
+    def put_many(self, texts: list, vectors):
+        keys = [self._key(text) for text in texts]
+        vectors = [np.asarray(v, dtype='float32') for v in vectors]
+
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._store(key, vector)
+
+            if self._db is not None:
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                        [(key, vector.tobytes()) for key, vector in zip(keys, vectors)]
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    logger.error(f"Failed to write embedding cache: {e}")
+
+    def _store(self, key: str, vector: np.ndarray):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def _read_disk(self, keys: list) -> dict:
+        found = {}
+        try:
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype='float32')
+        except Exception as e:
+            logger.error(f"Failed to read embedding cache: {e}")
+        return found
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate_percent": round(((self.hits + self.disk_hits) / lookups * 100) if lookups > 0 else 0.0, 2),
+            "disk_enabled": self._db is not None
+        }
@@ -1,23 +1,131 @@
-from sentence_transformers import SentenceTransformer
 from src.core.config.settings import settings
+from src.core.matching.embedding_cache import EmbeddingCache
+from src.core.matching.encoder_backend import load_encoder, cache_key
+from src.core.monitoring.metrics import metrics_service
+import numpy as np
+import threading
+import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 class EmbeddingService:
     def __init__(self):
-        logger.info(f"Loading embedding model: {settings.MODEL_NAME}")
-        self.model = SentenceTransformer(settings.MODEL_NAME)
+        # The model is loaded on first use (or by warm_up), so importing
+        # this module does not pull in torch or block API startup
+        self._model = None
+        self._model_lock = threading.Lock()
+
+        self.cache = None
+        if settings.EMBEDDING_CACHE_SIZE > 0:
+            self.cache = EmbeddingCache(
+                model_name=cache_key(settings.MODEL_NAME, settings.EMBEDDING_BACKEND),
+                max_entries=settings.EMBEDDING_CACHE_SIZE,
+                db_path=settings.EMBEDDING_CACHE_PATH
+            )
+            metrics_service.register_source("embedding_cache", self.cache.stats)
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    logger.info(f"Loading embedding model: {settings.MODEL_NAME} ({settings.EMBEDDING_BACKEND})")
+                    self._model = load_encoder(
+                        settings.MODEL_NAME,
+                        settings.EMBEDDING_BACKEND,
+                        onnx_dir=settings.EMBEDDING_ONNX_DIR,
+                        quantization=settings.EMBEDDING_QUANTIZATION
+                    )
+        return self._model
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def warm_up(self):
+        """
+        Loads the model and runs one encode, so the first request does not
+        pay for model loading or first-call initialization.
+        """
+        self.model.encode(["warm up"], show_progress_bar=False)
 
     def generate_embeddings(self, texts: list[str]):
         """
         Generates embeddings for a list of texts.
+        Texts already in the embedding cache are not re-encoded.
         """
         if not texts:
             return []
         
+        if self.cache is None:
+            return self._encode(texts)
+
+        embeddings = self.cache.get_many(texts)
+        missing = [i for i, vector in enumerate(embeddings) if vector is None]
+
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            encoded = self._encode(missing_texts)
+            self.cache.put_many(missing_texts, encoded)
+            for i, vector in zip(missing, encoded):
+                embeddings[i] = vector
+
+        return np.vstack(embeddings).astype('float32')
+
+    def iter_embeddings(self, texts: list[str], chunk_size: int = None):
+        """
+        Generates embeddings chunk by chunk, in input order, so callers can
+        consume large inputs without holding every vector at once.
+        Yields one float32 array per chunk of chunk_size texts.
+        """
+        chunk_size = chunk_size or settings.EMBEDDING_CHUNK_SIZE
+        total = len(texts)
+        done = 0
+        start = time.perf_counter()
+        for offset in range(0, total, chunk_size):
+            chunk = self.generate_embeddings(texts[offset:offset + chunk_size])
+            done += len(chunk)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Embedded {done}/{total} texts ({done / elapsed if elapsed > 0 else 0:.0f} texts/s)")
+            yield chunk
+
+    def _encode(self, texts: list[str]):
+        """
+        Encodes texts in batches of similar token length: inputs are sorted
+        by length, so each batch is padded to about its own length, and the
+        batch size shrinks for long texts to keep the padded token count per
+        batch near EMBEDDING_BATCH_TOKENS. Output is in input order.
+        """
         logger.info(f"Generating embeddings for {len(texts)} texts")
-        embeddings = self.model.encode(texts, show_progress_bar=True)
+        model = self.model
+        lengths = self._token_lengths(texts)
+        # Longest first: a batch is padded to the length of its first text
+        order = np.argsort(-lengths, kind='stable')
+
+        embeddings = None
+        position = 0
+        while position < len(order):
+            batch_size = max(1, min(settings.EMBEDDING_MAX_BATCH_SIZE,
+                                    settings.EMBEDDING_BATCH_TOKENS // max(int(lengths[order[position]]), 1)))
+            batch = order[position:position + batch_size]
+            vectors = model.encode([texts[i] for i in batch], batch_size=len(batch), show_progress_bar=False)
+            if embeddings is None:
+                embeddings = np.empty((len(texts), vectors.shape[1]), dtype='float32')
+            embeddings[batch] = vectors
+            position += len(batch)
+
         return embeddings
 
+    def _token_lengths(self, texts: list[str]) -> np.ndarray:
+        # The model's own tokenizer, without padding: only lengths are needed
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return np.array([len(t.split()) for t in texts])
+
+        max_length = getattr(self.model, "max_seq_length", None)
+        input_ids = tokenizer(texts, add_special_tokens=True, truncation=max_length is not None,
+                              max_length=max_length)["input_ids"]
+        return np.array([len(ids) for ids in input_ids])
+
 embedding_service = EmbeddingService()
@@ -0,0 +1,55 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+def cache_key(model_name: str, backend: str) -> str:
+    """
+    Name under which embeddings are cached. Backends produce slightly
+    different vectors, so they must not share cache entries.
+    """
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+def load_encoder(model_name: str, backend: str, onnx_dir: str = "", quantization: str = "avx2"):
+    """
+    Loads a SentenceTransformer for the given backend:
+      torch      the PyTorch model (default)
+      onnx       the model exported to ONNX, run with ONNX Runtime
+      onnx-int8  the ONNX model with dynamic int8 quantization; exported once
+                 to onnx_dir and loaded from there afterwards
+    The ONNX backends use onnxruntime and optimum, installed through the
+    sentence-transformers[onnx] extra in requirements.txt.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx")
+
+    model_dir = onnx_dir or os.path.join("data", "onnx", model_name.replace("/", "__"))
+    file_name = os.path.join("onnx", f"model_qint8_{quantization}.onnx")
+    if not os.path.exists(os.path.join(model_dir, file_name)):
+        export_quantized(model_name, model_dir, quantization)
+
+    logger.info(f"Loading int8 ONNX model from {os.path.join(model_dir, file_name)}")
+    return SentenceTransformer(model_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+def export_quantized(model_name: str, model_dir: str, quantization: str = "avx2"):
+    """
+    Exports model_name to ONNX and writes a dynamically quantized int8 copy
+    next to it. quantization is the target instruction set: arm64, avx2,
+    avx512 or avx512_vnni.
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    logger.info(f"Exporting {model_name} to int8 ONNX ({quantization}) in {model_dir}")
+    model = SentenceTransformer(model_name, backend="onnx")
+    model.save(model_dir)
+    export_dynamic_quantized_onnx_model(model, quantization, model_dir)
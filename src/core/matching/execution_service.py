@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from src.core.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class ExecutionService:
+    """
+    Runs the matching stages off the asyncio event loop.
+    CPU-bound work (normalization, embeddings, FAISS search) goes to a bounded
+    thread pool, LLM calls are awaited directly. Each stage has its own
+    concurrency limit so a slow LLM call cannot hold back inference.
+    """
+    def __init__(self):
+        self._executor = None
+        # Semaphores are bound to the loop that uses them
+        self._semaphores = weakref.WeakKeyDictionary()
+        # Interactive inference calls currently queued or running
+        self._in_flight = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            logger.info(f"Starting inference thread pool with {settings.INFERENCE_WORKERS} workers")
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.INFERENCE_WORKERS,
+                thread_name_prefix="inference"
+            )
+        return self._executor
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        stages = self._semaphores.setdefault(loop, {})
+        if stage not in stages:
+            limits = {
+                "inference": settings.INFERENCE_MAX_CONCURRENCY,
+                "llm": settings.LLM_MAX_CONCURRENCY,
+            }
+            stages[stage] = asyncio.Semaphore(limits[stage])
+        return stages[stage]
+
+    async def run_inference(self, func, *args):
+        """
+        Runs a blocking CPU-bound callable in the inference pool.
+        """
+        self._in_flight += 1
+        try:
+            async with self._semaphore("inference"):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self._in_flight -= 1
+
+    @property
+    def inference_in_flight(self) -> int:
+        return self._in_flight
+
+    async def run_llm(self, coro):
+        """
+        Awaits an LLM coroutine under the LLM concurrency limit.
+        """
+        async with self._semaphore("llm"):
+            return await coro
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+execution_service = ExecutionService()
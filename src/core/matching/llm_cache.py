@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class LLMCache:
+    """
+    Cache of LLM tiebreak answers keyed on (model, normalized input,
+    candidate ID set). The answer is the chosen vehicle ID or "NONE".
+    Tier 1 is an in-process LRU bounded by max_entries.
+    Tier 2 is an optional SQLite file that survives restarts.
+    """
+    def __init__(self, model_name: str, max_entries: int = 10000, db_path: str = ""):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str):
+        try:
+            if os.path.dirname(db_path):
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS llm_answers (key TEXT PRIMARY KEY, answer TEXT NOT NULL)")
+            self._db.commit()
+            logger.info(f"LLM cache disk tier at {db_path}")
+        except Exception as e:
+            logger.error(f"Failed to open LLM cache at {db_path}: {e}")
+            self._db = None
+
+    def key(self, input_text: str, candidate_ids) -> str:
+        # The candidate order does not change the question
+        ids = "\x01".join(sorted(str(cid) for cid in candidate_ids))
+        return hashlib.sha1(f"{self.model_name}\x00{input_text}\x00{ids}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """
+        Returns the cached answer for key, or None on a miss.
+        """
+        with self._lock:
+            answer = self._lru.get(key)
+            if answer is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return answer
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute("SELECT answer FROM llm_answers WHERE key = ?", (key,)).fetchone()
+                except Exception as e:
+                    logger.error(f"Failed to read LLM cache: {e}")
+                    row = None
+                if row is not None:
+                    self._store(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, answer: str):
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._store(key, answer)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO llm_answers (key, answer) VALUES (?, ?)", (key, answer))
+                    self._db.commit()
+                except Exception as e:
+                    logger.error(f"Failed to write LLM cache: {e}")
+
+    def _store(self, key: str, answer: str):
+        self._lru[key] = answer
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate_percent": round(((self.hits + self.disk_hits) / lookups * 100) if lookups > 0 else 0.0, 2),
+            "disk_enabled": self._db is not None
+        }
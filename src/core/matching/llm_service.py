@@ -1,20 +1,81 @@
-from openai import OpenAI
 from src.core.config.settings import settings
+from src.core.matching.execution_service import execution_service
+from src.core.matching.llm_cache import LLMCache
+from src.core.monitoring.metrics import metrics_service
+from concurrent.futures import Future
+import asyncio
+import json
+import threading
+import weakref
 import logging
 
 logger = logging.getLogger(__name__)
 
+NONE_ANSWER = "NONE"
+
 class LLMService:
     def __init__(self):
-        self.client = None
-        if settings.OPENAI_API_KEY:
-            try:
-                self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
-                logger.info("OpenAI client initialized.")
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenAI client: {e}")
-        else:
-            logger.warning("OPENAI_API_KEY not found. LLM service will be disabled.")
+        # Clients are created on first use, so importing this module does
+        # not import the OpenAI SDK
+        self._client = None
+        self._async_client = None
+        self._initialized = False
+        self._lock = threading.Lock()
+
+        self.cache = LLMCache(
+            model_name=settings.LLM_MODEL,
+            max_entries=settings.LLM_CACHE_SIZE,
+            db_path=settings.LLM_CACHE_PATH
+        )
+        # Identical questions already being asked, answered once (single-flight)
+        self._in_flight = {}
+        self._async_in_flight = weakref.WeakKeyDictionary()
+        # The async path is limited by execution_service.run_llm
+        self._semaphore = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+
+        self.calls = 0
+        self.batch_calls = 0
+        self.batch_fallbacks = 0
+        self.coalesced = 0
+        self.errors = 0
+        metrics_service.register_source("llm", self.stats)
+
+    def _initialize(self):
+        with self._lock:
+            if self._initialized:
+                return
+            if settings.OPENAI_API_KEY or settings.LLM_BASE_URL:
+                try:
+                    from openai import OpenAI, AsyncOpenAI
+
+                    # The SDK retries timeouts, 429s and 5xx with exponential
+                    # backoff, honouring the server's Retry-After
+                    options = {
+                        "api_key": settings.OPENAI_API_KEY or "unused",
+                        "base_url": settings.LLM_BASE_URL or None,
+                        "timeout": settings.LLM_TIMEOUT,
+                        "max_retries": settings.LLM_MAX_RETRIES
+                    }
+                    self._client = OpenAI(**options)
+                    self._async_client = AsyncOpenAI(**options)
+                    logger.info(f"OpenAI client initialized{' for ' + settings.LLM_BASE_URL if settings.LLM_BASE_URL else ''}.")
+                except Exception as e:
+                    logger.error(f"Failed to initialize OpenAI client: {e}")
+            else:
+                logger.warning("OPENAI_API_KEY not found. LLM service will be disabled.")
+            self._initialized = True
+
+    @property
+    def client(self):
+        if not self._initialized:
+            self._initialize()
+        return self._client
+
+    @property
+    def async_client(self):
+        if not self._initialized:
+            self._initialize()
+        return self._async_client
 
     def resolve_conflict(self, candidates: list, input_text: str):
         """
@@ -31,6 +92,238 @@ class LLMService:
         if not candidates:
             return None
 
+        key = self.cache.key(input_text, [c[0] for c in candidates])
+        answer = self.cache.get(key)
+        if answer is None:
+            answer = self._ask_once(key, lambda: self._ask(candidates, input_text))
+        return self._to_result(answer, candidates)
+
+    async def resolve_conflict_async(self, candidates: list, input_text: str):
+        """
+        Async variant of resolve_conflict that does not block the event loop.
+        """
+        if not self.async_client:
+            logger.warning("LLM client not available.")
+            return None
+
+        if not candidates:
+            return None
+
+        key = self.cache.key(input_text, [c[0] for c in candidates])
+        answer = self.cache.get(key)
+        if answer is None:
+            answer = await self._ask_once_async(key, lambda: self._ask_async(candidates, input_text))
+        return self._to_result(answer, candidates)
+
+    def resolve_conflicts(self, problems: list) -> list:
+        """
+        Resolves many (candidates, input_text) problems, packing up to
+        LLM_BATCH_SIZE of them into each request. Items the batched answer
+        does not cover (malformed or invalid output) fall back to
+        single-item calls.
+        Returns one (vehicle_id, score) or None per problem.
+        """
+        if not self.client:
+            logger.warning("LLM client not available.")
+            return [None] * len(problems)
+
+        keys, answers, pending = self._lookup_many(problems)
+        for start in range(0, len(pending), max(1, settings.LLM_BATCH_SIZE)):
+            answers.update(self._ask_group(pending[start:start + max(1, settings.LLM_BATCH_SIZE)]))
+
+        return [self._to_result(answers.get(key), candidates) for key, (candidates, _) in zip(keys, problems)]
+
+    async def resolve_conflicts_async(self, problems: list) -> list:
+        """
+        Async variant of resolve_conflicts. The batched requests run
+        concurrently under the LLM concurrency limit.
+        """
+        if not self.async_client:
+            logger.warning("LLM client not available.")
+            return [None] * len(problems)
+
+        keys, answers, pending = self._lookup_many(problems)
+        size = max(1, settings.LLM_BATCH_SIZE)
+        for group_answers in await asyncio.gather(*[
+            self._ask_group_async(pending[start:start + size]) for start in range(0, len(pending), size)
+        ]):
+            answers.update(group_answers)
+
+        return [self._to_result(answers.get(key), candidates) for key, (candidates, _) in zip(keys, problems)]
+
+    def _lookup_many(self, problems: list):
+        """
+        Cache keys per problem, cached answers, and the distinct
+        uncached problems as a list of (key, (candidates, input_text)).
+        """
+        keys = []
+        answers = {}
+        pending = {}
+        for candidates, input_text in problems:
+            if not candidates:
+                keys.append(None)
+                continue
+            key = self.cache.key(input_text, [c[0] for c in candidates])
+            keys.append(key)
+            if key in answers or key in pending:
+                continue
+            answer = self.cache.get(key)
+            if answer is not None:
+                answers[key] = answer
+            else:
+                pending[key] = (candidates, input_text)
+        return keys, answers, list(pending.items())
+
+    def _ask_group(self, group: list) -> dict:
+        if len(group) == 1:
+            key, (candidates, input_text) = group[0]
+            return {key: self._ask_once(key, lambda: self._ask(candidates, input_text))}
+
+        batch_answers = self._ask_batch(group)
+        answers = {}
+        for i, (key, (candidates, input_text)) in enumerate(group):
+            answer = batch_answers.get(i)
+            if answer is None:
+                self.batch_fallbacks += 1
+                answer = self._ask_once(key, lambda: self._ask(candidates, input_text))
+            else:
+                self.cache.put(key, answer)
+            answers[key] = answer
+        return answers
+
+    async def _ask_group_async(self, group: list) -> dict:
+        if len(group) == 1:
+            key, (candidates, input_text) = group[0]
+            return {key: await self._ask_once_async(key, lambda: self._ask_async(candidates, input_text))}
+
+        batch_answers = await self._ask_batch_async(group)
+        answers = {}
+        fallbacks = []
+        for i, (key, (candidates, input_text)) in enumerate(group):
+            answer = batch_answers.get(i)
+            if answer is None:
+                fallbacks.append((key, candidates, input_text))
+            else:
+                self.cache.put(key, answer)
+                answers[key] = answer
+
+        self.batch_fallbacks += len(fallbacks)
+        results = await asyncio.gather(*[
+            self._ask_once_async(key, lambda c=candidates, t=input_text: self._ask_async(c, t))
+            for key, candidates, input_text in fallbacks
+        ])
+        answers.update((key, answer) for (key, _, _), answer in zip(fallbacks, results))
+        return answers
+
+    def _ask_batch(self, group: list) -> dict:
+        """
+        One multi-item API call. Returns {item position: answer} for the
+        items with a valid answer, empty if the call failed.
+        """
+        try:
+            with self._semaphore:
+                self.calls += 1
+                self.batch_calls += 1
+                response = self.client.chat.completions.create(**self._build_batch_request(group))
+            return self._parse_batch_response(response, group)
+
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error calling LLM for {len(group)} items: {e}")
+            return {}
+
+    async def _ask_batch_async(self, group: list) -> dict:
+        try:
+            self.calls += 1
+            self.batch_calls += 1
+            response = await execution_service.run_llm(
+                self.async_client.chat.completions.create(**self._build_batch_request(group))
+            )
+            return self._parse_batch_response(response, group)
+
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error calling LLM for {len(group)} items: {e}")
+            return {}
+
+    def _ask_once(self, key: str, ask):
+        """
+        Runs ask() unless the same question is already in flight in another
+        thread, in which case its answer is awaited instead.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        answer = None
+        try:
+            answer = ask()
+            if answer is not None:
+                self.cache.put(key, answer)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_result(answer)
+        return answer
+
+    async def _ask_once_async(self, key: str, ask):
+        in_flight = self._async_in_flight.setdefault(asyncio.get_running_loop(), {})
+        task = in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            # Shielded, so a cancelled follower does not cancel the call
+            return await asyncio.shield(task)
+
+        async def run():
+            try:
+                answer = await ask()
+                if answer is not None:
+                    self.cache.put(key, answer)
+                return answer
+            finally:
+                del in_flight[key]
+
+        task = asyncio.ensure_future(run())
+        in_flight[key] = task
+        return await asyncio.shield(task)
+
+    def _ask(self, candidates: list, input_text: str):
+        """
+        One API call. Returns the answer, or None if the call failed.
+        """
+        try:
+            with self._semaphore:
+                self.calls += 1
+                response = self.client.chat.completions.create(**self._build_request(candidates, input_text))
+            return self._parse_response(response, candidates)
+
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error calling LLM: {e}")
+            return None
+
+    async def _ask_async(self, candidates: list, input_text: str):
+        try:
+            self.calls += 1
+            response = await execution_service.run_llm(
+                self.async_client.chat.completions.create(**self._build_request(candidates, input_text))
+            )
+            return self._parse_response(response, candidates)
+
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Error calling LLM: {e}")
+            return None
+
+    def _build_request(self, candidates: list, input_text: str) -> dict:
         # Prepare prompt
         # candidates is list of (id, name, score)
         candidates_str = "\n".join([f"- ID: {cid}, Name: {cname}" for cid, cname, _ in candidates])
@@ -57,36 +350,102 @@ class LLMService:
         ### Output Format:
         Reply ONLY with the exact ID of the best match. Do not write any other text.
         """
+        return {
+            "model": settings.LLM_MODEL,
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant that matches vehicle names."},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.0
+        }
+
+    def _build_batch_request(self, group: list) -> dict:
+        items_str = "\n\n".join(
+            f"### Item {i}\nInput: \"{input_text}\"\nCandidates:\n"
+            + "\n".join(f"- ID: {cid}, Name: {cname}" for cid, cname, _ in candidates)
+            for i, (_, (candidates, input_text)) in enumerate(group, start=1)
+        )
+
+        prompt = f"""
+        You are an expert automotive data analyst. For each numbered item below, match the raw vehicle description (Input) to the correct vehicle in our official catalog among that item's Candidates.
+
+        {items_str}
+
+        ### Instructions:
+        1. Analyze each Input vs each of its Candidate Names. Items are independent.
+        2. Focus heavily on MAKE and MODEL.
+        3. Ignore year differences if they are within +/- 2 years.
+        4. Ignore formatting differences (e.g., "Mazda 3" vs "Mazda3", "F-150" vs "F150").
+        5. Select the BEST match from the item's list, even if the description is more detailed than the input.
+        6. Only answer "NONE" if the Input is completely different from ALL of its candidates (e.g. different Make/Model).
+
+        ### Output Format:
+        Reply ONLY with a JSON object mapping every item number to the exact ID of its best match or "NONE", e.g. {{"answers": {{"1": "<ID>", "2": "NONE"}}}}.
+        """
+        return {
+            "model": settings.LLM_MODEL,
+            "messages": [
+                {"role": "system", "content": "You are a helpful assistant that matches vehicle names and replies in JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.0
+        }
 
+    def _parse_batch_response(self, response, group: list) -> dict:
+        content = response.choices[0].message.content or ""
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that matches vehicle names."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.0
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            logger.info(f"LLM Raw Response: {content}")
-            
-            if content == "NONE":
-                logger.info("LLM returned NONE")
-                return None
-            
-            # Check if content matches any candidate ID
-            for cid, cname, score in candidates:
-                if content == cid:
-                    logger.info(f"LLM matched candidate: {cid}")
-                    return (cid, score)
-            
-            logger.warning(f"LLM returned '{content}' which is not in candidates: {[c[0] for c in candidates]}")
-            return None
+            answers = json.loads(content)["answers"]
+            if not isinstance(answers, dict):
+                raise ValueError("answers is not an object")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Malformed LLM batch response ({e}): {content[:200]}")
+            return {}
 
-        except Exception as e:
-            logger.error(f"Error calling LLM: {e}")
-            return None
+        parsed = {}
+        for i, (_, (candidates, _)) in enumerate(group):
+            answer = answers.get(str(i + 1))
+            # Answers outside the item's candidates are asked again on their own
+            if answer == NONE_ANSWER or answer in [c[0] for c in candidates]:
+                parsed[i] = answer
+        return parsed
+
+    def _parse_response(self, response, candidates: list) -> str:
+        """
+        The chosen candidate ID, or NONE when the LLM rejected all candidates
+        or answered something that is not one of them.
+        """
+        content = response.choices[0].message.content.strip()
+        
+        logger.info(f"LLM Raw Response: {content}")
+        
+        if content == "NONE":
+            logger.info("LLM returned NONE")
+            return NONE_ANSWER
+        
+        # Check if content matches any candidate ID
+        for cid, cname, score in candidates:
+            if content == cid:
+                logger.info(f"LLM matched candidate: {cid}")
+                return cid
+        
+        logger.warning(f"LLM returned '{content}' which is not in candidates: {[c[0] for c in candidates]}")
+        return NONE_ANSWER
+
+    def _to_result(self, answer, candidates: list):
+        for cid, cname, score in candidates:
+            if answer == cid:
+                return (cid, score)
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "batch_calls": self.batch_calls,
+            "batch_fallbacks": self.batch_fallbacks,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "cache": self.cache.stats()
+        }
 
-llm_service = LLMService()
+llm_service = LLMService()
\ No newline at end of file
@@ -2,36 +2,240 @@ from src.core.normalization.normalizer import normalizer
 from src.core.matching.embedding_service import embedding_service
 from src.core.matching.similarity_service import similarity_service
 from src.core.matching.llm_service import llm_service
+from src.core.matching.alias_index import alias_index
+from src.core.matching.execution_service import execution_service
+from src.core.matching.micro_batcher import MicroBatcher
+from src.core.matching.result_cache import ResultCache
+from src.core.monitoring.metrics import metrics_service
 from src.core.config.settings import settings
 from src.schemas.match_response import MatchResponse
+from typing import List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
 class MatchingEngine:
-    def process(self, input_text: str) -> MatchResponse:
+    def __init__(self):
+        # Coalesces concurrent single requests into one encode + one search
+        self._search_batcher = MicroBatcher(self._search_batch)
+        # Memoized responses for the loaded catalog version
+        self._result_cache = ResultCache()
+        metrics_service.register_source("result_cache", self._result_cache.stats)
+
+    def process(self, input_text: str, partner_id: str = None) -> MatchResponse:
         """
         Process an input vehicle name and return the best match.
+        partner_id selects the partner's confirmed aliases.
+        """
+        return self._stamp(self._process(input_text, partner_id))
+
+    def process_batch(self, texts: List[str], partner_ids: List[str] = None) -> List[MatchResponse]:
+        """
+        Process a list of input vehicle names in one pass.
+        All texts are normalized up front, encoded in a single batched call
+        and searched with a single matrix query against the index; rows that
+        need an LLM tiebreak are resolved several per request.
+        partner_ids, if given, has one partner per text.
+        """
+        return [self._stamp(response) for response in self._process_batch(texts, partner_ids)]
+
+    async def process_async(self, input_text: str, partner_id: str = None) -> MatchResponse:
+        """
+        Non-blocking variant of process for the API.
+        Retrieval runs in the inference thread pool and the LLM tiebreak
+        uses the async client, so the event loop is never blocked.
+        """
+        return self._stamp(await self._process_async(input_text, partner_id))
+
+    async def process_batch_async(self, texts: List[str], partner_ids: List[str] = None) -> List[MatchResponse]:
+        """
+        Non-blocking variant of process_batch. LLM tiebreaks for the batch
+        are packed into multi-item requests that run concurrently under the
+        LLM concurrency limit.
+        """
+        return [self._stamp(response) for response in await self._process_batch_async(texts, partner_ids)]
+
+    def _stamp(self, response: MatchResponse) -> MatchResponse:
+        # Report which index generation served the request
+        response.index_generation = similarity_service.generation
+        return response
+
+    def _process(self, input_text: str, partner_id: str = None) -> MatchResponse:
+        normalized_text, response = self._lookup(input_text, partner_id=partner_id)
+        if response:
+            return response
+
+        candidates, response = self._retrieve(normalized_text)
+        if response:
+            return response
+
+        return self._decide(normalized_text, candidates)
+
+    def _process_batch(self, texts: List[str], partner_ids: List[str] = None) -> List[MatchResponse]:
+        retrieved = self._retrieve_batch(texts, partner_ids)
+        ambiguous = self._ambiguous(retrieved)
+        llm_results = llm_service.resolve_conflicts([(retrieved[i][1], retrieved[i][0]) for i in ambiguous]) if ambiguous else []
+        return self._finish_batch(retrieved, dict(zip(ambiguous, llm_results)))
+
+    async def _process_async(self, input_text: str, partner_id: str = None) -> MatchResponse:
+        normalized_text, response = self._lookup(input_text, partner_id=partner_id)
+        if response:
+            return response
+
+        if settings.MICRO_BATCH_ENABLED:
+            candidates = await self._search_batcher.submit(normalized_text)
+            if not candidates:
+                return self._remember(normalized_text, MatchResponse(match=False, details="No candidates found"))
+        else:
+            candidates, response = await execution_service.run_inference(self._retrieve, normalized_text)
+            if response:
+                return response
+
+        return await self._decide_async(normalized_text, candidates)
+
+    async def _process_batch_async(self, texts: List[str], partner_ids: List[str] = None) -> List[MatchResponse]:
+        retrieved = await execution_service.run_inference(self._retrieve_batch, texts, partner_ids)
+        ambiguous = self._ambiguous(retrieved)
+        llm_results = await llm_service.resolve_conflicts_async([(retrieved[i][1], retrieved[i][0]) for i in ambiguous]) if ambiguous else []
+        return self._finish_batch(retrieved, dict(zip(ambiguous, llm_results)))
+
+    def _ambiguous(self, retrieved: list) -> List[int]:
+        """
+        Positions of the retrieved items that need an LLM tiebreak.
+        """
+        return [i for i, (_, candidates, response) in enumerate(retrieved)
+                if response is None and self._should_trigger_llm(candidates)]
+
+    def _finish_batch(self, retrieved: list, llm_results: dict) -> List[MatchResponse]:
+        # Ambiguous rows were resolved together in multi-item LLM requests
+        return [
+            response or self._finish(normalized_text, candidates, i in llm_results, llm_results.get(i))
+            for i, (normalized_text, candidates, response) in enumerate(retrieved)
+        ]
+
+    def _lookup(self, input_text: str, normalized_text: str = None, partner_id: str = None) -> Tuple[str, Optional[MatchResponse]]:
+        """
+        Normalizes the input (unless normalized_text is given) and returns
+        (normalized_text, response) where response is set if no retrieval
+        is needed (empty input, exact alias or cached).
         """
         # 1. Normalize
-        normalized_text = normalizer.normalize(input_text)
+        if normalized_text is None:
+            normalized_text = normalizer.normalize(input_text)
         if not normalized_text:
-            return MatchResponse(match=False, details="Empty input after normalization")
+            return normalized_text, MatchResponse(match=False, details="Empty input after normalization")
+
+        # Exact catalog name or confirmed description: no encode, search or LLM
+        if settings.ALIAS_FAST_PATH:
+            vehicle_id = alias_index.lookup(normalized_text, partner_id)
+            if vehicle_id is not None:
+                return normalized_text, MatchResponse(match=True, vehicle_id=vehicle_id, confidence=1.0, details="Exact alias match")
+
+        cached = self._result_cache.get(normalized_text, settings.SIM_THRESHOLD, similarity_service.catalog_version)
+        return normalized_text, cached
 
+    def _remember(self, normalized_text: str, response: MatchResponse) -> MatchResponse:
+        self._result_cache.put(normalized_text, settings.SIM_THRESHOLD, similarity_service.catalog_version, response)
+        return response
+
+    def _retrieve(self, normalized_text: str) -> Tuple[list, Optional[MatchResponse]]:
+        """
+        Embedding and search for a single normalized input.
+        Returns (candidates, early_response).
+        """
         # 2. Generate Embedding
         embedding = embedding_service.generate_embeddings([normalized_text])
         if len(embedding) == 0:
-             return MatchResponse(match=False, details="Failed to generate embedding")
+             return [], MatchResponse(match=False, details="Failed to generate embedding")
         
         # 3. Search in FAISS (Hybrid)
         # Get top-k candidates
         candidates = similarity_service.search(embedding[0], input_text=normalized_text, k=5, hybrid=True)
         
         if not candidates:
-            return MatchResponse(match=False, details="No candidates found")
+            return [], self._remember(normalized_text, MatchResponse(match=False, details="No candidates found"))
+
+        return candidates, None
 
+    def _retrieve_batch(self, texts: List[str], partner_ids: List[str] = None) -> List[Tuple[str, list, Optional[MatchResponse]]]:
+        """
+        Batched retrieval: one encode call and one matrix search for all
+        inputs that are not already answered by an alias or the result cache.
+        """
+        if partner_ids is None:
+            partner_ids = [None] * len(texts)
+
+        retrieved = []
+        pending = []
+        for i, (text, normalized_text, partner_id) in enumerate(zip(texts, normalizer.normalize_batch(texts), partner_ids)):
+            normalized_text, response = self._lookup(text, normalized_text, partner_id)
+            retrieved.append((normalized_text, [], response))
+            if response is None:
+                pending.append(i)
+
+        if not pending:
+            return retrieved
+
+        # Duplicate inputs within the batch are only encoded and searched once
+        pending_texts = list(dict.fromkeys(retrieved[i][0] for i in pending))
+        results = dict(zip(pending_texts, self._search_batch(pending_texts)))
+
+        for i in pending:
+            normalized_text = retrieved[i][0]
+            candidates = results[normalized_text]
+            if not candidates:
+                retrieved[i] = (normalized_text, [], self._remember(normalized_text, MatchResponse(match=False, details="No candidates found")))
+            else:
+                retrieved[i] = (normalized_text, candidates, None)
+
+        return retrieved
+
+    def _search_batch(self, normalized_texts: List[str]) -> List[list]:
+        """
+        Encodes and searches already normalized texts in one call each.
+        Returns one candidate list per text.
+        """
+        # 2. Generate Embeddings (single batched call)
+        embeddings = embedding_service.generate_embeddings(normalized_texts)
+        if len(embeddings) != len(normalized_texts):
+            return [[] for _ in normalized_texts]
+
+        # 3. Search in FAISS (Hybrid, single matrix search)
+        results = similarity_service.search_batch(embeddings, input_texts=normalized_texts, k=5, hybrid=True)
+        return [results[i] if i < len(results) else [] for i in range(len(normalized_texts))]
+
+    def _decide(self, normalized_text: str, candidates: list) -> MatchResponse:
+        """
+        Applies the threshold and LLM rules to the ranked candidates.
+        """
+        llm_result = None
+        should_trigger_llm = self._should_trigger_llm(candidates)
+        if should_trigger_llm:
+            llm_result = llm_service.resolve_conflict(candidates, normalized_text)
+
+        return self._finish(normalized_text, candidates, should_trigger_llm, llm_result)
+
+    async def _decide_async(self, normalized_text: str, candidates: list) -> MatchResponse:
+        llm_result = None
+        should_trigger_llm = self._should_trigger_llm(candidates)
+        if should_trigger_llm:
+            llm_result = await llm_service.resolve_conflict_async(candidates, normalized_text)
+
+        return self._finish(normalized_text, candidates, should_trigger_llm, llm_result)
+
+    def _finish(self, normalized_text: str, candidates: list, should_trigger_llm: bool, llm_result) -> MatchResponse:
+        response = self._build_response(candidates, should_trigger_llm, llm_result)
+
+        # An LLM call without an answer may be a transient error, so it is
+        # not memoized and will be retried on the next request
+        if not (should_trigger_llm and llm_result is None):
+            self._remember(normalized_text, response)
+
+        return response
+
+    def _should_trigger_llm(self, candidates: list) -> bool:
         # 4. Check Threshold
-        best_match_id, best_match_name, best_score = candidates[0]
+        best_score = candidates[0][2]
         
         # 5. LLM Logic
         # Trigger LLM if:
@@ -50,6 +254,11 @@ class MatchingEngine:
             if (best_score - second_score) < 0.05: # 5% difference
                 should_trigger_llm = True
 
+        return should_trigger_llm
+
+    def _build_response(self, candidates: list, should_trigger_llm: bool, llm_result) -> MatchResponse:
+        best_match_id, best_match_name, best_score = candidates[0]
+
         if best_score >= settings.SIM_THRESHOLD and not should_trigger_llm:
             return MatchResponse(
                 match=True,
@@ -58,17 +267,15 @@ class MatchingEngine:
                 llm_used=False
             )
             
-        if should_trigger_llm:
-             llm_result = llm_service.resolve_conflict(candidates, normalized_text)
-             if llm_result:
-                 lid, lscore = llm_result
-                 return MatchResponse(
-                     match=True,
-                     vehicle_id=lid,
-                     confidence=lscore,
-                     llm_used=True,
-                     details="Resolved by LLM"
-                 )
+        if should_trigger_llm and llm_result:
+            lid, lscore = llm_result
+            return MatchResponse(
+                match=True,
+                vehicle_id=lid,
+                confidence=lscore,
+                llm_used=True,
+                details="Resolved by LLM"
+            )
 
         return MatchResponse(
             match=False, 
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from src.core.config.settings import settings
+from src.core.matching.execution_service import execution_service
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into one batched call.
+    Items submitted within MICRO_BATCH_WINDOW_MS of each other (or until
+    MICRO_BATCH_MAX_SIZE items are waiting) are handed to batch_fn together,
+    and each caller gets back its own result.
+    batch_fn: callable taking a list of items and returning a list of results
+    in the same order. It runs in the inference thread pool.
+    """
+    def __init__(self, batch_fn, window_ms: float = None, max_size: int = None):
+        self.batch_fn = batch_fn
+        self.window_ms = window_ms if window_ms is not None else settings.MICRO_BATCH_WINDOW_MS
+        self.max_size = max_size if max_size is not None else settings.MICRO_BATCH_MAX_SIZE
+        self._loop = None
+        self._pending = []
+        self._timer = None
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Pending state belongs to a single event loop
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            self._loop.create_task(self._run(batch))
+
+    async def _run(self, batch: list):
+        items = [item for item, _ in batch]
+        logger.debug(f"Running micro-batch of {len(items)} items")
+        try:
+            results = await execution_service.run_inference(self.batch_fn, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
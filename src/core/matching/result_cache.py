@@ -0,0 +1,67 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+from src.core.config.settings import settings
+from src.schemas.match_response import MatchResponse
+
+logger = logging.getLogger(__name__)
+
+class ResultCache:
+    """
+    Memoizes full MatchResponse objects keyed on (normalized text, threshold)
+    for a given catalog version. When the catalog version changes (a new
+    index was built and loaded) every entry is dropped.
+    """
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries if max_entries is not None else settings.RESULT_CACHE_SIZE
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, normalized_text: str, threshold: float, version) -> Optional[MatchResponse]:
+        with self._lock:
+            self._check_version(version)
+            response = self._entries.get((normalized_text, threshold))
+            if response is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end((normalized_text, threshold))
+            self.hits += 1
+            return response.model_copy()
+
+    def put(self, normalized_text: str, threshold: float, version, response: MatchResponse):
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._check_version(version)
+            self._entries[(normalized_text, threshold)] = response.model_copy()
+            self._entries.move_to_end((normalized_text, threshold))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                logger.info(f"Catalog version changed to {version}, dropping {len(self._entries)} cached results")
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "catalog_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate_percent": round((self.hits / lookups * 100) if lookups > 0 else 0.0, 2)
+        }
@@ -1,44 +1,804 @@
-import faiss
+import math
 import pickle
 import os
+import threading
+import time
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from src.core.config.settings import settings
+from src.vector_store.index_params import load_params, apply_search_params, enable_reconstruct, is_ivf
+from src.vector_store.catalog_sidecar import CatalogSidecar, CatalogMapping, TokenTable, sidecar_path
+from src.vector_store.lexical_index import LexicalIndex, lexical_path
+from src.vector_store.block_index import BlockIndex, blocks_path
+from src.core.normalization.normalizer import normalizer
+from src.core.monitoring.metrics import metrics_service
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on how much filtered searches raise nprobe/efSearch for a
+# selective make block
+MAX_FILTER_BOOST = 16
+
+class IndexState:
+    """
+    Everything loaded from one index build plus its incremental delta.
+    Searches keep a reference to a single state, so a hot reload can swap
+    in a new one while in-flight searches finish on the old one. A
+    published state is never modified: incremental updates change a
+    copy() and swap it in the same way, so searches need no lock.
+    """
+    def __init__(self, index=None, vehicle_ids: list = None, params: dict = None,
+                 base_version: str = None, generation: int = 0, lexical: LexicalIndex = None,
+                 blocks: BlockIndex = None, mapped: bool = False):
+        self.index = index
+        # Read with IO_FLAG_MMAP_IFC: the codes are read-only views of the
+        # file until the first incremental change copies them into memory
+        self.mapped = mapped
+        self.vehicle_ids = vehicle_ids if isinstance(vehicle_ids, CatalogMapping) else CatalogMapping(vehicle_ids)
+        self.params = params or {}
+        # Token postings for the lexical first stage, None for older builds
+        self.lexical = lexical
+        # Rows of each make for blocked searches, None for older builds
+        self.blocks = blocks
+        self.base_version = base_version
+        self.catalog_version = base_version
+        self.generation = generation
+        self.loaded_at = time.time()
+        self._rows = None
+        self._tokens = None
+        # Incremental changes since the last full build_index
+        self.delta = {"added": [], "removed": []}
+
+    @property
+    def rows(self) -> dict:
+        """
+        vehicle_id -> row in vehicle_ids/index, for incremental updates and
+        alias lookups. Built on load when the alias fast path is on,
+        otherwise on first use.
+        """
+        if self._rows is None:
+            self._rows = {entry[0]: row for row, entry in enumerate(self.vehicle_ids) if isinstance(entry, tuple)}
+        return self._rows
+
+    @property
+    def tokens(self) -> TokenTable:
+        """
+        Token ids of every catalog name for the hybrid overlap score, read
+        from the sidecar (or built from the names) on first use.
+        """
+        if self._tokens is None:
+            self._tokens = TokenTable.from_mapping(self.vehicle_ids)
+        return self._tokens
+
+    def copy(self) -> "IndexState":
+        """
+        A modifiable copy for an incremental update. The FAISS index is
+        cloned (memory for one more copy of the vectors while the update
+        runs); mappings, postings and blocks share their base arrays and
+        only copy the rows changed since the build.
+        """
+        import faiss
+
+        if self.mapped:
+            # clone_index would keep the read-only views of the file
+            index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            apply_search_params(index, self.params)
+        else:
+            index = faiss.clone_index(self.index)
+
+        state = IndexState(index, self.vehicle_ids.copy(), self.params, self.base_version, self.generation,
+                           self.lexical.copy() if self.lexical is not None else None,
+                           self.blocks.copy() if self.blocks is not None else None)
+        state.catalog_version = self.catalog_version
+        state.loaded_at = self.loaded_at
+        state._rows = dict(self._rows) if self._rows is not None else None
+        state._tokens = self._tokens.copy() if self._tokens is not None else None
+        state.delta = {"added": list(self.delta["added"]), "removed": list(self.delta["removed"])}
+        return state
+
+    def apply_delta(self, delta: dict):
+        if delta["added"]:
+            self.add_rows([(row, vid, vname) for row, vid, vname, _ in delta["added"]],
+                          np.vstack([np.frombuffer(vector, dtype='float32') for *_, vector in delta["added"]]))
+        self.remove_rows(delta["removed"])
+        self.delta = {"added": delta["added"], "removed": delta["removed"]}
+        self.update_version()
+
+    def update_version(self):
+        changes = len(self.delta["added"]) + len(self.delta["removed"])
+        self.catalog_version = f"{self.base_version}+{changes}" if changes else self.base_version
+
+    def writable_index(self):
+        """
+        The index, first copied out of the memory-mapped file if needed:
+        faiss aborts the process when adding to or removing from mapped
+        codes. Only used on a state that is not published yet (replaying
+        the delta on load); published states are changed through copy().
+        """
+        if self.mapped:
+            import faiss
+
+            logger.info("Copying the memory-mapped index into memory for an incremental update")
+            self.index = faiss.deserialize_index(faiss.serialize_index(self.index))
+            apply_search_params(self.index, self.params)
+            self.mapped = False
+        return self.index
+
+    def add_row(self, row: int, vid: str, vname: str, vector: np.ndarray):
+        self.add_rows([(row, vid, vname)], vector.reshape(1, -1))
+
+    def add_rows(self, entries: list, vectors: np.ndarray):
+        """
+        Adds (row, vehicle_id, normalized_name) entries and their vectors,
+        with one index add and one lexical overlay swap for the batch.
+        """
+        import faiss
+
+        if not entries:
+            return
+        self.writable_index()
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        if isinstance(self.index, faiss.IndexIDMap):
+            self.index.add_with_ids(vectors, np.array([row for row, _, _ in entries], dtype='int64'))
+        else:
+            # Legacy index without ID mapping: rows are assigned sequentially
+            self.index.add(vectors)
+
+        for row, vid, vname in entries:
+            while len(self.vehicle_ids) < row:
+                self.vehicle_ids.append(None)
+            if row < len(self.vehicle_ids):
+                self.vehicle_ids[row] = (vid, vname)
+            else:
+                self.vehicle_ids.append((vid, vname))
+            self.rows[vid] = row
+            if self._tokens is not None:
+                self._tokens.add(row, vname)
+            if self.blocks is not None:
+                self.blocks.add(row, normalizer.extract_attributes(vname).make)
+        if self.lexical is not None:
+            self.lexical.add_many([row for row, _, _ in entries], [vname for _, _, vname in entries])
+
+    def remove_rows(self, rows: list):
+        if not rows:
+            return
+
+        import faiss
+
+        # Without ID mapping, removal would renumber the remaining rows.
+        # IVF lists keep the internal ids of their vectors while
+        # IndexIDMap2.remove_ids compacts its id map, so removing from an
+        # IVF index would map the remaining vectors to the wrong rows
+        if isinstance(self.index, faiss.IndexIDMap) and not is_ivf(self.index):
+            self.writable_index()
+            try:
+                self.index.remove_ids(np.array(rows, dtype='int64'))
+            except RuntimeError:
+                # Some index types (e.g. HNSW) do not support removal;
+                # the rows are masked out of search results instead
+                pass
+
+        for row in rows:
+            entry = self.vehicle_ids[row]
+            if entry is not None:
+                if self.rows.get(entry[0]) == row:
+                    del self.rows[entry[0]]
+                self.vehicle_ids[row] = None
+                if self._tokens is not None:
+                    self._tokens.remove(row)
+
+    def entry(self, idx: int) -> tuple:
+        if idx == -1 or idx >= len(self.vehicle_ids):
+            return None
+
+        # vehicle_ids contains (id, normalized_name) tuples, None once removed
+        vid_data = self.vehicle_ids[idx]
+        if vid_data is None:
+            return None
+        if isinstance(vid_data, tuple):
+            return vid_data
+        # Fallback for old index format
+        return vid_data, str(vid_data)
+
 class SimilarityService:
     def __init__(self):
-        self.index = None
-        self.vehicle_ids = []
-        self._load_index()
+        self._state = IndexState()
+        # Serializes reloads and incremental updates; searches never take it
+        self._update_lock = threading.RLock()
+        self._signature = None
+        self._watcher = None
+        self._watcher_stop = threading.Event()
+        self._lexical_executor = None
+        self._swap_listeners = []
+        # Search counters, updated from the pool threads under _counter_lock
+        self._counter_lock = threading.Lock()
+        self.blocked_searches = 0
+        self.global_searches = 0
+        # The index is loaded on first use (or by load/warm-up), so importing
+        # this module does not read the index files or import faiss.
+        # _loaded records the attempt, so a missing index is not re-read by every search
+        self._loaded = False
+        # Why the last load or reload failed, None after a successful one
+        self.load_error = None
+        metrics_service.register_source("index", self.stats)
+
+    # The current state is read once per search, so these always describe
+    # the index that new searches will use
+    @property
+    def index(self):
+        self._ensure_loaded()
+        return self._state.index
+
+    @index.setter
+    def index(self, index):
+        self._state.index = index
+        self._loaded = True
+
+    @property
+    def vehicle_ids(self) -> list:
+        self._ensure_loaded()
+        return self._state.vehicle_ids
+
+    @vehicle_ids.setter
+    def vehicle_ids(self, vehicle_ids: list):
+        self._state.vehicle_ids = CatalogMapping(vehicle_ids)
+        self._state._rows = None
+        self._state._tokens = None
+        self._loaded = True
+
+    def has_vehicle(self, vehicle_id: str) -> bool:
+        self._ensure_loaded()
+        return vehicle_id in self._state.rows
+
+    @property
+    def params(self) -> dict:
+        self._ensure_loaded()
+        return self._state.params
+
+    @property
+    def catalog_version(self):
+        # Stamp identifying the loaded index/catalog, used to invalidate caches.
+        # None until the index is loaded
+        return self._state.catalog_version
+
+    @property
+    def generation(self) -> int:
+        # Incremented every time a new index is swapped in, 0 until loaded
+        return self._state.generation
+
+    def on_swap(self, callback):
+        """
+        Registers callback(state), called after reload swaps in a new index
+        generation, in the reloading thread.
+        """
+        self._swap_listeners.append(callback)
+
+    @property
+    def is_loaded(self) -> bool:
+        # Only an index that was actually loaded can serve searches
+        return self._state.index is not None
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def warm_up(self):
+        """
+        Loads the index and builds the vehicle_id -> row lookup, which is
+        otherwise built on first use (e.g. by an incremental update).
+        """
+        self.load()
+        self._state.rows
+
+    def load(self):
+        """
+        Loads the index from disk if that has not happened yet.
+        """
+        with self._update_lock:
+            if not self._loaded:
+                self._load_index()
+                self._loaded = True
 
     def _load_index(self):
+        try:
+            state = self._load_state(generation=1)
+        except Exception as e:
+            logger.error(f"Error loading index: {e}")
+            self.load_error = str(e)
+            return
+
+        if state is None:
+            self.load_error = f"Vector index not found at {settings.VECTOR_INDEX_PATH}"
+            return
+        self._state = state
+        self.load_error = None
+
+    def _load_state(self, generation: int) -> IndexState:
+        """
+        Loads index, mapping, parameters and delta from disk into a new state.
+        Raises if the files are inconsistent.
+        """
         if not os.path.exists(settings.VECTOR_INDEX_PATH):
             logger.warning(f"Vector index not found at {settings.VECTOR_INDEX_PATH}")
+            return None
+
+        import faiss
+
+        # Taken before reading, so a change during the load is seen by the watcher
+        signature = self._files_signature()
+
+        logger.info(f"Loading vector index from {settings.VECTOR_INDEX_PATH}")
+        if settings.INDEX_MMAP:
+            # Vectors stay in the page cache and are shared by every process
+            # mapping the same file. The mapped codes are read-only, so the
+            # first add_vehicles/remove_vehicles copies the index into memory
+            index = faiss.read_index(settings.VECTOR_INDEX_PATH, faiss.IO_FLAG_MMAP_IFC)
+        else:
+            index = faiss.read_index(settings.VECTOR_INDEX_PATH)
+
+        # Apply the search-time parameters saved by build_index
+        params = load_params(settings.VECTOR_INDEX_PATH)
+        apply_search_params(index, params)
+        logger.info(f"Index type: {params.get('index_type', 'flat')}")
+
+        vehicle_ids = self._load_mapping(index)
+        self._validate(index, vehicle_ids, params)
+
+        lexical = self._load_lexical(index)
+        blocks = self._load_blocks(index)
+        if lexical is not None or blocks is not None:
+            # Lexical-only candidates and small make blocks are scored
+            # from their stored vectors
+            enable_reconstruct(index)
+        state = IndexState(index, vehicle_ids, params, self._read_version(), generation, lexical, blocks,
+                           mapped=settings.INDEX_MMAP)
+
+        # Replay incremental additions/removals persisted since the last full build
+        delta_path = self._delta_path()
+        if os.path.exists(delta_path):
+            with open(delta_path, 'rb') as f:
+                delta = pickle.load(f)
+            if delta.get("base_version") != state.base_version:
+                # Written by a process still serving an earlier build (e.g.
+                # during a rebuild): its rows would collide with this build's.
+                # The vehicles are in the database, so the next build has them
+                logger.warning(f"Ignoring index delta made against build {delta.get('base_version')}, "
+                               f"loaded build is {state.base_version}")
+            else:
+                state.apply_delta(delta)
+                logger.info(f"Applied index delta: {len(delta['added'])} added, {len(delta['removed'])} removed")
+
+        if settings.ALIAS_FAST_PATH:
+            # Alias lookups check every hit against it: built here, off the
+            # request path (and before fork when preloaded)
+            state.rows
+
+        self._signature = signature
+        logger.info(f"Catalog version: {state.catalog_version} (generation {generation})")
+        return state
+
+    def _load_mapping(self, index):
+        """
+        Opens the memory-mapped catalog sidecar, or the pickled list of
+        indexes built before the sidecar existed.
+        """
+        path = sidecar_path(settings.VECTOR_INDEX_PATH)
+        if os.path.exists(path):
+            sidecar = CatalogSidecar(path)
+            if sidecar.model_name != settings.MODEL_NAME:
+                raise ValueError(f"Index was built with model {sidecar.model_name}, configured model is {settings.MODEL_NAME}")
+            if sidecar.dimension != index.d:
+                raise ValueError(f"Sidecar dimension {sidecar.dimension} does not match index dimension {index.d}")
+            return sidecar
+
+        mapping_path = settings.VECTOR_INDEX_PATH.replace('.faiss', '_map.pkl')
+        if os.path.exists(mapping_path):
+            with open(mapping_path, 'rb') as f:
+                return pickle.load(f)
+
+        logger.warning(f"Mapping file not found at {path}")
+        return []
+
+    def _load_lexical(self, index) -> LexicalIndex:
+        """
+        Opens the lexical index written by build_index. Without one (index
+        built before it existed) search is vector-only.
+        """
+        path = lexical_path(settings.VECTOR_INDEX_PATH)
+        if not settings.LEXICAL_SEARCH or not os.path.exists(path):
+            return None
+
+        lexical = LexicalIndex.load(path)
+        if len(lexical) != index.ntotal:
+            logger.warning(f"Lexical index has {len(lexical)} rows but the vector index has {index.ntotal}, ignoring it")
+            return None
+        return lexical
+
+    def _load_blocks(self, index) -> BlockIndex:
+        """
+        Opens the make blocks written by build_index. Without them (index
+        built before they existed) every query searches the whole catalog.
+        """
+        path = blocks_path(settings.VECTOR_INDEX_PATH)
+        if not settings.MAKE_BLOCKING or not os.path.exists(path):
+            return None
+
+        blocks = BlockIndex.load(path)
+        if len(blocks) != index.ntotal:
+            logger.warning(f"Make blocks cover {len(blocks)} rows but the vector index has {index.ntotal}, ignoring them")
+            return None
+        return blocks
+
+    def _validate(self, index, vehicle_ids, params: dict):
+        if vehicle_ids and index.ntotal != len(vehicle_ids):
+            raise ValueError(f"Index has {index.ntotal} vectors but mapping has {len(vehicle_ids)} entries")
+        if "dimension" in params and index.d != params["dimension"]:
+            raise ValueError(f"Index dimension {index.d} does not match parameters ({params['dimension']})")
+
+        # Smoke test before the index is exposed to searches
+        index.search(np.zeros((1, index.d), dtype='float32'), 1)
+
+    def reload(self) -> bool:
+        """
+        Loads the index from disk and atomically swaps it in.
+        In-flight searches finish on the previous index. If the new files
+        fail validation the current index stays in place.
+        """
+        with self._update_lock:
+            try:
+                state = self._load_state(generation=self.generation + 1)
+            except Exception as e:
+                logger.error(f"Index reload failed, keeping generation {self.generation}: {e}")
+                self.load_error = str(e)
+                return False
+
+            if state is None:
+                self.load_error = f"Vector index not found at {settings.VECTOR_INDEX_PATH}"
+                return False
+
+            self._state = state
+            self._loaded = True
+            self.load_error = None
+
+        logger.info(f"Swapped in index generation {state.generation}")
+        for callback in self._swap_listeners:
+            try:
+                callback(state)
+            except Exception as e:
+                logger.error(f"Index swap listener failed: {e}")
+        return True
+
+    def _files_signature(self) -> tuple:
+        # build_index writes the version stamp last, so it marks a complete
+        # build; the index file itself is only watched for legacy builds
+        version_path = settings.VECTOR_INDEX_PATH.replace('.faiss', '_version.txt')
+        suffixes = ('_version.txt', '_delta.pkl') if os.path.exists(version_path) else ('.faiss', '_delta.pkl')
+
+        signature = []
+        for suffix in suffixes:
+            path = settings.VECTOR_INDEX_PATH.replace('.faiss', suffix)
+            if os.path.exists(path):
+                stat = os.stat(path)
+                signature.append((suffix, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def start_watcher(self, interval: float):
+        """
+        Polls the index files every interval seconds and reloads on change.
+        """
+        if self._watcher is not None or interval <= 0:
             return
 
+        def watch():
+            while not self._watcher_stop.wait(interval):
+                try:
+                    if self._files_signature() != self._signature:
+                        logger.info("Index files changed on disk, reloading")
+                        self.reload()
+                except Exception as e:
+                    logger.error(f"Index watcher error: {e}")
+
+        self._watcher_stop.clear()
+        self._watcher = threading.Thread(target=watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+        logger.info(f"Watching {settings.VECTOR_INDEX_PATH} every {interval}s")
+
+    def stop_watcher(self):
+        if self._watcher is not None:
+            self._watcher_stop.set()
+            self._watcher = None
+
+    def stats(self) -> dict:
+        state = self._state
+        return {
+            "loaded": self.is_loaded,
+            "load_error": self.load_error,
+            "generation": state.generation,
+            "catalog_version": state.catalog_version,
+            "index_type": state.params.get("index_type", "flat"),
+            "vectors": int(state.index.ntotal) if state.index is not None else 0,
+            "lexical": state.lexical is not None,
+            "makes": state.blocks.makes if state.blocks is not None else 0,
+            **self._search_counts(),
+            "loaded_at": state.loaded_at
+        }
+
+    def _search_counts(self) -> dict:
+        with self._counter_lock:
+            return {"blocked_searches": self.blocked_searches, "global_searches": self.global_searches}
+
+    def _read_version(self) -> str:
+        version_path = settings.VECTOR_INDEX_PATH.replace('.faiss', '_version.txt')
+        if os.path.exists(version_path):
+            with open(version_path, 'r') as f:
+                return f.read().strip()
+
+        # Index built before version stamps existed: derive one from the file
+        stat = os.stat(settings.VECTOR_INDEX_PATH)
+        return f"{int(stat.st_mtime)}-{stat.st_size}"
+
+    def _delta_path(self) -> str:
+        return settings.VECTOR_INDEX_PATH.replace('.faiss', '_delta.pkl')
+
+    def add_vehicles(self, vehicles: list, persist: bool = True) -> int:
+        """
+        Adds new or changed catalog vehicles to the live index without a rebuild.
+        vehicles: list of (vehicle_id, name). Only these names are embedded.
+        Returns the number of vehicles added.
+        """
+        # Imported here to keep the search path free of the encoder dependency
+        from src.core.matching.embedding_service import embedding_service
+        from src.core.normalization.normalizer import normalizer
+
+        with self._update_lock:
+            self._ensure_loaded()
+            state = self._state
+            if state.index is None:
+                logger.warning("Index not loaded, cannot add vehicles.")
+                return 0
+
+            pending = []
+            for vid, name in vehicles:
+                normalized_name = normalizer.normalize(name)
+                if not normalized_name:
+                    continue
+                row = state.rows.get(vid)
+                if row is not None and state.vehicle_ids[row] == (vid, normalized_name):
+                    continue  # Unchanged
+                pending.append((vid, normalized_name))
+
+            if not pending:
+                return 0
+
+            embeddings = np.array(embedding_service.generate_embeddings([name for _, name in pending])).astype('float32')
+
+            # Searches keep using the current state until the copy is swapped in
+            state = state.copy()
+            # Changed vehicles replace their previous row
+            replaced = [state.rows[vid] for vid, _ in pending if vid in state.rows]
+            state.remove_rows(replaced)
+            state.delta["removed"].extend(replaced)
+            first = len(state.vehicle_ids)
+            entries = [(first + i, vid, vname) for i, (vid, vname) in enumerate(pending)]
+            state.add_rows(entries, embeddings)
+            state.delta["added"].extend((row, vid, vname, vector.tobytes())
+                                        for (row, vid, vname), vector in zip(entries, embeddings))
+            state.update_version()
+            self._state = state
+
+            logger.info(f"Added {len(pending)} vehicles to the index")
+            if persist:
+                self.save_delta()
+            return len(pending)
+
+    def remove_vehicles(self, vehicle_ids: list, persist: bool = True) -> int:
+        """
+        Removes catalog vehicles from the live index.
+        Returns the number of vehicles removed.
+        """
+        with self._update_lock:
+            self._ensure_loaded()
+            state = self._state
+            rows = [state.rows[vid] for vid in vehicle_ids if vid in state.rows]
+            if rows:
+                state = state.copy()
+                state.remove_rows(rows)
+                state.delta["removed"].extend(rows)
+                state.update_version()
+                self._state = state
+
+            if rows and persist:
+                self.save_delta()
+            return len(rows)
+
+    def save_delta(self):
+        """
+        Persists incremental changes so they survive a restart, stamped
+        with the build they apply to. The delta is dropped by the next
+        full build_index.
+        """
+        with self._update_lock:
+            state = self._state
+            delta_path = self._delta_path()
+            if self._read_version() != state.base_version:
+                # A newer build is on disk; this delta must not replace its own
+                logger.warning(f"Index delta not saved: build {state.base_version} was replaced on disk")
+                return
+            with open(delta_path + '.tmp', 'wb') as f:
+                pickle.dump({**state.delta, "base_version": state.base_version}, f)
+            os.replace(delta_path + '.tmp', delta_path)
+            # Our own write is not a reason to reload
+            self._signature = self._files_signature()
+        logger.info(f"Index delta saved to {delta_path}")
+
+    @property
+    def lexical_executor(self) -> ThreadPoolExecutor:
+        if self._lexical_executor is None:
+            self._lexical_executor = ThreadPoolExecutor(
+                max_workers=settings.INFERENCE_WORKERS,
+                thread_name_prefix="lexical-search"
+            )
+        return self._lexical_executor
+
+    def search_blocks(self, state: IndexState, embeddings: np.ndarray, makes: list, search_k: int):
+        """
+        Vector search of each query restricted to its make's rows, one
+        search per make. Small blocks are scored exactly; larger ones are
+        searched through the index with an ID filter. Queries without a
+        make, or whose block returned nothing, search the whole index.
+        Returns (scores, indices, number of queries answered by a block);
+        the service's search counters are left to the caller.
+        """
+        groups = {}
+        for q, make in enumerate(makes):
+            groups.setdefault(make, []).append(q)
+
+        if list(groups) == [None]:
+            scores, indices = state.index.search(embeddings, search_k)
+            return scores, indices, 0
+
+        scores = np.full((len(makes), search_k), -np.finfo('float32').max, dtype='float32')
+        indices = np.full((len(makes), search_k), -1, dtype='int64')
+        fallback = groups.pop(None, [])
+        for make, queries in groups.items():
+            rows = state.blocks.rows(make)
+            result = None
+            if len(rows) <= settings.BLOCK_EXACT_MAX:
+                result = self._exact_search(state, embeddings[queries], rows, search_k)
+            if result is None:
+                params = self._block_params(state.index, state.blocks.selector(make), len(rows) / max(state.index.ntotal, 1))
+                result = state.index.search(embeddings[queries], search_k, params=params)
+            block_scores, block_indices = result
+            scores[queries], indices[queries] = block_scores, block_indices
+            fallback.extend(q for q, row in zip(queries, block_indices) if row[0] == -1)
+
+        if fallback:
+            fallback.sort()
+            scores[fallback], indices[fallback] = state.index.search(embeddings[fallback], search_k)
+        return scores, indices, len(makes) - len(fallback)
+
+    def _exact_search(self, state: IndexState, embeddings: np.ndarray, rows: np.ndarray, search_k: int):
+        """
+        Exact top search_k over the stored vectors of rows. A filtered HNSW
+        or IVF search visits few rows of a small block and misses some of
+        its neighbours; scoring the block directly is exact and cheap.
+        Returns None if the index cannot reconstruct its vectors.
+        """
+        import faiss
+
+        if state.index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            return None
+
+        scores = np.full((len(embeddings), search_k), -np.finfo('float32').max, dtype='float32')
+        indices = np.full((len(embeddings), search_k), -1, dtype='int64')
+        # Rows removed from the catalog may be gone from the index too
+        rows = rows[state.vehicle_ids.present(rows)]
+        if not len(rows):
+            return scores, indices
+
         try:
-            logger.info(f"Loading vector index from {settings.VECTOR_INDEX_PATH}")
-            self.index = faiss.read_index(settings.VECTOR_INDEX_PATH)
-            
-            mapping_path = settings.VECTOR_INDEX_PATH.replace('.faiss', '_map.pkl')
-            if os.path.exists(mapping_path):
-                with open(mapping_path, 'rb') as f:
-                    self.vehicle_ids = pickle.load(f)
-            else:
-                logger.warning(f"Mapping file not found at {mapping_path}")
-                
-        except Exception as e:
-            logger.error(f"Error loading index: {e}")
+            vectors = state.index.reconstruct_batch(rows)
+        except RuntimeError:
+            return None
+
+        block_scores = embeddings @ vectors.T
+        n = min(search_k, len(rows))
+        top = np.argpartition(-block_scores, n - 1, axis=1)[:, :n]
+        top_scores = np.take_along_axis(block_scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        scores[:, :n] = np.take_along_axis(top_scores, order, axis=1)
+        indices[:, :n] = rows[np.take_along_axis(top, order, axis=1)]
+        return scores, indices
+
+    def _block_params(self, index, selector, selectivity: float):
+        """
+        Search parameters of the index type carrying the block's ID filter.
+        Only a share of the rows an HNSW or IVF search visits pass the
+        filter, so efSearch/nprobe are raised by the inverse of that share
+        (up to MAX_FILTER_BOOST) to keep the same number of candidates.
+        """
+        import faiss
+
+        boost = min(1.0 / max(selectivity, 1e-9), MAX_FILTER_BOOST)
+        try:
+            ivf = faiss.extract_index_ivf(index)
+            return faiss.SearchParametersIVF(sel=selector, nprobe=min(ivf.nlist, math.ceil(ivf.nprobe * boost)))
+        except RuntimeError:
+            pass  # Not an IVF index
+
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+        if isinstance(inner, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=math.ceil(inner.hnsw.efSearch * boost))
+        return faiss.SearchParameters(sel=selector)
+
+    def _in_block(self, state: IndexState, result, make: str):
+        # Lexical candidates of other makes are dropped like vector ones
+        if result is None or make is None:
+            return result
+        selector = state.blocks.selector(make)
+        keep = np.array([selector.is_member(int(row)) for row in result[0]], dtype=bool)
+        return result[0][keep], result[1][keep]
+
+    def _fuse(self, state: IndexState, embeddings: np.ndarray, scores: np.ndarray,
+              indices: np.ndarray, lexical: list):
+        """
+        Reciprocal-rank fusion of the vector and lexical candidate lists.
+        Each query keeps the search_k best fused rows, so the re-ranking
+        cost is unchanged; rows only found lexically get their vector
+        score from the stored vector.
+        """
+        search_k = indices.shape[1]
+        fused_scores = np.zeros(scores.shape, dtype='float32')
+        fused_indices = np.full(indices.shape, -1, dtype='int64')
+
+        for q, result in enumerate(lexical):
+            vector_rows = [int(idx) for idx in indices[q] if idx != -1]
+            if result is None or len(result[0]) == 0:
+                fused_scores[q, :len(vector_rows)] = scores[q, :len(vector_rows)]
+                fused_indices[q, :len(vector_rows)] = vector_rows
+                continue
+
+            rrf = {}
+            for rank, row in enumerate(vector_rows):
+                rrf[row] = 1.0 / (settings.LEXICAL_RRF_K + rank + 1)
+            # Removed vehicles are still in the postings
+            lexical_rows = [row for row in result[0].tolist() if state.entry(row) is not None]
+            for rank, row in enumerate(lexical_rows):
+                rrf[row] = rrf.get(row, 0.0) + 1.0 / (settings.LEXICAL_RRF_K + rank + 1)
+            pool = sorted(rrf, key=rrf.get, reverse=True)[:search_k]
+
+            vector_scores = dict(zip(vector_rows, scores[q].tolist()))
+            missing = [row for row in pool if row not in vector_scores]
+            if missing:
+                vector_scores.update(self._vector_scores(state, embeddings[q], missing))
+
+            pool = [row for row in pool if row in vector_scores]
+            fused_indices[q, :len(pool)] = pool
+            fused_scores[q, :len(pool)] = [vector_scores[row] for row in pool]
+
+        return fused_scores, fused_indices
+
+    def _vector_scores(self, state: IndexState, embedding: np.ndarray, rows: list) -> dict:
+        """
+        Inner product of the query with the stored vectors of rows. Rows the
+        index cannot reconstruct (e.g. removed from it) are left out.
+        """
+        found = {}
+        for row in rows:
+            try:
+                found[row] = float(np.dot(state.index.reconstruct(row), embedding))
+            except RuntimeError:
+                continue
+        return found
 
     def calculate_token_overlap(self, query: str, target: str) -> float:
         set_query = set(query.lower().split())
         set_target = set(target.lower().split())
-        
+
         if not set_query:
             return 0.0
-            
+
         intersection = len(set_query.intersection(set_target))
         # Score is percentage of query tokens found in target
         return intersection / len(set_query)
@@ -49,51 +809,91 @@ class SimilarityService:
         If hybrid is True, re-ranks using Jaccard similarity.
         Returns list of (vehicle_id, score).
         """
-        if self.index is None:
+        results = self.search_batch(embedding, input_texts=[input_text], k=k, hybrid=hybrid)
+        return results[0] if results else []
+
+    def search_batch(self, embeddings: np.ndarray, input_texts: list = None, k: int = 5, hybrid: bool = True) -> list:
+        """
+        Batched version of search: runs a single matrix search over all
+        query embeddings and re-ranks the hybrid scores as arrays.
+        Returns one list of (vehicle_id, name, score) per query.
+        """
+        # Pin the current state for the whole search
+        self._ensure_loaded()
+        state = self._state
+        if state.index is None:
             logger.warning("Index not loaded, cannot search.")
             return []
 
-        # Ensure embedding is float32 and 2D
-        embedding = np.array(embedding).astype('float32')
-        if len(embedding.shape) == 1:
-            embedding = embedding.reshape(1, -1)
+        # Ensure embeddings are float32 and 2D
+        embeddings = np.array(embeddings).astype('float32')
+        if len(embeddings.shape) == 1:
+            embeddings = embeddings.reshape(1, -1)
+
+        n_queries = embeddings.shape[0]
+        if input_texts is None:
+            input_texts = [""] * n_queries
 
         # Retrieve more candidates for re-ranking
         search_k = k * 4 if hybrid else k
-        scores, indices = self.index.search(embedding, search_k)
-        
-        candidates = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx != -1 and idx < len(self.vehicle_ids):
-                # vehicle_ids contains (id, normalized_name) tuples
-                vid_data = self.vehicle_ids[idx]
-                if isinstance(vid_data, tuple):
-                    vid, vname = vid_data
-                else:
-                    # Fallback for old index format
-                    vid = vid_data
-                    vname = str(vid)
-                    
-                candidates.append((vid, vname, float(score)))
-        
-        if not hybrid or not input_text:
-            # Return (id, name, score)
-            return candidates[:k]
-
-        # Hybrid Re-ranking
-        reranked = []
-        for vid, vname, vec_score in candidates:
-            # Calculate Token Overlap score using vname
-            # This is better for "Short Query" vs "Long Description"
-            overlap_score = self.calculate_token_overlap(input_text, vname)
-            
+
+        # The lexical first stage runs alongside the vector search
+        lexical = None
+        if hybrid and state.lexical is not None and any(input_texts):
+            lexical = self.lexical_executor.submit(
+                lambda: [state.lexical.search(text, search_k, settings.LEXICAL_MAX_DF) if text else None
+                         for text in input_texts]
+            )
+
+        # Queries with a known make only search the rows of that make
+        makes = [None] * n_queries
+        if state.blocks is not None:
+            makes = [normalizer.extract_attributes(text).make if text else None for text in input_texts]
+            makes = [make if make in state.blocks else None for make in makes]
+
+        # The pinned state is never modified, so concurrent searches need no lock
+        scores, indices, blocked = self.search_blocks(state, embeddings, makes, search_k)
+        with self._counter_lock:
+            self.blocked_searches += blocked
+            self.global_searches += n_queries - blocked
+        if lexical is not None:
+            lexical_results = [self._in_block(state, result, make) for result, make in zip(lexical.result(), makes)]
+            scores, indices = self._fuse(state, embeddings, scores, indices, lexical_results)
+
+        # Resolve (id, name) for every returned row once
+        entries = [[state.entry(idx) for idx in row] for row in indices]
+
+        if hybrid:
+            # Token overlap for every (query, candidate) pair at once,
+            # from the precomputed token ids of the catalog names
+            overlaps = state.tokens.overlap(input_texts, indices)
+
+        # Removed vehicles may still be returned by indexes without removal support
+        valid = np.array([[entry is not None for entry in row] for row in entries]).reshape(indices.shape)
+
+        if hybrid:
             # Weighted combination: 60% Vector, 40% Overlap
-            final_score = (0.6 * vec_score) + (0.4 * overlap_score)
-            reranked.append((vid, vname, final_score))
-            
-        # Sort by final score descending
-        reranked.sort(key=lambda x: x[2], reverse=True)
-        
-        return reranked[:k]
+            has_text = np.array([bool(t) for t in input_texts]).reshape(-1, 1)
+            final_scores = np.where(has_text, (0.6 * scores) + (0.4 * overlaps), scores)
+        else:
+            final_scores = scores
+
+        # Sort by final score descending (stable, invalid rows last)
+        ranked_scores = np.where(valid, final_scores, -np.inf)
+        order = np.argsort(-ranked_scores, axis=1, kind='stable')
+
+        results = []
+        for q in range(n_queries):
+            candidates = []
+            for c in order[q]:
+                if not valid[q, c]:
+                    break
+                vid, vname = entries[q][c]
+                candidates.append((vid, vname, float(final_scores[q, c])))
+                if len(candidates) == k:
+                    break
+            results.append(candidates)
+
+        return results
 
 similarity_service = SimilarityService()
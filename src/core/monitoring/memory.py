@@ -0,0 +1,35 @@
+import os
+import resource
+import logging
+
+logger = logging.getLogger(__name__)
+
+def memory_report() -> dict:
+    """
+    Resident memory of the current process in MB.
+    pss_mb (proportional set size) splits shared pages between the processes
+    that map them, so it is the real per-worker cost when model and index
+    pages are shared across forked workers.
+    """
+    report = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+
+        shared = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+        private = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+        report.update({
+            "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+            "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+            "shared_mb": round(shared / 1024, 1),
+            "private_mb": round(private / 1024, 1)
+        })
+    except OSError:
+        # No /proc (e.g. macOS): only the peak RSS is available
+        report["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+    return report
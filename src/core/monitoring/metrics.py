@@ -1,7 +1,7 @@
 import time
 import logging
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Callable, Dict
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +25,13 @@ class Metrics:
 class MetricsService:
     def __init__(self):
         self._metrics = Metrics()
+        self._sources: Dict[str, Callable[[], Dict]] = {}
+
+    def register_source(self, name: str, stats_fn: Callable[[], Dict]):
+        """
+        Registers a component (e.g. a cache) whose stats are included in get_stats.
+        """
+        self._sources[name] = stats_fn
         
     def record_request(self, latency_ms: float, match_found: bool, llm_used: bool):
         self._metrics.total_requests += 1
@@ -41,7 +48,7 @@ class MetricsService:
                 self._metrics.llm_successful_resolutions += 1
                 
     def get_stats(self) -> Dict:
-        return {
+        stats = {
             "total_requests": self._metrics.total_requests,
             "successful_matches": self._metrics.successful_matches,
             "failed_matches": self._metrics.failed_matches,
@@ -54,4 +61,12 @@ class MetricsService:
             }
         }
 
+        for name, stats_fn in self._sources.items():
+            try:
+                stats[name] = stats_fn()
+            except Exception as e:
+                logger.error(f"Failed to collect stats for {name}: {e}")
+
+        return stats
+
 metrics_service = MetricsService()
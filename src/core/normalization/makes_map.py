@@ -0,0 +1,71 @@
+# Make spellings (as normalized text) -> canonical make
+MAKES = {
+    "acura": "acura",
+    "alfa romeo": "alfa romeo",
+    "audi": "audi",
+    "baic": "baic",
+    "bmw": "bmw",
+    "buick": "buick",
+    "byd": "byd",
+    "cadillac": "cadillac",
+    "changan": "changan",
+    "chery": "chirey",
+    "chirey": "chirey",
+    "chevrolet": "chevrolet",
+    "chevy": "chevrolet",
+    "chrysler": "chrysler",
+    "cupra": "cupra",
+    "dodge": "dodge",
+    "fiat": "fiat",
+    "ford": "ford",
+    "gac": "gac",
+    "gmc": "gmc",
+    "great wall": "great wall",
+    "haval": "haval",
+    "honda": "honda",
+    "hyundai": "hyundai",
+    "infiniti": "infiniti",
+    "isuzu": "isuzu",
+    "jac": "jac",
+    "jaguar": "jaguar",
+    "jeep": "jeep",
+    "jetour": "jetour",
+    "kia": "kia",
+    "land rover": "land rover",
+    "lexus": "lexus",
+    "lincoln": "lincoln",
+    "mazda": "mazda",
+    "mercedes": "mercedes benz",
+    "mercedes benz": "mercedes benz",
+    "mg": "mg",
+    "mini": "mini",
+    "mitsubishi": "mitsubishi",
+    "nissan": "nissan",
+    "omoda": "omoda",
+    "peugeot": "peugeot",
+    "porsche": "porsche",
+    "ram": "ram",
+    "renault": "renault",
+    "seat": "seat",
+    "smart": "smart",
+    "subaru": "subaru",
+    "suzuki": "suzuki",
+    "tesla": "tesla",
+    "toyota": "toyota",
+    "volkswagen": "volkswagen",
+    "vw": "volkswagen",
+    "volvo": "volvo",
+}
+
+# Body types, after synonym expansion (e.g. "suv" -> "camioneta")
+BODY_TYPES = {
+    "sedan",
+    "hatchback",
+    "camioneta",
+    "pickup",
+    "coupe",
+    "convertible",
+    "minivan",
+    "furgoneta",
+    "wagon",
+}
@@ -1,10 +1,58 @@
 import re
+from dataclasses import dataclass
+from typing import Optional
 from src.core.normalization.synonyms_map import SYNONYMS
+from src.core.normalization.makes_map import MAKES, BODY_TYPES
 from src.utils.text_utils import remove_accents
 
+# Letter-digit or digit-letter transitions (e.g., "mazda3" -> "mazda 3")
+ALNUM_BOUNDARY = re.compile(r'(?<=[a-z])(?=[0-9])|(?<=[0-9])(?=[a-z])')
+
+# Characters kept as they are; dots stay for engine sizes like 1.6, 2.0
+KEPT_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789.")
+
+TOKEN_CACHE_SIZE = 100000
+
+# Model years, e.g. 2024
+YEAR = re.compile(r'(19[5-9]|20[0-9])[0-9]')
+
+# The make is only looked for among the first words; later ones are trims
+MAKE_WINDOW = 3
+
+@dataclass(frozen=True)
+class VehicleAttributes:
+    make: Optional[str] = None
+    model: Optional[str] = None
+    year: Optional[int] = None
+    body: Optional[str] = None
+
+class CharTable(dict):
+    """
+    str.translate table for lowercased text, filled the first time each
+    character is seen: accents are removed and anything that is not a
+    kept character becomes a space.
+    """
+    def __missing__(self, code: int) -> str:
+        cleaned = "".join(c if c in KEPT_CHARS else " " for c in remove_accents(chr(code)))
+        self[code] = cleaned
+        return cleaned
+
 class Normalizer:
     def __init__(self):
         self.synonyms = SYNONYMS
+        self._chars = CharTable()
+        # Raw whitespace-separated token -> its cleaned words
+        self._tokens = {}
+        # First word -> [(phrase words, replacement words)], longest phrase first
+        self._phrases = {}
+        for phrase, replacement in self.synonyms.items():
+            words = tuple(phrase.split())
+            self._phrases.setdefault(words[0], []).append((words, tuple(replacement.split())))
+        for entries in self._phrases.values():
+            entries.sort(key=lambda entry: -len(entry[0]))
+        # Make spelling words -> canonical make, tried longest first
+        self._makes = {tuple(spelling.split()): make for spelling, make in MAKES.items()}
+        self._make_lengths = sorted({len(words) for words in self._makes}, reverse=True)
 
     def normalize(self, text: str) -> str:
         """
@@ -12,62 +60,76 @@ class Normalizer:
         """
         if not text:
             return ""
-        
+
         # 1. Basic cleaning (lower, remove accents, special chars)
-        text = self._clean_text(text)
-        
+        words = self._clean_words(text)
+
         # 2. Expand synonyms
-        text = self._expand_synonyms(text)
-        
+        words = self._expand_synonyms(words)
+
         # 3. Deduplicate words
-        text = self._dedupe_words(text)
-        
-        return text.strip()
-
-    def _clean_text(self, text: str) -> str:
-        # Lowercase
-        text = text.lower()
-        
-        # Remove accents
-        text = remove_accents(text)
-        
-        # Split alphanumeric (e.g., "mazda3" -> "mazda 3")
-        # Look for letter-digit or digit-letter transitions
-        text = re.sub(r'([a-z])([0-9])', r'\1 \2', text)
-        text = re.sub(r'([0-9])([a-z])', r'\1 \2', text)
-
-        # Remove special characters (keep alphanumeric and spaces)
-        # Also keep dots for engine sizes like 1.6, 2.0
-        text = re.sub(r'[^a-z0-9\s\.]', ' ', text)
-        
-        # Replace multiple spaces with single space
-        text = re.sub(r'\s+', ' ', text)
-        
-        return text.strip()
-
-    def _expand_synonyms(self, text: str) -> str:
-        words = text.split()
+        return " ".join(dict.fromkeys(words))
+
+    def normalize_batch(self, texts: list) -> list:
+        """
+        Normalizes many texts; repeated texts are only normalized once.
+        """
+        normalized = {}
+        for text in texts:
+            if text not in normalized:
+                normalized[text] = self.normalize(text)
+        return [normalized[text] for text in texts]
+
+    def extract_attributes(self, normalized_text: str) -> VehicleAttributes:
+        """
+        Make, model, year and body type of an already normalized text; the
+        model is the first word after the make. Unknown attributes are None.
+        """
+        words = normalized_text.split()
+        make = model = None
+        for i in range(min(MAKE_WINDOW, len(words))):
+            for length in self._make_lengths:
+                make = self._makes.get(tuple(words[i:i + length]))
+                if make is not None:
+                    model = next((w for w in words[i + length:] if not YEAR.fullmatch(w)), None)
+                    break
+            if make is not None:
+                break
+
+        year = next((int(w) for w in words if YEAR.fullmatch(w)), None)
+        body = next((w for w in words if w in BODY_TYPES), None)
+        return VehicleAttributes(make, model, year, body)
+
+    def _clean_words(self, text: str) -> list:
+        words = []
+        for token in text.split():
+            cleaned = self._tokens.get(token)
+            if cleaned is None:
+                cleaned = self._clean_token(token)
+                if len(self._tokens) >= TOKEN_CACHE_SIZE:
+                    self._tokens.clear()
+                self._tokens[token] = cleaned
+            words.extend(cleaned)
+        return words
+
+    def _clean_token(self, token: str) -> tuple:
+        # Special characters become spaces, so one token may give several words
+        return tuple(ALNUM_BOUNDARY.sub(" ", token.lower().translate(self._chars)).split())
+
+    def _expand_synonyms(self, words: list) -> list:
         expanded_words = []
-        
-        for word in words:
-            # Check if word is a synonym
-            if word in self.synonyms:
-                expanded_words.append(self.synonyms[word])
+        i = 0
+        while i < len(words):
+            # Longest synonym phrase starting at this word, if any
+            for phrase, replacement in self._phrases.get(words[i], ()):
+                if tuple(words[i:i + len(phrase)]) == phrase:
+                    expanded_words.extend(replacement)
+                    i += len(phrase)
+                    break
             else:
-                expanded_words.append(word)
-                
-        return " ".join(expanded_words)
-
-    def _dedupe_words(self, text: str) -> str:
-        words = text.split()
-        seen = set()
-        deduped = []
-        
-        for word in words:
-            if word not in seen:
-                seen.add(word)
-                deduped.append(word)
-                
-        return " ".join(deduped)
+                expanded_words.append(words[i])
+                i += 1
+
+        return expanded_words
 
 normalizer = Normalizer()
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class MatchJobStatus(BaseModel):
+    job_id: str
+    status: str
+    total: int = 0
+    processed: int = 0
+    progress_percent: float = 0.0
+    error: Optional[str] = None
+    created_at: Optional[float] = None
+    updated_at: Optional[float] = None
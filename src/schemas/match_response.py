@@ -7,3 +7,4 @@ class MatchResponse(BaseModel):
     confidence: float = 0.0
     llm_used: bool = False
     details: Optional[str] = None
+    index_generation: Optional[int] = None
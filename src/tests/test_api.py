@@ -1,12 +1,16 @@
 import sys
 import os
+import json
+import asyncio
+import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 from src.api.server import app
+from src.api.controllers.matching_controller import matching_controller
 from src.schemas.match_response import MatchResponse
 
 client = TestClient(app)
@@ -16,15 +20,39 @@ def test_health_check():
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
+@patch('src.api.server.similarity_service')
+@patch('src.api.server.embedding_service')
+def test_ready_check_waits_for_model_and_index(mock_embed, mock_sim):
+    mock_embed.is_loaded = False
+    mock_sim.is_loaded = True
+    mock_sim.load_error = None
+    
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "loading"
+    
+    mock_embed.is_loaded = True
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready", "model_loaded": True, "index_loaded": True}
+    
+    # A failed index load is reported, not shown as still loading
+    mock_sim.is_loaded = False
+    mock_sim.load_error = "Vector index not found at index.faiss"
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "error"
+    assert response.json()["index_error"] == "Vector index not found at index.faiss"
+
 @patch('src.api.controllers.matching_controller.matching_engine')
 def test_match_vehicle_endpoint(mock_engine):
     # Mock response
-    mock_engine.process.return_value = MatchResponse(
+    mock_engine.process_async = AsyncMock(return_value=MatchResponse(
         match=True,
         vehicle_id="test_id",
         confidence=0.9,
         llm_used=False
-    )
+    ))
     
     payload = {"partner_id": "123", "vehicle_name": "Test Vehicle"}
     response = client.post("/match/", json=payload)
@@ -37,11 +65,10 @@ def test_match_vehicle_endpoint(mock_engine):
 @patch('src.api.controllers.matching_controller.matching_engine')
 def test_match_batch_endpoint(mock_engine):
     # Mock response
-    mock_engine.process.return_value = MatchResponse(
-        match=True,
-        vehicle_id="test_id",
-        confidence=0.9
-    )
+    mock_engine.process_batch_async = AsyncMock(return_value=[
+        MatchResponse(match=True, vehicle_id="test_id", confidence=0.9),
+        MatchResponse(match=True, vehicle_id="test_id", confidence=0.9)
+    ])
     
     payload = [
         {"partner_id": "1", "vehicle_name": "V1"},
@@ -53,3 +80,147 @@ def test_match_batch_endpoint(mock_engine):
     data = response.json()
     assert len(data) == 2
     assert data[0]["match"] is True
+    mock_engine.process_batch_async.assert_awaited_once_with(["V1", "V2"], ["1", "2"])
+
+@patch('src.api.controllers.matching_controller.matching_engine')
+def test_match_batch_stream_endpoint(mock_engine):
+    from src.core.config.settings import settings
+    
+    mock_engine.process_batch_async = AsyncMock(
+        side_effect=lambda names, partner_ids: [MatchResponse(match=True, vehicle_id=name) for name in names])
+    
+    # Lines split across chunks, plus an invalid line
+    chunks = [
+        b'{"partner_id": "P1", "vehicle_name": "V1"}\n{"partner_id": "P1", ',
+        b'"vehicle_name": "V2"}\nnot json\n',
+        b'{"partner_id": "P1", "vehicle_name": "V3"}'
+    ]
+    
+    async def body(delay=0):
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(delay)
+    
+    def match(delay=0):
+        mock_engine.process_batch_async.reset_mock()
+        async def collect():
+            return "".join([output async for output in matching_controller.match_stream(body(delay))])
+        lines = [json.loads(line) for line in asyncio.run(collect()).splitlines()]
+        batches = [call.args[0] for call in mock_engine.process_batch_async.await_args_list]
+        return lines, batches
+    
+    lines, batches = match()
+    assert [line["vehicle_id"] for line in lines] == ["V1", "V2", None, "V3"]
+    assert lines[2]["details"].startswith("Invalid request")
+    # Lines are batched across chunks, not matched chunk by chunk
+    assert batches == [["V1", "V2", "V3"]]
+    
+    with patch.object(settings, "STREAM_BATCH_SIZE", 2):
+        lines, batches = match()
+    assert [line["vehicle_id"] for line in lines] == ["V1", "V2", None, "V3"]
+    assert batches == [["V1", "V2"], ["V3"]]
+    
+    # A slow client gets its lines matched once the window has passed
+    with patch.object(settings, "STREAM_BATCH_WINDOW_MS", 1):
+        lines, batches = match(delay=0.05)
+    assert [line["vehicle_id"] for line in lines] == ["V1", "V2", None, "V3"]
+    assert batches == [["V1"], ["V2"], ["V3"]]
+    
+    response = client.post("/match/batch/stream", content=b"".join(chunks), headers={"content-type": "application/x-ndjson"})
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["vehicle_id"] for line in response.text.splitlines()] == ["V1", "V2", None, "V3"]
+
+@patch('src.api.controllers.admin_controller.similarity_service')
+def test_reload_index_endpoint(mock_sim):
+    mock_sim.reload.return_value = True
+    mock_sim.stats.return_value = {"generation": 2, "catalog_version": "v2"}
+    
+    response = client.post("/admin/reload-index")
+    
+    assert response.status_code == 200
+    assert response.json() == {"reloaded": True, "generation": 2, "catalog_version": "v2"}
+
+def test_metrics_include_process_memory():
+    response = client.get("/match/metrics")
+    
+    assert response.status_code == 200
+    memory = response.json()["memory"]
+    assert memory["pid"] == os.getpid()
+
+@pytest.fixture
+def jobs_env(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.core.config.settings import settings
+    from src.core.jobs.job_service import job_service
+    
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    with patch('src.core.jobs.job_service.engine', engine), \
+         patch('src.core.jobs.job_service.SessionLocal', sessionmaker(bind=engine)), \
+         patch('src.core.jobs.job_service.matching_engine') as mock_engine, \
+         patch.object(settings, "JOBS_DIR", str(tmp_path / "jobs")), \
+         patch.object(settings, "JOBS_BATCH_SIZE", 2), \
+         patch.object(job_service, "_table_ready", False):
+        mock_engine.process_batch.side_effect = lambda names: [MatchResponse(match=True, vehicle_id=name) for name in names]
+        yield job_service, mock_engine
+
+def test_job_lifecycle(jobs_env):
+    job_service, mock_engine = jobs_env
+    
+    response = client.post("/jobs/", json=[{"partner_id": "P1", "vehicle_name": f"V{i}"} for i in range(5)])
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued" and job["total"] == 5
+    
+    # Results are only served once the job is done
+    assert client.get(f"/jobs/{job['job_id']}/results").status_code == 409
+    
+    # A previous run died while writing its second result line
+    with open(job_service.results_path(job["job_id"]), 'w') as f:
+        f.write(MatchResponse(match=True, vehicle_id="V0").model_dump_json() + "\n" + '{"match": tr')
+    
+    job_id, owner = job_service._claim()
+    assert job_id == job["job_id"]
+    job_service._run(job_id, owner)
+    
+    assert [call.args[0] for call in mock_engine.process_batch.call_args_list] == [["V1", "V2"], ["V3", "V4"]]
+    status = client.get(f"/jobs/{job_id}").json()
+    assert status["status"] == "done" and status["processed"] == 5 and status["progress_percent"] == 100.0
+    
+    results = client.get(f"/jobs/{job_id}/results")
+    assert results.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["vehicle_id"] for line in results.text.splitlines()] == ["V0", "V1", "V2", "V3", "V4"]
+
+def test_job_stops_once_its_lease_was_taken_over(jobs_env):
+    from sqlalchemy import update
+    from src.core.db.models.match_job import MatchJob
+    from src.core.jobs.job_service import SessionLocal
+    job_service, mock_engine = jobs_env
+    
+    job_id = job_service.submit([f"V{i}" for i in range(4)])["job_id"]
+    _, owner = job_service._claim()
+    
+    # The first batch outlives the lease and another worker claims the job
+    def slow_batch(names):
+        db = SessionLocal()
+        db.execute(update(MatchJob).where(MatchJob.id == job_id).values(owner="other"))
+        db.commit()
+        db.close()
+        return [MatchResponse(match=True, vehicle_id=name) for name in names]
+    mock_engine.process_batch.side_effect = slow_batch
+    job_service._run(job_id, owner)
+    
+    # Nothing was appended and the job is left to the new owner
+    assert mock_engine.process_batch.call_count == 1
+    assert not os.path.exists(job_service.results_path(job_id)) or os.path.getsize(job_service.results_path(job_id)) == 0
+    assert job_service.get_status(job_id)["status"] == "running"
+
+def test_job_upload_csv(jobs_env):
+    response = client.post("/jobs/upload", content="id,descripcion\n1,MAZDA 3\n2,FIAT MOBI\n",
+                           headers={"content-type": "text/csv"})
+    assert response.status_code == 202
+    assert response.json()["total"] == 2
+    assert client.get("/jobs/missing").status_code == 404
+
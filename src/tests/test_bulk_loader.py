@@ -0,0 +1,58 @@
+import sys
+import os
+import pytest
+from unittest.mock import patch
+from sqlalchemy import create_engine, text
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from src.core.db.database import Base
+from src.core.db.models.vehicle import Vehicle
+from src.core.db.models.partner_vehicle import PartnerVehicle
+from src.core.db import bulk_loader
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(engine)
+    with patch.object(bulk_loader, "engine", engine):
+        yield engine
+
+def write_csv(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+def test_load_vehicles_upserts_on_id(engine, tmp_path):
+    first = write_csv(tmp_path / "a.csv", ["versionc,id_crabi", "MAZDA 3,M-1", "FIAT MOBI,F-1", ",X-1"])
+    second = write_csv(tmp_path / "b.csv", ["versionc,id_crabi", "MAZDA 3 TOURING,M-1", "JEEP WRANGLER,J-1"])
+    
+    assert bulk_loader.load_vehicles(first, chunk_size=1) == 2
+    assert bulk_loader.load_vehicles(second) == 2
+    
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text("SELECT id, name FROM vehicles")).all())
+    assert rows == {"M-1": "MAZDA 3 TOURING", "F-1": "FIAT MOBI", "J-1": "JEEP WRANGLER"}
+
+def test_load_partner_vehicles_skips_known_descriptions(engine, tmp_path):
+    path = write_csv(tmp_path / "p.csv", ["descripcion", "MAZDA 3 2020", "FIAT MOBI", "MAZDA 3 2020"])
+    
+    assert bulk_loader.load_partner_vehicles(path) == 2
+    assert bulk_loader.load_partner_vehicles(path) == 0
+    
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM partner_vehicles WHERE processed = 0")).scalar() == 2
+
+def test_load_partner_vehicles_before_partner_columns(tmp_path):
+    # The schema seeded by migration 002, before 003 adds partner_id and confirmed
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE partner_vehicles (id INTEGER PRIMARY KEY, description VARCHAR, "
+                          "processed BOOLEAN, match_id VARCHAR)"))
+    path = write_csv(tmp_path / "p.csv", ["descripcion", "MAZDA 3 2020", "FIAT MOBI"])
+    
+    with patch.object(bulk_loader, "engine", engine):
+        assert bulk_loader.load_partner_vehicles(path) == 2
+        assert bulk_loader.load_partner_vehicles(path) == 0
+        with pytest.raises(ValueError):
+            bulk_loader.load_partner_vehicles(path, partner_id="acme")
@@ -1,12 +1,19 @@
 import sys
 import os
 import pytest
-from unittest.mock import MagicMock, patch
+import numpy as np
+import asyncio
+from unittest.mock import MagicMock, AsyncMock, patch
 
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 from src.core.matching.matching_engine import MatchingEngine
+from src.core.matching.similarity_service import SimilarityService
+from src.core.matching.micro_batcher import MicroBatcher
+from src.core.matching.embedding_cache import EmbeddingCache
+from src.vector_store.index_params import load_params, apply_search_params
+from src.vector_store.catalog_sidecar import CatalogSidecar, CatalogMapping, SidecarError, TokenTable, write_sidecar
 from src.schemas.match_response import MatchResponse
 
 @pytest.fixture
@@ -15,8 +22,11 @@ def mock_dependencies():
          patch('src.core.matching.matching_engine.embedding_service') as mock_embed, \
          patch('src.core.matching.matching_engine.similarity_service') as mock_sim, \
          patch('src.core.matching.matching_engine.llm_service') as mock_llm, \
+         patch('src.core.matching.matching_engine.alias_index') as mock_alias, \
          patch('src.core.matching.matching_engine.settings') as mock_settings:
         
+        mock_norm.normalize_batch.side_effect = lambda texts: [mock_norm.normalize(text) for text in texts]
+        mock_alias.lookup.return_value = None
         yield mock_norm, mock_embed, mock_sim, mock_llm, mock_settings
 
 def test_matching_engine_success(mock_dependencies):
@@ -90,6 +100,30 @@ def test_matching_engine_llm_fallback_ambiguity(mock_dependencies):
     assert response.llm_used is True
     assert response.vehicle_id == "vehicle_A"
 
+def test_matching_engine_memoizes_results_per_catalog_version(mock_dependencies):
+    mock_norm, mock_embed, mock_sim, mock_llm, mock_settings = mock_dependencies
+    
+    # Setup: LLM-resolved match
+    mock_norm.normalize.return_value = "normalized vehicle"
+    mock_embed.generate_embeddings.return_value = [[0.1, 0.2, 0.3]]
+    mock_sim.search.return_value = [("vehicle_123", "Vehicle Name", 0.65)]
+    mock_sim.catalog_version = "v1"
+    mock_settings.SIM_THRESHOLD = 0.8
+    mock_llm.resolve_conflict.return_value = ("vehicle_123", 0.65)
+    
+    engine = MatchingEngine()
+    first = engine.process("Input Vehicle")
+    second = engine.process("INPUT vehicle")
+    
+    assert second == first
+    assert mock_embed.generate_embeddings.call_count == 1
+    assert mock_llm.resolve_conflict.call_count == 1
+    
+    # A new catalog version invalidates the memoized result
+    mock_sim.catalog_version = "v2"
+    engine.process("Input Vehicle")
+    assert mock_llm.resolve_conflict.call_count == 2
+
 def test_matching_engine_empty_input(mock_dependencies):
     mock_norm, _, _, _, _ = mock_dependencies
     mock_norm.normalize.return_value = ""
@@ -99,3 +133,748 @@ def test_matching_engine_empty_input(mock_dependencies):
     
     assert response.match is False
     assert "Empty" in response.details
+
+def test_matching_engine_process_batch(mock_dependencies):
+    mock_norm, mock_embed, mock_sim, mock_llm, mock_settings = mock_dependencies
+    
+    # Setup: second input normalizes to empty and must not be encoded
+    mock_norm.normalize.side_effect = lambda text: text.lower()
+    mock_embed.generate_embeddings.return_value = [[0.1, 0.2], [0.3, 0.4]]
+    mock_sim.search_batch.return_value = [
+        [("vehicle_A", "Vehicle A", 0.95)],
+        [("vehicle_B", "Vehicle B", 0.3)]
+    ]
+    mock_settings.SIM_THRESHOLD = 0.8
+    
+    engine = MatchingEngine()
+    responses = engine.process_batch(["Vehicle A", "", "Vehicle B"])
+    
+    mock_embed.generate_embeddings.assert_called_once_with(["vehicle a", "vehicle b"])
+    assert mock_sim.search_batch.call_count == 1
+    assert len(responses) == 3
+    assert responses[0].vehicle_id == "vehicle_A"
+    assert responses[1].match is False
+    assert "Empty" in responses[1].details
+    assert responses[2].match is False
+
+def test_matching_engine_process_batch_resolves_ambiguous_rows_together(mock_dependencies):
+    mock_norm, mock_embed, mock_sim, mock_llm, mock_settings = mock_dependencies
+    
+    # Setup: first and third inputs are ambiguous, the second is a clear match
+    ambiguous = [("vehicle_A", "Vehicle A", 0.85), ("vehicle_B", "Vehicle B", 0.84)]
+    mock_norm.normalize.side_effect = lambda text: text.lower()
+    mock_embed.generate_embeddings.return_value = [[0.1], [0.2], [0.3]]
+    mock_sim.search_batch.return_value = [ambiguous, [("vehicle_C", "Vehicle C", 0.95)], ambiguous]
+    mock_settings.SIM_THRESHOLD = 0.8
+    mock_llm.resolve_conflicts.return_value = [("vehicle_B", 0.84), None]
+    
+    engine = MatchingEngine()
+    responses = engine.process_batch(["X", "Y", "Z"])
+    
+    mock_llm.resolve_conflicts.assert_called_once_with([(ambiguous, "x"), (ambiguous, "z")])
+    mock_llm.resolve_conflict.assert_not_called()
+    assert [r.vehicle_id for r in responses] == ["vehicle_B", "vehicle_C", None]
+    assert responses[0].llm_used is True
+
+def test_matching_engine_alias_hit_skips_retrieval(mock_dependencies):
+    mock_norm, mock_embed, mock_sim, mock_llm, mock_settings = mock_dependencies
+    
+    # Setup: only the second input is a known alias for partner P1
+    mock_norm.normalize.side_effect = lambda text: text.lower()
+    mock_embed.generate_embeddings.return_value = [[0.1]]
+    mock_sim.search_batch.return_value = [[("vehicle_C", "Vehicle C", 0.95)]]
+    mock_settings.SIM_THRESHOLD = 0.8
+    mock_settings.ALIAS_FAST_PATH = True
+    
+    with patch('src.core.matching.matching_engine.alias_index') as mock_alias:
+        mock_alias.lookup.side_effect = lambda text, partner_id: "vehicle_A" if (text, partner_id) == ("y", "P1") else None
+        engine = MatchingEngine()
+        responses = engine.process_batch(["X", "Y"], ["P1", "P1"])
+        single = engine.process("Y", "P1")
+    
+    # Only the first input was encoded and searched
+    mock_embed.generate_embeddings.assert_called_once_with(["x"])
+    assert [r.vehicle_id for r in responses] == ["vehicle_C", "vehicle_A"]
+    assert single.vehicle_id == "vehicle_A"
+    assert single.confidence == 1.0
+    assert single.details == "Exact alias match"
+
+def test_alias_index_scopes_confirmed_matches_by_partner():
+    import time
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from src.core.db.database import Base
+    from src.core.db.models.partner_vehicle import PartnerVehicle
+    from src.core.matching.alias_index import AliasIndex
+    
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[PartnerVehicle.__table__])
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add_all([
+        PartnerVehicle(partner_id="P1", description="Mobi Trekking", match_id="FM-100", confirmed=True),
+        PartnerVehicle(partner_id=None, description="MZ3 Camion", match_id="MZ-3", confirmed=True),
+        # Not confirmed: only an automatic match
+        PartnerVehicle(partner_id="P2", description="Jeep", match_id="JP-1", confirmed=False)
+    ])
+    db.commit()
+    db.close()
+    
+    with patch('src.core.matching.alias_index.SessionLocal', session_factory), \
+         patch('src.core.matching.alias_index.similarity_service') as mock_sim:
+        mock_sim.generation = 1
+        mock_sim.vehicle_ids = [("FM-100", "fiat mobi 2024 trekking"), ("MZ-3", "mazda 3"), ("MZ-33", "mazda 3"), None]
+        mock_sim.has_vehicle.side_effect = lambda vid: vid != "MZ-3"
+        aliases = AliasIndex()
+        # Rebuilt whenever a new index generation is swapped in
+        swap_listener = mock_sim.on_swap.call_args.args[0]
+        
+        # Lookups never build the tables inline: the first one is a miss
+        # that builds them in the background
+        with patch.object(aliases, "_build_in_background") as build:
+            assert aliases.lookup("fiat mobi 2024 trekking") is None
+            build.assert_called_once()
+        swap_listener(None)
+        
+        assert aliases.lookup("fiat mobi 2024 trekking") == "FM-100"
+        assert aliases.lookup("mobi trekking", "P1") == "FM-100"
+        assert aliases.lookup("mobi trekking", "P2") is None
+        assert aliases.lookup("jeep", "P2") is None
+        # Names shared by several catalog vehicles are not aliases
+        assert aliases.lookup("mazda 3") is None
+        # Aliases of vehicles no longer in the catalog are ignored
+        assert aliases.lookup("mz 3 camion") is None
+        assert aliases.stats()["stale"] == 1
+        
+        aliases._tables = None
+        aliases._build_in_background()
+        for _ in range(100):
+            if aliases._tables is not None:
+                break
+            time.sleep(0.01)
+        assert aliases.lookup("mobi trekking", "P1") == "FM-100"
+
+def test_matching_engine_process_async_uses_async_llm(mock_dependencies):
+    mock_norm, mock_embed, mock_sim, mock_llm, mock_settings = mock_dependencies
+    
+    # Setup: ambiguous candidates trigger the LLM tiebreak
+    mock_norm.normalize.return_value = "normalized vehicle"
+    mock_embed.generate_embeddings.return_value = [[0.1, 0.2, 0.3]]
+    mock_sim.search.return_value = [("vehicle_A", "Vehicle A", 0.85), ("vehicle_B", "Vehicle B", 0.82)]
+    mock_settings.SIM_THRESHOLD = 0.8
+    mock_settings.MICRO_BATCH_ENABLED = False
+    mock_llm.resolve_conflict_async = AsyncMock(return_value=("vehicle_B", 0.82))
+    
+    engine = MatchingEngine()
+    response = asyncio.run(engine.process_async("Input Vehicle"))
+    
+    mock_llm.resolve_conflict_async.assert_awaited_once()
+    mock_llm.resolve_conflict.assert_not_called()
+    assert response.llm_used is True
+    assert response.vehicle_id == "vehicle_B"
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    calls = []
+
+    def batch_fn(items):
+        calls.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(batch_fn, window_ms=50, max_size=3)
+
+    async def run():
+        return await asyncio.gather(*[batcher.submit(t) for t in ["a", "b", "c", "d"]])
+
+    results = asyncio.run(run())
+    
+    # Each caller gets its own result, max_size splits the batches
+    assert results == ["A", "B", "C", "D"]
+    assert calls == [["a", "b", "c"], ["d"]]
+
+def test_similarity_search_batch_matches_single_search(tmp_path):
+    import faiss
+    from src.core.config.settings import settings
+
+    vectors = np.eye(4, dtype='float32')
+    with patch.object(settings, "VECTOR_INDEX_PATH", str(tmp_path / "missing.faiss")):
+        service = SimilarityService()
+    service.index = faiss.IndexFlatIP(4)
+    service.index.add(vectors)
+    service.vehicle_ids = [("A", "mazda 3"), ("B", "mazda 6"), ("C", "fiat mobi"), ("D", "vw gol")]
+    
+    queries = np.array([[0.6, 0.4, 0.0, 0.0], [0.0, 0.0, 0.2, 0.8]], dtype='float32')
+    texts = ["mazda 6", "fiat mobi"]
+    
+    batch = service.search_batch(queries, input_texts=texts, k=2)
+    single = [service.search(q, input_text=t, k=2) for q, t in zip(queries, texts)]
+    
+    assert batch == single
+    # Token overlap pushes "mazda 6" ahead of the closer vector "mazda 3"
+    assert batch[0][0][0] == "B"
+
+def test_similarity_lexical_first_stage_finds_rows_outside_vector_top_k(tmp_path):
+    import faiss
+    from src.core.config.settings import settings
+    from src.vector_store.lexical_index import LexicalIndex, build_lexical_index
+
+    # 200 catalog rows; the query vector is e1 and the target row has a low
+    # e1 component, so it ranks far below the 20 vectors the search returns
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 16)).astype('float32')
+    vectors[150] = 0.0
+    vectors[150, 0], vectors[150, 1] = 0.1, 1.0
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    rows = [(f"V{i}", f"marca{i % 20} modelo{i} version{i % 7}") for i in range(200)]
+    rows[150] = ("TARGET", "fiat mobi trekking")
+    query = np.eye(1, 16, dtype='float32')
+    
+    with patch.object(settings, "VECTOR_INDEX_PATH", str(tmp_path / "missing.faiss")):
+        service = SimilarityService()
+    service.index = faiss.IndexIDMap2(faiss.IndexFlatIP(16))
+    service.index.add_with_ids(vectors, np.arange(200, dtype='int64'))
+    service.vehicle_ids = rows
+    
+    assert "TARGET" not in [c[0] for c in service.search(query, input_text="fiat mobi trekking", k=5)]
+    
+    build_lexical_index(rows, str(tmp_path / "lexical.npz"))
+    service._state.lexical = LexicalIndex.load(str(tmp_path / "lexical.npz"))
+    results = service.search(query, input_text="fiat mobi trekking", k=5)
+    assert results[0][0] == "TARGET"
+    # Scored from its stored vector like any other candidate
+    assert results[0][2] == pytest.approx(0.6 * float(vectors[150] @ query[0]) + 0.4)
+    
+    # Rows added incrementally are searchable lexically too
+    service._state.add_row(200, "NEW", "seat ibiza fr", vectors[150])
+    assert service.search(query, input_text="seat ibiza fr", k=5)[0][0] == "NEW"
+
+def test_lexical_search_while_rows_are_added(tmp_path):
+    from src.vector_store.lexical_index import LexicalIndex, build_lexical_index
+
+    build_lexical_index([("V0", "seat ibiza")], str(tmp_path / "lexical.npz"))
+    lexical = LexicalIndex.load(str(tmp_path / "lexical.npz"))
+    resize = np.resize
+    seen = []
+
+    # A search running while add() grows the row lengths sees either the
+    # rows before the add or the rows after it
+    def resize_during_search(*args):
+        seen.append(lexical.search("seat ibiza", k=10)[0].tolist())
+        return resize(*args)
+
+    with patch.object(np, "resize", side_effect=resize_during_search):
+        lexical.add(1, "seat ibiza")
+        lexical.add(2, "seat ibiza")
+    
+    assert seen == [[0], [0, 1]]
+    assert sorted(lexical.search("ibiza", k=10)[0].tolist()) == [0, 1, 2]
+
+def test_lexical_add_many_matches_single_adds(tmp_path):
+    from src.vector_store.lexical_index import LexicalIndex, build_lexical_index
+
+    build_lexical_index([("V0", "seat ibiza")], str(tmp_path / "lexical.npz"))
+    names = ["seat leon fr", "fiat mobi", "seat ibiza fr", "fiat argo"]
+    single = LexicalIndex.load(str(tmp_path / "lexical.npz"))
+    for row, name in enumerate(names, start=1):
+        single.add(row, name)
+    batch = LexicalIndex.load(str(tmp_path / "lexical.npz"))
+    batch.add_many(list(range(1, 5)), names)
+    
+    assert len(batch) == len(single) == 5
+    for query in ["seat fr", "fiat", "ibiza"]:
+        rows, scores = batch.search(query, k=5)
+        expected_rows, expected_scores = single.search(query, k=5)
+        assert rows.tolist() == expected_rows.tolist()
+        assert np.allclose(scores, expected_scores)
+
+def test_similarity_searches_only_the_make_block(tmp_path):
+    import faiss
+    from src.vector_store.block_index import BlockIndex, build_block_index
+    from src.core.normalization.normalizer import normalizer
+
+    # The query vector is closest to a Fiat row, but names a Mazda
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(100, 16)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    rows = [(f"V{i}", f"{'mazda' if i % 2 else 'fiat'} modelo{i}") for i in range(100)]
+    query = vectors[0:1].copy()
+    
+    service = SimilarityService()
+    service.index = faiss.IndexIDMap2(faiss.IndexFlatIP(16))
+    service.index.add_with_ids(vectors, np.arange(100, dtype='int64'))
+    service.vehicle_ids = rows
+    build_block_index(rows, str(tmp_path / "blocks.npz"), lambda name: normalizer.extract_attributes(name).make)
+    service._state.blocks = BlockIndex.load(str(tmp_path / "blocks.npz"))
+    
+    results = service.search_batch(np.vstack([query, query]), input_texts=["mazda modelo", "modelo"], k=5, hybrid=False)
+    assert all(vid in {f"V{i}" for i in range(1, 100, 2)} for vid, _, _ in results[0])
+    # Without a make the whole catalog is searched
+    assert results[1][0][0] == "V0"
+    assert (service.blocked_searches, service.global_searches) == (1, 1)
+    
+    # Searches from several threads are all counted
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: service.search_batch(np.vstack([query, query]), input_texts=["mazda modelo", "modelo"],
+                                                     k=5, hybrid=False), range(200)))
+    assert service.stats()["blocked_searches"] == service.stats()["global_searches"] == 201
+    
+    # Rows added incrementally join their make's block
+    service._state.add_row(100, "NEW", "mazda nuevo", vectors[0])
+    assert service.search(query, input_text="mazda", k=1, hybrid=False)[0][0] == "NEW"
+
+def test_similarity_small_make_blocks_are_searched_exactly():
+    import faiss
+    from src.core.config.settings import settings
+    from src.core.matching.similarity_service import IndexState
+    from src.vector_store.block_index import BlockIndex
+
+    # A 1% block of an HNSW index: a filtered graph search with a small
+    # efSearch reaches only a few of the block's rows
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(5000, 16)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    small = np.arange(0, 5000, 100)
+    large = np.setdiff1d(np.arange(5000), small)
+    index = faiss.IndexIDMap2(faiss.IndexHNSWFlat(16, 8, faiss.METRIC_INNER_PRODUCT))
+    index.add_with_ids(vectors, np.arange(5000, dtype='int64'))
+    faiss.downcast_index(index.index).hnsw.efSearch = 8
+    blocks = BlockIndex(["fiat", "mazda"], np.array([0, len(small), 5000]), np.concatenate([small, large]), 5000)
+    state = IndexState(index, [(f"V{i}", f"modelo{i}") for i in range(5000)], blocks=blocks)
+    queries = rng.normal(size=(20, 16)).astype('float32')
+    expected = small[np.argsort(-(queries @ vectors[small].T), axis=1)[:, :5]]
+    
+    service = SimilarityService()
+    _, indices, blocked = service.search_blocks(state, queries, ["fiat"] * 20, 5)
+    assert indices.tolist() == expected.tolist()
+    # Counted by search_batch only, not by direct block searches
+    assert blocked == 20 and service.blocked_searches == 0
+    
+    # Larger blocks go through the index, with efSearch raised by the
+    # block's selectivity
+    with patch.object(settings, "BLOCK_EXACT_MAX", 0):
+        params = service._block_params(index, blocks.selector("fiat"), len(small) / 5000)
+        assert params.efSearch == 8 * 16
+        _, indices, _ = service.search_blocks(state, queries, ["fiat"] * 20, 5)
+    assert all(row in small for row in indices.ravel())
+    
+    # Removed rows are left out of the exact search
+    state.remove_rows(expected[:, 0].tolist())
+    _, indices, _ = service.search_blocks(state, queries, ["fiat"] * 20, 5)
+    assert not set(indices.ravel()) & set(expected[:, 0].tolist())
+
+def test_embedding_cache_lru_and_disk_tier(tmp_path):
+    db_path = str(tmp_path / "embeddings.db")
+    cache = EmbeddingCache(model_name="test-model", max_entries=2, db_path=db_path)
+    
+    cache.put_many(["a", "b", "c"], np.eye(3, dtype='float32'))
+    
+    # "a" was evicted from the LRU tier but is still on disk
+    assert cache.evictions == 1
+    results = cache.get_many(["a", "x"])
+    assert np.allclose(results[0], [1, 0, 0])
+    assert results[1] is None
+    assert cache.disk_hits == 1
+    assert cache.misses == 1
+    
+    # The disk tier survives a restart, but only for the same model
+    reopened = EmbeddingCache(model_name="test-model", max_entries=2, db_path=db_path)
+    assert np.allclose(reopened.get_many(["c"])[0], [0, 0, 1])
+    other_model = EmbeddingCache(model_name="other-model", max_entries=2, db_path=db_path)
+    assert other_model.get_many(["c"]) == [None]
+
+def test_embedding_service_buckets_by_token_length():
+    from src.core.matching.embedding_service import EmbeddingService
+    
+    model = MagicMock()
+    model.tokenizer.side_effect = lambda texts, **kwargs: {"input_ids": [[0] * len(t.split()) for t in texts]}
+    model.encode.side_effect = lambda texts, **kwargs: np.array([[len(t.split()), 0] for t in texts], dtype='float32')
+    
+    service = EmbeddingService()
+    service._model = model
+    service.cache = None
+    texts = ["a", "a b c d e f g h", "a b", "a b c d e f g h i j", "a b c"]
+    
+    with patch('src.core.matching.embedding_service.settings') as mock_settings:
+        mock_settings.EMBEDDING_BATCH_TOKENS = 10
+        mock_settings.EMBEDDING_MAX_BATCH_SIZE = 8
+        mock_settings.EMBEDDING_CHUNK_SIZE = 2
+        chunks = list(service.iter_embeddings(texts))
+    
+    # Order is restored and results arrive in chunks
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert np.concatenate(chunks)[:, 0].tolist() == [1, 8, 2, 10, 3]
+    # Within a chunk, long texts are encoded in smaller batches than short ones
+    batches = [call.args[0] for call in model.encode.call_args_list]
+    assert batches[0] == ["a b c d e f g h"] and batches[1] == ["a"]
+    assert model.encode.call_args_list[0].kwargs["show_progress_bar"] is False
+
+@pytest.fixture
+def llm_stub():
+    """
+    Local OpenAI-compatible server that picks the first candidate of every
+    item after a short delay and records the requests. Multi-item answers
+    are garbled while stub.malformed is set.
+    """
+    import json
+    import re
+    import threading
+    import time
+    from types import SimpleNamespace
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    stub = SimpleNamespace(requests=[], malformed=False)
+    
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            stub.requests.append(body)
+            time.sleep(0.2)
+            first_ids = re.findall(r"Candidate[^:]*:\s*- ID: ([^,]+),", body["messages"][-1]["content"])
+            if "response_format" not in body:
+                answer = first_ids[0]
+            elif stub.malformed:
+                answer = '{"answers": {"1": "UNKNOWN"'
+            else:
+                answer = json.dumps({"answers": {str(i): cid for i, cid in enumerate(first_ids, start=1)}})
+            payload = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+    
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    yield stub
+    server.shutdown()
+
+def test_llm_service_caches_and_coalesces_calls(llm_stub, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from src.core.config.settings import settings
+    from src.core.matching.llm_service import LLMService
+    
+    requests = llm_stub.requests
+    candidates = [("A1", "mazda 3 sport", 0.71), ("B2", "mazda 3 touring", 0.70)]
+    
+    with patch.object(settings, "LLM_BASE_URL", llm_stub.base_url), \
+         patch.object(settings, "LLM_CACHE_PATH", str(tmp_path / "llm.db")):
+        service = LLMService()
+        
+        # Identical concurrent questions share one call
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(lambda _: service.resolve_conflict(candidates, "mazda 3"), range(4)))
+        assert results == [("A1", 0.71)] * 4
+        assert len(requests) == 1
+        assert service.coalesced == 3
+        
+        # Cached whatever the candidate order, and for the async path
+        assert service.resolve_conflict(list(reversed(candidates)), "mazda 3") == ("A1", 0.71)
+        assert asyncio.run(service.resolve_conflict_async(candidates, "mazda 3")) == ("A1", 0.71)
+        assert len(requests) == 1
+        
+        # A different candidate set is a different question
+        async def ask_twice():
+            return await asyncio.gather(*[service.resolve_conflict_async(candidates[:1], "mazda 3") for _ in range(2)])
+        assert asyncio.run(ask_twice()) == [("A1", 0.71)] * 2
+        assert len(requests) == 2
+        
+        # Answers survive a restart through the disk tier
+        restarted = LLMService()
+        assert restarted.resolve_conflict(candidates, "mazda 3") == ("A1", 0.71)
+        assert len(requests) == 2
+        assert restarted.cache.disk_hits == 1
+
+def test_llm_service_resolves_many_items_per_request(llm_stub):
+    from src.core.config.settings import settings
+    from src.core.matching.llm_service import LLMService
+    
+    problems = [
+        ([(f"{make}1", f"{make} a", 0.7), (f"{make}2", f"{make} b", 0.69)], make)
+        for make in ("mazda", "nissan", "kia", "fiat", "seat")
+    ]
+    expected = [(f"{make}1", 0.7) for make in ("mazda", "nissan", "kia", "fiat", "seat")]
+    
+    with patch.object(settings, "LLM_BASE_URL", llm_stub.base_url), \
+         patch.object(settings, "LLM_BATCH_SIZE", 3):
+        service = LLMService()
+        
+        # 5 problems (one repeated) in batches of 3 and 2
+        assert service.resolve_conflicts(problems + problems[:1]) == expected + expected[:1]
+        assert len(llm_stub.requests) == 2
+        assert all("response_format" in r for r in llm_stub.requests)
+        
+        # Malformed batch output falls back to one call per item
+        llm_stub.requests.clear()
+        llm_stub.malformed = True
+        service = LLMService()
+        assert asyncio.run(service.resolve_conflicts_async(problems[:3])) == expected[:3]
+        assert len(llm_stub.requests) == 4
+        assert service.batch_fallbacks == 3
+
+def test_encoder_backend_selection():
+    from src.core.matching.encoder_backend import load_encoder, cache_key
+    
+    # Backends do not share embedding cache entries; torch keeps the old key
+    assert cache_key("all-MiniLM-L6-v2", "torch") == "all-MiniLM-L6-v2"
+    assert cache_key("all-MiniLM-L6-v2", "onnx-int8") != cache_key("all-MiniLM-L6-v2", "onnx")
+    
+    with patch('sentence_transformers.SentenceTransformer') as mock_st:
+        load_encoder("all-MiniLM-L6-v2", "onnx")
+        mock_st.assert_called_once_with("all-MiniLM-L6-v2", backend="onnx")
+        with pytest.raises(ValueError):
+            load_encoder("all-MiniLM-L6-v2", "tensorflow")
+
+def test_index_params_apply_search_knobs(tmp_path):
+    import faiss
+
+    # Indexes without saved parameters are treated as flat
+    assert load_params(str(tmp_path / "index.faiss")) == {"index_type": "flat"}
+    
+    vectors = np.random.default_rng(0).random((200, 8)).astype('float32')
+    index = faiss.IndexIVFFlat(faiss.IndexFlatIP(8), 8, 4, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    apply_search_params(index, {"index_type": "ivf_flat", "nlist": 4, "nprobe": 3})
+    assert index.nprobe == 3
+    
+    hnsw = faiss.IndexHNSWFlat(8, 16, faiss.METRIC_INNER_PRODUCT)
+    apply_search_params(hnsw, {"index_type": "hnsw", "ef_search": 48})
+    assert hnsw.hnsw.efSearch == 48
+
+# A memory-mapped index is copied into memory before the first change
+@pytest.mark.parametrize("mmap", [False, True])
+def test_similarity_incremental_add_remove_persists_delta(tmp_path, mmap):
+    import faiss
+    import pickle
+    from src.core.config.settings import settings
+
+    index_path = str(tmp_path / "index.faiss")
+    index = faiss.IndexIDMap2(faiss.IndexFlatIP(3))
+    index.add_with_ids(np.array([[1, 0, 0], [0, 1, 0]], dtype='float32'), np.arange(2, dtype='int64'))
+    faiss.write_index(index, index_path)
+    with open(index_path.replace('.faiss', '_map.pkl'), 'wb') as f:
+        pickle.dump([("A", "mazda 3"), ("B", "fiat mobi")], f)
+
+    with patch.object(settings, "VECTOR_INDEX_PATH", index_path), \
+         patch.object(settings, "INDEX_MMAP", mmap), \
+         patch('src.core.matching.embedding_service.embedding_service') as mock_embed:
+        mock_embed.generate_embeddings.return_value = np.array([[0, 0, 1]], dtype='float32')
+        
+        service = SimilarityService()
+        service.load()
+        assert service._state.mapped == mmap
+        base_version = service.catalog_version
+        pinned = service._state
+        assert service.add_vehicles([("SOC-001", "Jeep Wrangler")]) == 1
+        assert service.remove_vehicles(["B"]) == 1
+        assert not service._state.mapped
+        # Updates are made on a copy: a search that pinned the old state
+        # still sees the catalog as it was
+        assert pinned.index.ntotal == 2 and len(pinned.vehicle_ids) == 2
+        assert pinned.entry(1) == ("B", "fiat mobi") and pinned.catalog_version == base_version
+        
+        assert service.catalog_version != base_version
+        assert service.search(np.array([0, 0, 1]), k=1, hybrid=False)[0][0] == "SOC-001"
+        assert all(c[0] != "B" for c in service.search(np.array([0, 1, 0]), k=3, hybrid=False))
+        
+        # Unchanged vehicles are not re-embedded
+        assert service.add_vehicles([("SOC-001", "jeep wrangler")]) == 0
+        
+        # The delta is replayed on the next load
+        reloaded = SimilarityService()
+        reloaded.load()
+        assert reloaded.catalog_version == service.catalog_version
+        assert reloaded.search(np.array([0, 0, 1]), k=1, hybrid=False)[0][0] == "SOC-001"
+        assert all(c[0] != "B" for c in reloaded.search(np.array([0, 1, 0]), k=3, hybrid=False))
+        
+        # A new build is written while this process still serves the old one:
+        # its delta is neither saved over the new build's nor replayed onto it
+        with open(index_path.replace('.faiss', '_version.txt'), 'w') as f:
+            f.write("rebuilt")
+        with open(index_path.replace('.faiss', '_delta.pkl'), 'rb') as f:
+            saved = f.read()
+        assert service.add_vehicles([("SOC-002", "Ram 700")]) == 1
+        with open(index_path.replace('.faiss', '_delta.pkl'), 'rb') as f:
+            assert f.read() == saved
+        
+        rebuilt = SimilarityService()
+        rebuilt.load()
+        assert rebuilt.catalog_version == "rebuilt"
+        assert not rebuilt.has_vehicle("SOC-001") and rebuilt.index.ntotal == 2
+
+def test_similarity_removal_keeps_ivf_rows_mapped_to_their_ids():
+    import faiss
+    from src.core.matching.similarity_service import IndexState
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 16)).astype('float32')
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ivf = faiss.IndexIVFFlat(faiss.IndexFlatIP(16), 16, 4, faiss.METRIC_INNER_PRODUCT)
+    ivf.train(vectors)
+    ivf.nprobe = 4
+    index = faiss.IndexIDMap2(ivf)
+    index.add_with_ids(vectors, np.arange(500, dtype='int64'))
+    
+    service = SimilarityService()
+    service._state = IndexState(index, [(f"V{i}", f"modelo{i}") for i in range(500)])
+    service._loaded = True
+    service._state.remove_rows(list(range(50)))
+    
+    # Every surviving row still finds itself, removed rows are never returned
+    results = service.search_batch(vectors[50:], k=1, hybrid=False)
+    assert [r[0][0] for r in results] == [f"V{i}" for i in range(50, 500)]
+    removed = {f"V{i}" for i in range(50)}
+    assert all(c[0] not in removed for r in service.search_batch(vectors[:50], k=5, hybrid=False) for c in r)
+
+def test_similarity_reload_swaps_index_and_rejects_bad_files(tmp_path):
+    import faiss
+    import pickle
+    from src.core.config.settings import settings
+
+    index_path = str(tmp_path / "index.faiss")
+
+    def write_index(vectors, mapping):
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(3))
+        index.add_with_ids(np.array(vectors, dtype='float32'), np.arange(len(vectors), dtype='int64'))
+        faiss.write_index(index, index_path)
+        with open(index_path.replace('.faiss', '_map.pkl'), 'wb') as f:
+            pickle.dump(mapping, f)
+
+    with patch.object(settings, "VECTOR_INDEX_PATH", index_path):
+        # A missing index is not reported as loaded
+        service = SimilarityService()
+        service.load()
+        assert not service.is_loaded and "not found" in service.load_error
+
+    write_index([[1, 0, 0]], [("A", "mazda 3")])
+    with patch.object(settings, "VECTOR_INDEX_PATH", index_path):
+        assert service.reload() is True
+        assert service.is_loaded and service.load_error is None
+
+        service = SimilarityService()
+        # Nothing is read from disk until first use
+        assert not service.is_loaded and service.generation == 0
+        assert service.search(np.array([1, 0, 0]), k=1, hybrid=False)[0][0] == "A"
+        assert service.is_loaded and service.generation == 1
+        old_state = service._state
+        
+        write_index([[1, 0, 0], [0, 1, 0]], [("A", "mazda 3"), ("B", "fiat mobi")])
+        assert service.reload() is True
+        assert service.generation == 2
+        assert service.search(np.array([0, 1, 0]), k=1, hybrid=False)[0][0] == "B"
+        # Searches that pinned the old state still see the old index
+        assert old_state.index.ntotal == 1
+        
+        # Mapping out of sync with the index: the current index is kept
+        with open(index_path.replace('.faiss', '_map.pkl'), 'wb') as f:
+            pickle.dump([("A", "mazda 3")], f)
+        assert service.reload() is False
+        assert service.generation == 2
+        assert service.index.ntotal == 2
+
+def test_build_index_streams_and_resumes_after_failure(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from src.core.config.settings import settings
+    from src.core.db.database import Base
+    from src.core.db.models.vehicle import Vehicle
+    from src.vector_store import build_index as builder
+    
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    db.add_all([Vehicle(id=f"V-{i:02d}", name=f"Vehicle {i}") for i in range(12)])
+    db.commit()
+    db.close()
+    
+    calls = []
+    def embed(texts):
+        calls.append(len(texts))
+        if fail and len(calls) == 3:
+            raise RuntimeError("encoder crashed")
+        return np.array([[1.0, float(t.split()[-1])] for t in texts], dtype='float32')
+    
+    index_path = str(tmp_path / "index.faiss")
+    with patch.object(builder, "SessionLocal", Session), \
+         patch.object(builder, "embedding_service") as mock_embed, \
+         patch.object(settings, "VECTOR_INDEX_PATH", index_path), \
+         patch.object(settings, "INDEX_TYPE", "flat"), \
+         patch.object(settings, "INDEX_BUILD_CHUNK_SIZE", 5), \
+         patch.object(settings, "INDEX_CHECKPOINT_EVERY", 1):
+        mock_embed.generate_embeddings.side_effect = embed
+        
+        fail = True
+        with pytest.raises(RuntimeError):
+            builder.build_index()
+        assert os.path.exists(index_path.replace('.faiss', '_build.json'))
+        assert not os.path.exists(index_path)
+        
+        # Only the chunk that failed and the rest are embedded again
+        fail = False
+        calls.clear()
+        builder.build_index()
+        assert calls == [2]
+        assert not os.path.exists(index_path.replace('.faiss', '_build.json'))
+    
+    sidecar = CatalogSidecar(index_path.replace('.faiss', '_map.bin'))
+    assert [vid for vid, _ in sidecar] == [f"V-{i:02d}" for i in range(12)]
+    import faiss
+    index = faiss.read_index(index_path)
+    assert index.ntotal == 12
+    assert index.search(np.array([[1.0, 7.0]], dtype='float32'), 1)[1][0][0] == 11
+
+def test_catalog_sidecar_roundtrip_and_checksum(tmp_path):
+    path = str(tmp_path / "index_map.bin")
+    rows = [("FM-100", "fiat mobi 2024 trekking"), ("MZ-3", "mazda 3 camion")]
+    write_sidecar(path, rows, model_name="test-model", dimension=384)
+    
+    sidecar = CatalogSidecar(path)
+    assert sidecar.model_name == "test-model"
+    assert sidecar.dimension == 384
+    assert len(sidecar) == 2
+    assert list(sidecar) == rows
+    
+    # Incremental changes go to the overlay, the sidecar is untouched
+    mapping = CatalogMapping(sidecar)
+    mapping.append(("SOC-001", "jeep wrangler"))
+    mapping[0] = None
+    assert list(mapping) == [None, rows[1], ("SOC-001", "jeep wrangler")]
+    assert list(sidecar) == rows
+    
+    # Corrupted data is detected by the checksum
+    with open(path, 'r+b') as f:
+        f.seek(-1, 2)
+        f.write(b"X")
+    with pytest.raises(SidecarError):
+        CatalogSidecar(path)
+
+def test_token_table_overlap_matches_token_overlap(tmp_path):
+    path = str(tmp_path / "index_map.bin")
+    rows = [("FM-100", "fiat mobi 2024 trekking"), ("MZ-3", "mazda 3 camion"), ("MZ-6", "mazda 6 2024")]
+    write_sidecar(path, rows, model_name="test-model", dimension=384)
+    
+    mapping = CatalogMapping(CatalogSidecar(path))
+    mapping.append(("SOC-001", "jeep wrangler 2024"))
+    mapping[1] = None
+    tokens = TokenTable.from_mapping(mapping)
+    # Rows without a precomputed token set are built from the names
+    legacy = TokenTable.from_mapping(CatalogMapping(list(mapping)))
+    
+    queries = ["mazda 3 2024", "Jeep Wrangler", "", "unknown words"]
+    candidates = np.array([[0, 1, 2, 3, -1]] * len(queries))
+    service = SimilarityService()
+    expected = np.array([
+        [service.calculate_token_overlap(q, mapping[c][1]) if c != -1 and mapping[c] is not None and q else 0.0
+         for c in row] for q, row in zip(queries, candidates)
+    ], dtype='float32')
+    
+    np.testing.assert_array_equal(tokens.overlap(queries, candidates), expected)
+    np.testing.assert_array_equal(legacy.overlap(queries, candidates), expected)
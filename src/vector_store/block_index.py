@@ -0,0 +1,97 @@
+import os
+from array import array
+import numpy as np
+
+def blocks_path(index_path: str) -> str:
+    return index_path.replace('.faiss', '_blocks.npz')
+
+class BlockIndex:
+    """
+    Catalog rows grouped by make, so a query whose make is known only has
+    to search the rows of that make. Rows added after the build
+    (incremental updates) go to a small overlay; removed rows stay in their
+    block and are filtered by the caller.
+    """
+    def __init__(self, makes, offsets: np.ndarray, rows: np.ndarray, total: int):
+        self._makes = {make: i for i, make in enumerate(makes)}
+        self._offsets = offsets
+        self._rows = rows
+        self._total = total
+        self._added = {}
+        # make -> faiss.IDSelectorBatch over its rows, built on first use
+        self._selectors = {}
+
+    @classmethod
+    def load(cls, path: str) -> "BlockIndex":
+        with np.load(path) as data:
+            return cls(data["makes"].tolist(), data["offsets"], data["rows"], int(data["total"]))
+
+    def __len__(self) -> int:
+        return self._total
+
+    def __contains__(self, make: str) -> bool:
+        return make in self._makes or make in self._added
+
+    @property
+    def makes(self) -> int:
+        return len(set(self._makes) | set(self._added))
+
+    def copy(self) -> "BlockIndex":
+        # Shares the base arrays; rows added to the copy stay out of this one
+        blocks = BlockIndex.__new__(BlockIndex)
+        blocks._makes = self._makes
+        blocks._offsets = self._offsets
+        blocks._rows = self._rows
+        blocks._total = self._total
+        blocks._added = {make: list(rows) for make, rows in self._added.items()}
+        blocks._selectors = dict(self._selectors)
+        return blocks
+
+    def add(self, row: int, make: str):
+        self._total = max(self._total, row + 1)
+        if make is not None:
+            self._added.setdefault(make, []).append(row)
+            self._selectors.pop(make, None)
+
+    def rows(self, make: str) -> np.ndarray:
+        i = self._makes.get(make)
+        base = self._rows[self._offsets[i]:self._offsets[i + 1]] if i is not None else self._rows[:0]
+        added = self._added.get(make)
+        return np.concatenate([base, np.array(added, dtype='int64')]) if added else base
+
+    def selector(self, make: str):
+        """
+        faiss ID selector for the rows of make. Selectors are cached, as
+        building one hashes every row of the block.
+        """
+        selector = self._selectors.get(make)
+        if selector is None:
+            import faiss
+
+            rows = np.ascontiguousarray(self.rows(make), dtype='int64')
+            selector = self._selectors[make] = faiss.IDSelectorBatch(len(rows), faiss.swig_ptr(rows))
+        return selector
+
+def build_block_index(rows, path: str, make_of) -> int:
+    """
+    Writes the make blocks for an iterable of (vehicle_id, normalized_name)
+    rows, e.g. a catalog sidecar; make_of returns the make of a name or
+    None. Returns the number of makes.
+    """
+    blocks = {}
+    total = 0
+    for row, (_, name) in enumerate(rows):
+        make = make_of(name)
+        if make is not None:
+            blocks.setdefault(make, array('q')).append(row)
+        total += 1
+
+    makes = sorted(blocks)
+    offsets = np.zeros(len(makes) + 1, dtype='int64')
+    offsets[1:] = np.cumsum([len(blocks[make]) for make in makes])
+    block_rows = np.concatenate([np.frombuffer(blocks[make], dtype='int64') for make in makes]) if makes else np.empty(0, dtype='int64')
+
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, makes=np.array(makes, dtype=str), offsets=offsets, rows=block_rows, total=np.int64(total))
+    os.replace(path + '.tmp', path)
+    return len(makes)
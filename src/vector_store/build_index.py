@@ -1,64 +1,403 @@
 import faiss
-import pickle
 import os
+import json
+import time
+import uuid
 import numpy as np
 from src.core.config.settings import settings
 from src.core.matching.embedding_service import embedding_service
 from src.core.db.database import SessionLocal
 from src.core.db.models.vehicle import Vehicle
+from sqlalchemy import func
 from src.core.normalization.normalizer import normalizer
+from src.vector_store.index_params import apply_search_params, enable_reconstruct, params_path
+from src.vector_store.catalog_sidecar import CatalogSidecar, SidecarWriter, sidecar_path
+from src.vector_store.lexical_index import build_lexical_index, lexical_path
+from src.vector_store.block_index import BlockIndex, build_block_index, blocks_path
 
-def build_index():
+def build_index(resume: bool = True):
+    """
+    Streams the vehicles table in id order, normalizing and embedding one
+    chunk at a time and adding each chunk to the index, so memory depends on
+    INDEX_BUILD_CHUNK_SIZE rather than on the catalog size. Progress is
+    checkpointed every INDEX_CHECKPOINT_EVERY chunks; with resume=True an
+    interrupted build continues from its last checkpoint.
+    """
     db = SessionLocal()
+    writer = None
     try:
-        # 1. Fetch all vehicles
-        vehicles = db.query(Vehicle).all()
-        if not vehicles:
+        # 1. Count vehicles (sizes IVF indexes without loading the catalog)
+        total = db.query(func.count(Vehicle.id)).scalar()
+        if not total:
             print("No vehicles found in database.")
             return
 
-        print(f"Found {len(vehicles)} vehicles.")
+        print(f"Found {total} vehicles.")
+        os.makedirs(os.path.dirname(settings.VECTOR_INDEX_PATH), exist_ok=True)
+        chunk_size = settings.INDEX_BUILD_CHUNK_SIZE
+        mapping_path = sidecar_path(settings.VECTOR_INDEX_PATH)
 
-        # 2. Normalize names
-        vehicle_ids = []
-        texts = []
-        for v in vehicles:
-            normalized_name = normalizer.normalize(v.name)
-            if normalized_name:
-                vehicle_ids.append((v.id, normalized_name))
-                texts.append(normalized_name)
+        index = None
+        params = None
+        rows = 0
+        last_id = None
+        exact = None
+        resumed = False
 
-        if not texts:
-            print("No valid texts to index.")
-            return
+        checkpoint = load_checkpoint() if resume else None
+        if checkpoint is not None:
+            index = faiss.read_index(partial_path())
+            params = checkpoint["params"]
+            # Rows already in the partial index are only normalized again,
+            # not re-embedded, to rebuild the sidecar
+            writer = SidecarWriter(mapping_path, settings.MODEL_NAME, checkpoint["dimension"])
+            for chunk in stream_catalog(db, chunk_size, until=checkpoint["last_id"]):
+                for vid, name in chunk:
+                    writer.add(vid, name)
 
-        # 3. Generate embeddings
-        print("Generating embeddings...")
-        embeddings = embedding_service.generate_embeddings(texts)
-        
-        # Convert to float32 for FAISS
-        embeddings = np.array(embeddings).astype('float32')
+            if writer.rows == checkpoint["rows"] == index.ntotal:
+                rows, last_id, resumed = checkpoint["rows"], checkpoint["last_id"], True
+                print(f"Resuming build after {rows} vehicles (last id {last_id}).")
+            else:
+                print("Catalog changed since the checkpoint, starting over.")
+                writer.abort()
+                writer, index, params = None, None, None
 
-        # 4. Build FAISS index
-        # Using IndexFlatL2 for simplicity, or IndexFlatIP for cosine similarity (normalized vectors)
+        # 2-3. Normalize and embed chunk by chunk, 4. add to the index
         # SentenceTransformers usually produce normalized vectors, so IP (Inner Product) == Cosine Similarity
-        dimension = embeddings.shape[1]
-        index = faiss.IndexFlatIP(dimension)
-        index.add(embeddings)
-        
-        print(f"Index built with {index.ntotal} vectors.")
+        pending = []  # chunks held back until an IVF index has enough training data
+        chunks_since_checkpoint = 0
+        for chunk in stream_catalog(db, chunk_size, after=last_id):
+            embeddings = np.asarray(embedding_service.generate_embeddings([name for _, name in chunk]), dtype='float32')
+
+            if index is None:
+                dimension = embeddings.shape[1]
+                base, params = create_index(dimension, total)
+                # ID-mapped so SimilarityService can add/remove rows incrementally
+                index = faiss.IndexIDMap2(base)
+                writer = SidecarWriter(mapping_path, settings.MODEL_NAME, dimension)
+
+            if exact is None and not resumed and params["index_type"] != "flat":
+                # Queries for the recall report: the first catalog vectors
+                n_queries = min(settings.INDEX_REPORT_QUERIES, len(embeddings))
+                exact = ExactSearch(embeddings[:n_queries].copy(), k=min(10, total),
+                                    makes=[make_of(name) for _, name in chunk[:n_queries]])
+
+            if not index.is_trained:
+                pending.append((chunk, embeddings))
+                if sum(len(c) for c, _ in pending) < training_size(params, total):
+                    continue
+                train(index, params, pending)
+                for pending_chunk, pending_embeddings in pending:
+                    rows = add_chunk(index, writer, exact, pending_chunk, pending_embeddings, rows)
+                pending = []
+            else:
+                rows = add_chunk(index, writer, exact, chunk, embeddings, rows)
+
+            last_id = chunk[-1][0]
+            print(f"Indexed {rows}/{total} vehicles.")
+
+            chunks_since_checkpoint += 1
+            if chunks_since_checkpoint >= settings.INDEX_CHECKPOINT_EVERY:
+                save_checkpoint(index, {"model_name": settings.MODEL_NAME, "index_type": settings.INDEX_TYPE,
+                                        "params": params, "dimension": index.d, "rows": rows, "last_id": last_id})
+                chunks_since_checkpoint = 0
+
+        if pending:
+            # Fewer vehicles than the training sample size
+            train(index, params, pending)
+            for pending_chunk, pending_embeddings in pending:
+                rows = add_chunk(index, writer, exact, pending_chunk, pending_embeddings, rows)
+
+        if index is None or index.ntotal == 0:
+            print("No valid texts to index.")
+            return
+
+        dimension = index.d
+        apply_search_params(index, params)
+        print(f"Index built with {index.ntotal} vectors ({params['index_type']}).")
 
         # 5. Save index and mapping
-        os.makedirs(os.path.dirname(settings.VECTOR_INDEX_PATH), exist_ok=True)
-        
-        faiss.write_index(index, settings.VECTOR_INDEX_PATH)
+        # Files are written to a temporary path and renamed, so a running
+        # API never reads a half-written index when it hot-reloads
+        faiss.write_index(index, settings.VECTOR_INDEX_PATH + '.tmp')
+        os.replace(settings.VECTOR_INDEX_PATH + '.tmp', settings.VECTOR_INDEX_PATH)
         print(f"Index saved to {settings.VECTOR_INDEX_PATH}")
 
-        # Save ID mapping
-        mapping_path = settings.VECTOR_INDEX_PATH.replace('.faiss', '_map.pkl')
-        with open(mapping_path, 'wb') as f:
-            pickle.dump(vehicle_ids, f)
+        # The ID mapping was written progressively as a memory-mappable sidecar
+        writer.close()
+        writer = None
         print(f"Mapping saved to {mapping_path}")
 
+        # Token postings for the lexical first stage, from the sidecar rows
+        terms = build_lexical_index(CatalogSidecar(mapping_path), lexical_path(settings.VECTOR_INDEX_PATH))
+        print(f"Lexical index with {terms} terms saved to {lexical_path(settings.VECTOR_INDEX_PATH)}")
+
+        # Rows of each make, so queries with a known make search only their block
+        makes = build_block_index(CatalogSidecar(mapping_path), blocks_path(settings.VECTOR_INDEX_PATH), make_of)
+        print(f"Make blocks for {makes} makes saved to {blocks_path(settings.VECTOR_INDEX_PATH)}")
+
+        # A legacy pickled mapping would be out of date now
+        legacy_mapping_path = settings.VECTOR_INDEX_PATH.replace('.faiss', '_map.pkl')
+        if os.path.exists(legacy_mapping_path):
+            os.remove(legacy_mapping_path)
+
+        # The full rebuild already contains every incremental change
+        delta_path = settings.VECTOR_INDEX_PATH.replace('.faiss', '_delta.pkl')
+        if os.path.exists(delta_path):
+            os.remove(delta_path)
+            print(f"Removed incremental delta {delta_path}")
+
+        # Save index parameters next to the index
+        params.update({"dimension": dimension, "ntotal": int(index.ntotal), "model_name": settings.MODEL_NAME})
+        with open(params_path(settings.VECTOR_INDEX_PATH), 'w') as f:
+            json.dump(params, f, indent=2)
+        print(f"Index parameters saved to {params_path(settings.VECTOR_INDEX_PATH)}")
+
+        # Recall vs latency of the approximate index against exact search
+        if exact is not None:
+            report = recall_report(index, exact, blocked_search(index, params, mapping_path))
+            report_path = settings.VECTOR_INDEX_PATH.replace('.faiss', '_report.json')
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"Recall@{report['k']}: {report['recall']:.4f} "
+                  f"(ann {report['ann_latency_ms']:.3f} ms/query vs flat {report['flat_latency_ms']:.3f} ms/query)")
+            if "blocked_recall" in report:
+                print(f"Blocked recall@{report['k']}: {report['blocked_recall']:.4f} "
+                      f"over {report['blocked_queries']} queries ({report['blocked_latency_ms']:.3f} ms/query)")
+            print(f"Recall report saved to {report_path}")
+        elif resumed and params["index_type"] != "flat":
+            print("Recall report skipped: exact results are not available for a resumed build.")
+
+        # Write a new catalog version stamp last, so caches keyed on the
+        # previous version are invalidated once the new index is loaded
+        version_path = settings.VECTOR_INDEX_PATH.replace('.faiss', '_version.txt')
+        version = uuid.uuid4().hex
+        with open(version_path, 'w') as f:
+            f.write(version)
+        print(f"Catalog version {version} saved to {version_path}")
+
+        clear_checkpoint()
+
     finally:
+        if writer is not None:
+            writer.abort()
         db.close()
+
+def stream_catalog(db, chunk_size: int, after: str = None, until: str = None):
+    """
+    Pages through the vehicles table in id order with a streaming cursor and
+    yields chunks of (vehicle_id, normalized_name). Vehicles whose name
+    normalizes to nothing are skipped.
+    """
+    query = db.query(Vehicle.id, Vehicle.name).order_by(Vehicle.id)
+    if after is not None:
+        query = query.filter(Vehicle.id > after)
+    if until is not None:
+        query = query.filter(Vehicle.id <= until)
+
+    chunk = []
+    for page in db.execute(query.statement.execution_options(yield_per=chunk_size)).partitions():
+        for (vid, _), normalized_name in zip(page, normalizer.normalize_batch([name for _, name in page])):
+            if normalized_name:
+                chunk.append((vid, normalized_name))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def add_chunk(index, writer, exact, chunk: list, embeddings: np.ndarray, rows: int) -> int:
+    index.add_with_ids(embeddings, np.arange(rows, rows + len(embeddings), dtype='int64'))
+    for vid, name in chunk:
+        writer.add(vid, name)
+    if exact is not None:
+        exact.add(embeddings, rows, [make_of(name) for _, name in chunk])
+    return rows + len(embeddings)
+
+def make_of(name: str) -> str:
+    return normalizer.extract_attributes(name).make
+
+def training_size(params: dict, total: int) -> int:
+    # k-means uses at most 256 points per list; the sample is bounded by
+    # nlist, not by the catalog size
+    return min(total, params.get("nlist", 1) * 256)
+
+def train(index, params: dict, pending: list):
+    sample = np.vstack([embeddings for _, embeddings in pending])
+    print(f"Training {params['index_type']} index on {len(sample)} vectors...")
+    index.train(sample)
+
+def partial_path() -> str:
+    return settings.VECTOR_INDEX_PATH + '.partial'
+
+def checkpoint_path() -> str:
+    return settings.VECTOR_INDEX_PATH.replace('.faiss', '_build.json')
+
+def load_checkpoint() -> dict:
+    """
+    Returns the checkpoint of an interrupted build with the same model and
+    index type, or None.
+    """
+    if not (os.path.exists(checkpoint_path()) and os.path.exists(partial_path())):
+        return None
+
+    with open(checkpoint_path(), 'r') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("model_name") != settings.MODEL_NAME or checkpoint.get("index_type") != settings.INDEX_TYPE:
+        print("Ignoring checkpoint built with a different model or index type.")
+        return None
+    return checkpoint
+
+def save_checkpoint(index, checkpoint: dict):
+    # Index first: a checkpoint never points past what the partial index holds
+    faiss.write_index(index, partial_path() + '.tmp')
+    os.replace(partial_path() + '.tmp', partial_path())
+    with open(checkpoint_path() + '.tmp', 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(checkpoint_path() + '.tmp', checkpoint_path())
+    print(f"Checkpoint saved after {checkpoint['rows']} vehicles.")
+
+def clear_checkpoint():
+    for path in (checkpoint_path(), partial_path()):
+        if os.path.exists(path):
+            os.remove(path)
+
+def create_index(dimension: int, n_vectors: int):
+    """
+    Creates an empty FAISS index of the type selected by settings.INDEX_TYPE.
+    Returns (index, params) where params are the values saved next to the index.
+    """
+    index_type = settings.INDEX_TYPE
+    params = {"index_type": index_type}
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, settings.INDEX_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = settings.INDEX_EF_CONSTRUCTION
+        params.update({"hnsw_m": settings.INDEX_HNSW_M, "ef_construction": settings.INDEX_EF_CONSTRUCTION,
+                       "ef_search": settings.INDEX_EF_SEARCH})
+        return index, params
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        # k-means needs a few dozen points per list
+        nlist = max(1, min(settings.INDEX_NLIST, n_vectors // 39))
+        nprobe = min(settings.INDEX_NPROBE, nlist)
+        quantizer = faiss.IndexFlatIP(dimension)
+
+        if index_type == "ivf_pq":
+            if n_vectors < 2 ** settings.INDEX_PQ_NBITS or dimension % settings.INDEX_PQ_M != 0:
+                print("Not enough vectors or incompatible PQ_M for ivf_pq, falling back to ivf_flat.")
+                index_type = "ivf_flat"
+            else:
+                index = faiss.IndexIVFPQ(quantizer, dimension, nlist, settings.INDEX_PQ_M,
+                                         settings.INDEX_PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+                params.update({"nlist": nlist, "nprobe": nprobe, "pq_m": settings.INDEX_PQ_M,
+                               "pq_nbits": settings.INDEX_PQ_NBITS})
+                return index, params
+
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        params.update({"index_type": index_type, "nlist": nlist, "nprobe": nprobe})
+        return index, params
+
+    if index_type != "flat":
+        print(f"Unknown INDEX_TYPE '{index_type}', using flat.")
+        params["index_type"] = "flat"
+
+    return faiss.IndexFlatIP(dimension), params
+
+class ExactSearch:
+    """
+    Exact (flat) top-k for a fixed set of queries, accumulated chunk by
+    chunk as vectors are added, so the recall report does not need the
+    full embedding matrix. With the makes of the queries, the exact top-k
+    within each query's make block is kept as well.
+    """
+    def __init__(self, queries: np.ndarray, k: int = 10, makes: list = None):
+        self.queries = queries
+        self.k = k
+        self.makes = makes
+        self.scores = np.full((len(queries), k), -np.inf, dtype='float32')
+        self.ids = np.full((len(queries), k), -1, dtype='int64')
+        self.block_scores = np.full((len(queries), k), -np.inf, dtype='float32')
+        self.block_ids = np.full((len(queries), k), -1, dtype='int64')
+        self.seconds = 0.0
+
+    def add(self, embeddings: np.ndarray, first_id: int, makes: list = None):
+        start = time.perf_counter()
+        flat = faiss.IndexFlatIP(embeddings.shape[1])
+        flat.add(embeddings)
+        scores, ids = flat.search(self.queries, min(self.k, len(embeddings)))
+        self.scores, self.ids = self._merge(self.scores, self.ids, scores, ids + first_id)
+        self.seconds += time.perf_counter() - start
+
+        if self.makes is not None and makes is not None:
+            # Rows of other makes (or without one) never match
+            scores = self.queries @ embeddings.T
+            same_make = np.array(self.makes, dtype=object)[:, None] == np.array(makes, dtype=object)[None, :]
+            same_make &= np.array([make is not None for make in makes])[None, :]
+            scores = np.where(same_make, scores, -np.inf).astype('float32')
+            n = min(self.k, len(embeddings))
+            ids = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+            scores = np.take_along_axis(scores, ids, axis=1)
+            ids = np.where(np.isfinite(scores), ids + first_id, -1)
+            self.block_scores, self.block_ids = self._merge(self.block_scores, self.block_ids, scores, ids)
+
+    def _merge(self, scores, ids, new_scores, new_ids):
+        # Merge with the best results from previous chunks
+        scores = np.hstack([scores, new_scores])
+        ids = np.hstack([ids, new_ids])
+        top = np.argsort(-scores, axis=1, kind='stable')[:, :self.k]
+        return np.take_along_axis(scores, top, axis=1), np.take_along_axis(ids, top, axis=1)
+
+def blocked_search(index, params: dict, mapping_path: str):
+    """
+    The API's make-blocked search over the built index, for the recall
+    report: (queries, makes, k) -> (scores, ids). Leaves the service's
+    search counters untouched.
+    """
+    from src.core.matching.similarity_service import IndexState, similarity_service
+
+    enable_reconstruct(index)
+    state = IndexState(index, CatalogSidecar(mapping_path), params,
+                       blocks=BlockIndex.load(blocks_path(settings.VECTOR_INDEX_PATH)))
+    return lambda queries, makes, k: similarity_service.search_blocks(state, queries, makes, k)[:2]
+
+def recall_report(index, exact: ExactSearch, blocked=None) -> dict:
+    """
+    Compares the approximate index against exact (flat) search on a sample
+    of catalog vectors used as queries. With a blocked search, queries
+    with a make are also compared within their make block, which is where
+    filtered HNSW/IVF searches lose recall.
+    """
+    n_queries = len(exact.queries)
+    k = exact.k
+    flat_ms = exact.seconds * 1000 / n_queries
+
+    start = time.perf_counter()
+    _, approx = index.search(exact.queries, k)
+    ann_ms = (time.perf_counter() - start) * 1000 / n_queries
+
+    hits = sum(len(set(a) & set(e)) for a, e in zip(approx, exact.ids))
+    report = {
+        "k": k,
+        "queries": n_queries,
+        "recall": hits / (n_queries * k),
+        "ann_latency_ms": ann_ms,
+        "flat_latency_ms": flat_ms
+    }
+
+    queries = [q for q, make in enumerate(exact.makes or []) if make is not None]
+    if blocked is not None and queries:
+        start = time.perf_counter()
+        _, approx = blocked(exact.queries[queries], [exact.makes[q] for q in queries], k)
+        blocked_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        # Blocks smaller than k have fewer exact neighbours
+        expected = [set(e) - {-1} for e in exact.block_ids[queries]]
+        hits = sum(len(set(a) & e) for a, e in zip(approx, expected))
+        report.update({
+            "blocked_queries": len(queries),
+            "blocked_recall": hits / max(sum(len(e) for e in expected), 1),
+            "blocked_latency_ms": blocked_ms
+        })
+    return report
@@ -0,0 +1,368 @@
+import io
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+import numpy as np
+
+# File layout (little endian):
+#   header   magic, format version, dimension, rows, data size, crc32 of data,
+#            model name length, vocabulary size, model name (utf-8)
+#   data     id offsets    uint64[rows + 1]
+#            name offsets  uint64[rows + 1]
+#            token offsets uint64[rows + 1]
+#            term offsets  uint64[terms + 1]
+#            token ids     uint32[], the sorted distinct name tokens of each row
+#            ids           utf-8 bytes, concatenated
+#            names         utf-8 bytes, concatenated
+#            terms         utf-8 bytes, concatenated (token id -> word)
+# Version 1 files have no vocabulary size, token or term sections.
+MAGIC = b"VHCATMAP"
+FORMAT_VERSION = 2
+_HEADER_V1 = struct.Struct("<8sIIQQIH")
+_HEADER = struct.Struct("<8sIIQQIHQ")
+_OFFSET = struct.Struct("<Q")
+
+def sidecar_path(index_path: str) -> str:
+    return index_path.replace('.faiss', '_map.bin')
+
+class SidecarError(Exception):
+    pass
+
+class SidecarWriter:
+    """
+    Writes the catalog sidecar row by row, so the caller never has to hold
+    the whole catalog in memory: offsets and strings are spooled to
+    temporary files. The file only appears on close().
+    """
+    def __init__(self, path: str, model_name: str, dimension: int):
+        self.path = path
+        self.model_name = model_name
+        self.dimension = dimension
+        self.rows = 0
+        directory = os.path.dirname(path) or "."
+        # ids, names, token ids, id offsets, name offsets, token offsets
+        self._parts = [tempfile.TemporaryFile(dir=directory) for _ in range(6)]
+        self._id_end = 0
+        self._name_end = 0
+        self._token_end = 0
+        # Vocabulary of the name tokens, word -> token id
+        self._terms = {}
+
+    def add(self, vehicle_id: str, name: str):
+        ids, names, tokens, id_offsets, name_offsets, token_offsets = self._parts
+        id_bytes = str(vehicle_id).encode("utf-8")
+        name_bytes = name.encode("utf-8")
+        token_ids = _token_ids(name, self._terms)
+        ids.write(id_bytes)
+        names.write(name_bytes)
+        tokens.write(np.array(token_ids, dtype='<u4').tobytes())
+        self._id_end += len(id_bytes)
+        self._name_end += len(name_bytes)
+        self._token_end += len(token_ids)
+        id_offsets.write(_OFFSET.pack(self._id_end))
+        name_offsets.write(_OFFSET.pack(self._name_end))
+        token_offsets.write(_OFFSET.pack(self._token_end))
+        self.rows += 1
+
+    def close(self):
+        ids, names, tokens, id_offsets, name_offsets, token_offsets = self._parts
+        terms = [word.encode("utf-8") for word in self._terms]
+        term_offsets = np.zeros(len(terms) + 1, dtype='<u8')
+        term_offsets[1:] = np.cumsum([len(term) for term in terms])
+
+        # Data order in the file; each offset table starts with a 0
+        sections = [(_OFFSET.pack(0), id_offsets), (_OFFSET.pack(0), name_offsets), (_OFFSET.pack(0), token_offsets),
+                    (b"", io.BytesIO(term_offsets.tobytes())), (b"", tokens), (b"", ids), (b"", names),
+                    (b"", io.BytesIO(b"".join(terms)))]
+
+        crc = 0
+        data_size = 0
+        for prefix, part in sections:
+            crc = zlib.crc32(prefix, crc)
+            data_size += len(prefix)
+            part.seek(0)
+            for chunk in iter(lambda: part.read(1 << 20), b""):
+                crc = zlib.crc32(chunk, crc)
+                data_size += len(chunk)
+
+        model_bytes = self.model_name.encode("utf-8")
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, self.dimension, self.rows, data_size, crc,
+                                 len(model_bytes), len(terms)))
+            f.write(model_bytes)
+            for prefix, part in sections:
+                f.write(prefix)
+                part.seek(0)
+                shutil.copyfileobj(part, f)
+
+        self.abort()
+        os.replace(tmp_path, self.path)
+
+    def abort(self):
+        """
+        Discards the rows written so far.
+        """
+        for part in self._parts:
+            part.close()
+
+def write_sidecar(path: str, rows: list, model_name: str, dimension: int):
+    """
+    Writes a list of (vehicle_id, normalized_name) rows to a sidecar file.
+    """
+    writer = SidecarWriter(path, model_name, dimension)
+    for vehicle_id, name in rows:
+        writer.add(vehicle_id, name)
+    writer.close()
+
+class CatalogSidecar:
+    """
+    Read-only, memory-mapped view of a sidecar file. Offsets are read
+    zero-copy from the mapping, so every process opening the same file
+    shares it through the page cache.
+    """
+    def __init__(self, path: str, verify: bool = True):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < _HEADER_V1.size:
+            raise SidecarError(f"{path} is too small to be a catalog sidecar")
+
+        magic, version = struct.unpack_from("<8sI", self._mmap, 0)
+        if magic != MAGIC:
+            raise SidecarError(f"{path} is not a catalog sidecar")
+        if version not in (1, FORMAT_VERSION):
+            raise SidecarError(f"Unsupported sidecar format version {version}")
+
+        header = _HEADER_V1 if version == 1 else _HEADER
+        fields = header.unpack_from(self._mmap, 0)
+        _, _, self.dimension, self.rows, data_size, crc, model_len = fields[:7]
+        self.version = version
+        self.terms = fields[7] if version >= 2 else 0
+
+        self.model_name = bytes(self._mmap[header.size:header.size + model_len]).decode("utf-8")
+        data_start = header.size + model_len
+        if len(self._mmap) != data_start + data_size:
+            raise SidecarError(f"{path} is truncated")
+        if verify and zlib.crc32(memoryview(self._mmap)[data_start:]) != crc:
+            raise SidecarError(f"Checksum mismatch in {path}")
+
+        n = self.rows + 1
+        self._id_offsets = np.frombuffer(self._mmap, dtype='<u8', count=n, offset=data_start)
+        self._name_offsets = np.frombuffer(self._mmap, dtype='<u8', count=n, offset=data_start + 8 * n)
+        # Token sets are only stored from version 2 on
+        self.token_offsets = None
+        self.token_ids = None
+        self._ids_start = data_start + 16 * n
+        if version >= 2:
+            self.token_offsets = np.frombuffer(self._mmap, dtype='<u8', count=n, offset=data_start + 16 * n)
+            self._term_offsets = np.frombuffer(self._mmap, dtype='<u8', count=self.terms + 1, offset=data_start + 24 * n)
+            tokens_start = data_start + 24 * n + 8 * (self.terms + 1)
+            self.token_ids = np.frombuffer(self._mmap, dtype='<u4', count=int(self.token_offsets[-1]), offset=tokens_start)
+            self._ids_start = tokens_start + 4 * int(self.token_offsets[-1])
+        self._names_start = self._ids_start + int(self._id_offsets[-1])
+        self._terms_start = self._names_start + int(self._name_offsets[-1])
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, row: int) -> tuple:
+        if row < 0 or row >= self.rows:
+            raise IndexError(row)
+        id_start = self._ids_start + int(self._id_offsets[row])
+        id_end = self._ids_start + int(self._id_offsets[row + 1])
+        name_start = self._names_start + int(self._name_offsets[row])
+        name_end = self._names_start + int(self._name_offsets[row + 1])
+        return (self._mmap[id_start:id_end].decode("utf-8"),
+                self._mmap[name_start:name_end].decode("utf-8"))
+
+    def __iter__(self):
+        for row in range(self.rows):
+            yield self[row]
+
+    def vocabulary(self) -> list:
+        """
+        Token id -> word, empty for version 1 files.
+        """
+        if self.version < 2:
+            return []
+        data = bytes(self._mmap[self._terms_start:self._terms_start + int(self._term_offsets[-1])])
+        offsets = self._term_offsets.tolist()
+        return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(self.terms)]
+
+class CatalogMapping:
+    """
+    Row -> (vehicle_id, normalized_name) mapping used by SimilarityService.
+    The base (a sidecar or a plain list) is never modified; incremental
+    additions and removals are kept in a small overlay.
+    """
+    def __init__(self, base=None):
+        self.base = base if base is not None else []
+        self.overlay = {}
+        self._length = len(self.base)
+        # Rows without an entry, built on first use by present()
+        self._missing = None
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, row: int):
+        if row in self.overlay:
+            return self.overlay[row]
+        if row < 0 or row >= self._length:
+            raise IndexError(row)
+        return self.base[row]
+
+    def __setitem__(self, row: int, entry):
+        if row < 0 or row >= self._length:
+            raise IndexError(row)
+        self.overlay[row] = entry
+        self._missing = None
+
+    def __iter__(self):
+        for row in range(self._length):
+            yield self[row]
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def append(self, entry):
+        self.overlay[self._length] = entry
+        self._length += 1
+        self._missing = None
+
+    def copy(self) -> "CatalogMapping":
+        # Shares the base; only the overlay is copied
+        mapping = CatalogMapping(self.base)
+        mapping.overlay = dict(self.overlay)
+        mapping._length = self._length
+        mapping._missing = self._missing
+        return mapping
+
+    def present(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Mask of the rows that hold an entry, i.e. exist and were not removed.
+        """
+        rows = np.asarray(rows, dtype='int64')
+        missing = self._missing
+        if missing is None:
+            missing = [row for row, entry in self.overlay.items() if entry is None]
+            if isinstance(self.base, list):
+                # Lists pickled by older versions hold None for removed rows
+                missing.extend(row for row, entry in enumerate(self.base) if entry is None and row not in self.overlay)
+            missing = self._missing = np.array(missing, dtype='int64')
+        return (rows >= 0) & (rows < self._length) & ~np.isin(rows, missing)
+
+def _token_ids(name: str, vocab: dict) -> list:
+    # Sorted distinct token ids of a name; new words are added to vocab
+    return sorted({vocab.setdefault(word, len(vocab)) for word in name.lower().split()})
+
+class TokenTable:
+    """
+    The distinct name tokens of every catalog row as token ids in CSR form
+    (offsets, ids), so token overlap can be scored for a whole block of
+    candidates with array operations. Read from the sidecar, or built from
+    the names for mappings without one; rows changed incrementally are
+    kept in an overlay.
+    """
+    def __init__(self, vocabulary: list, offsets: np.ndarray, ids: np.ndarray):
+        self.vocab = {word: i for i, word in enumerate(vocabulary)}
+        self.offsets = offsets
+        self.ids = ids
+        self.base_rows = len(offsets) - 1
+        self.overlay = {}
+        self._overlay_rows = None
+
+    @classmethod
+    def from_mapping(cls, mapping: "CatalogMapping") -> "TokenTable":
+        base = mapping.base
+        if isinstance(base, CatalogSidecar) and base.token_ids is not None:
+            table = cls(base.vocabulary(), base.token_offsets, base.token_ids)
+        else:
+            vocab = {}
+            offsets = [0]
+            ids = []
+            for entry in base:
+                if entry is not None:
+                    ids.extend(_token_ids(entry[1] if isinstance(entry, tuple) else str(entry), vocab))
+                offsets.append(len(ids))
+            table = cls(list(vocab), np.array(offsets, dtype='<u8'), np.array(ids, dtype='<u4'))
+
+        for row, entry in mapping.overlay.items():
+            if entry is not None:
+                table.add(row, entry[1])
+            else:
+                table.remove(row)
+        return table
+
+    def add(self, row: int, name: str):
+        self.overlay[row] = np.array(_token_ids(name, self.vocab), dtype='int64')
+        self._overlay_rows = None
+
+    def remove(self, row: int):
+        self.overlay[row] = np.empty(0, dtype='int64')
+        self._overlay_rows = None
+
+    def copy(self) -> "TokenTable":
+        # Shares the base arrays; new words and rows go to the copy only
+        table = TokenTable.__new__(TokenTable)
+        table.vocab = dict(self.vocab)
+        table.offsets = self.offsets
+        table.ids = self.ids
+        table.base_rows = self.base_rows
+        table.overlay = dict(self.overlay)
+        table._overlay_rows = None
+        return table
+
+    def overlap(self, queries: list, rows: np.ndarray) -> np.ndarray:
+        """
+        Share of each query's distinct tokens found in each candidate row,
+        the same score as SimilarityService.calculate_token_overlap.
+        queries: n query texts; rows: (n, k) candidate rows, -1 for none.
+        """
+        n, k = rows.shape
+        sizes = np.zeros(n, dtype='float64')
+        vocab_size = len(self.vocab)
+        codes = []
+        for q, text in enumerate(queries):
+            words = set(text.lower().split()) if text else set()
+            sizes[q] = len(words)
+            codes.extend(q * vocab_size + self.vocab[word] for word in words if word in self.vocab)
+        if not codes:
+            return np.zeros((n, k), dtype='float32')
+
+        # One (pair, token id) entry per token of every candidate
+        ids, owners = self._gather(rows.reshape(-1))
+        found = np.isin(owners // k * vocab_size + ids, np.array(codes, dtype='int64'))
+        counts = np.bincount(owners[found], minlength=n * k).reshape(n, k)
+        return (counts / np.maximum(sizes, 1).reshape(-1, 1)).astype('float32')
+
+    def _gather(self, rows: np.ndarray):
+        """
+        Token ids of the given rows, concatenated, and the position in rows
+        each one belongs to.
+        """
+        rows = np.asarray(rows, dtype='int64')
+        if self._overlay_rows is None:
+            self._overlay_rows = np.fromiter(self.overlay, dtype='int64', count=len(self.overlay))
+        in_base = (rows >= 0) & (rows < self.base_rows)
+        in_overlay = np.isin(rows, self._overlay_rows)
+        positions = np.flatnonzero(in_base & ~in_overlay)
+
+        starts = self.offsets[rows[positions]].astype('int64')
+        lengths = self.offsets[rows[positions] + 1].astype('int64') - starts
+        owners = np.repeat(positions, lengths)
+        # Index of every token: its row's start plus its place within the row
+        within = np.arange(len(owners)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        ids = self.ids[np.repeat(starts, lengths) + within].astype('int64')
+
+        overlay_positions = np.flatnonzero(in_overlay)
+        if len(overlay_positions):
+            extra = [self.overlay[int(rows[p])] for p in overlay_positions]
+            ids = np.concatenate([ids] + extra)
+            owners = np.concatenate([owners, np.repeat(overlay_positions, [len(e) for e in extra])])
+        return ids, owners
@@ -0,0 +1,52 @@
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+def params_path(index_path: str) -> str:
+    return index_path.replace('.faiss', '_params.json')
+
+def load_params(index_path: str) -> dict:
+    """
+    Reads the parameters saved next to the index by build_index.
+    Indexes built before parameters were saved are flat.
+    """
+    path = params_path(index_path)
+    if not os.path.exists(path):
+        return {"index_type": "flat"}
+
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def apply_search_params(index, params: dict):
+    """
+    Applies the search-time knobs (nprobe, efSearch) stored with the index.
+    """
+    import faiss
+
+    parameter_space = faiss.ParameterSpace()
+    if "nprobe" in params:
+        parameter_space.set_index_parameter(index, "nprobe", params["nprobe"])
+    if "ef_search" in params:
+        parameter_space.set_index_parameter(index, "efSearch", params["ef_search"])
+
+def is_ivf(index) -> bool:
+    import faiss
+
+    try:
+        faiss.extract_index_ivf(index)
+        return True
+    except RuntimeError:
+        return False
+
+def enable_reconstruct(index):
+    """
+    Lets an IVF index reconstruct stored vectors by id, which needs a
+    direct map (a hashtable, kept up to date by incremental additions).
+    Other index types can always reconstruct.
+    """
+    import faiss
+
+    if is_ivf(index):
+        faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
@@ -0,0 +1,167 @@
+import math
+import os
+from array import array
+import numpy as np
+
+# BM25 term saturation and length normalization (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def lexical_path(index_path: str) -> str:
+    return index_path.replace('.faiss', '_lexical.npz')
+
+class LexicalIndexBuilder:
+    """
+    Collects token postings row by row, in the same row order as the
+    vector index. Normalized names have no repeated words, so every term
+    frequency is 1 and a posting is just a row number.
+    """
+    def __init__(self):
+        self._postings = {}
+        self._lengths = array('I')
+
+    def add(self, name: str):
+        row = len(self._lengths)
+        words = name.split()
+        for word in set(words):
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = array('I')
+            postings.append(row)
+        self._lengths.append(len(words))
+
+    @property
+    def rows(self) -> int:
+        return len(self._lengths)
+
+    @property
+    def terms(self) -> int:
+        return len(self._postings)
+
+    def save(self, path: str):
+        terms = sorted(self._postings)
+        offsets = np.zeros(len(terms) + 1, dtype='int64')
+        offsets[1:] = np.cumsum([len(self._postings[t]) for t in terms])
+        postings = np.empty(int(offsets[-1]), dtype='int32')
+        for i, term in enumerate(terms):
+            postings[offsets[i]:offsets[i + 1]] = self._postings[term]
+
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, terms=np.array(terms, dtype=str), offsets=offsets, postings=postings,
+                     lengths=np.frombuffer(self._lengths, dtype='uint32'))
+        os.replace(path + '.tmp', path)
+
+class LexicalIndex:
+    """
+    Inverted index over the normalized catalog names, scored with BM25.
+    Rows added after the build (incremental updates) go to a small overlay;
+    removed rows stay in the postings and are filtered by the caller.
+    Searches run without a lock while rows are added, so add() builds a
+    new overlay and swaps it in whole.
+    """
+    def __init__(self, terms, offsets: np.ndarray, postings: np.ndarray, lengths: np.ndarray):
+        self._terms = {term: i for i, term in enumerate(terms)}
+        self._offsets = offsets
+        self._postings = postings
+        lengths = np.array(lengths, dtype='float32')
+        # (added postings, row lengths, rows, total length), read by searches as one snapshot
+        self._overlay = ({}, lengths, len(lengths), float(lengths.sum()))
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        with np.load(path) as data:
+            return cls(data["terms"].tolist(), data["offsets"], data["postings"], data["lengths"])
+
+    def __len__(self) -> int:
+        return self._overlay[2]
+
+    def copy(self) -> "LexicalIndex":
+        # Shares the base postings and the current overlay snapshot
+        lexical = LexicalIndex.__new__(LexicalIndex)
+        lexical._terms = self._terms
+        lexical._offsets = self._offsets
+        lexical._postings = self._postings
+        lexical._overlay = self._overlay
+        return lexical
+
+    def add(self, row: int, name: str):
+        self.add_many([row], [name])
+
+    def add_many(self, rows: list, names: list):
+        """
+        Adds rows and publishes them with a single overlay swap, so a batch
+        costs one copy of the overlay rather than one per row. Callers
+        serialize adds; searches may run concurrently and see either the
+        old or the new overlay.
+        """
+        if not rows:
+            return
+        added, lengths, total_rows, total_length = self._overlay
+
+        # The lengths are in place before any posting points at the rows
+        end = max(rows) + 1
+        lengths = np.resize(lengths, max(end, 2 * len(lengths))) if end > len(lengths) else lengths.copy()
+        postings = {}
+        for row, name in zip(rows, names):
+            words = name.split()
+            lengths[row] = len(words)
+            total_length += len(words)
+            for word in set(words):
+                postings.setdefault(word, []).append(row)
+
+        added = dict(added)
+        for word, word_rows in postings.items():
+            added[word] = added.get(word, []) + word_rows
+        self._overlay = (added, lengths, max(total_rows, end), total_length)
+
+    def postings(self, term: str, added: dict = None) -> np.ndarray:
+        i = self._terms.get(term)
+        base = self._postings[self._offsets[i]:self._offsets[i + 1]] if i is not None else self._postings[:0]
+        rows = (self._overlay[0] if added is None else added).get(term)
+        return np.concatenate([base, np.array(rows, dtype='int32')]) if rows else base
+
+    def search(self, text: str, k: int, max_df: float = 1.0):
+        """
+        Top-k rows for the query by BM25. Terms found in more than max_df
+        of the catalog are skipped: they barely change the ranking but
+        their postings are the longest to score.
+        Returns (rows, scores), best first.
+        """
+        added, lengths, total_rows, total_length = self._overlay
+        if not total_rows:
+            return np.empty(0, dtype='int64'), np.empty(0, dtype='float32')
+
+        average_length = total_length / total_rows
+        row_parts = []
+        weight_parts = []
+        for term in set(text.split()):
+            rows = self.postings(term, added)
+            df = len(rows)
+            if df == 0 or df > max_df * total_rows:
+                continue
+            idf = math.log(1 + (total_rows - df + 0.5) / (df + 0.5))
+            row_lengths = lengths[rows]
+            row_parts.append(rows)
+            weight_parts.append(idf * (BM25_K1 + 1) / (1 + BM25_K1 * (1 - BM25_B + BM25_B * row_lengths / average_length)))
+
+        if not row_parts:
+            return np.empty(0, dtype='int64'), np.empty(0, dtype='float32')
+
+        rows, inverse = np.unique(np.concatenate(row_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weight_parts)).astype('float32')
+        if len(rows) > k:
+            top = np.argpartition(-scores, k)[:k]
+            rows, scores = rows[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return rows[order].astype('int64'), scores[order]
+
+def build_lexical_index(rows, path: str) -> int:
+    """
+    Writes the lexical index for an iterable of (vehicle_id, normalized_name)
+    rows, e.g. a catalog sidecar. Returns the number of distinct terms.
+    """
+    builder = LexicalIndexBuilder()
+    for _, name in rows:
+        builder.add(name)
+    builder.save(path)
+    return builder.terms